@@ -6,6 +6,7 @@ from PlotNeuralNet.PyCore.TikzGen import (
     ToCor,
     ToEnd,
     ToGenerate,
+    ToGroup,
     ToHead,
     ToPool,
     ToSoftMax,
@@ -14,13 +15,13 @@ from PlotNeuralNet.PyCore.TikzGen import (
 
 # Helper for bottleneck residual block (1x1 -> 3x3 -> 1x1)
 def ResBlock(name, s_filter, offset, to, height, depth, width, caption=""):
-    return [
+    return ToGroup(name, [
         ToConv(f"{name}_conv1", s_filter, s_filter, offset=offset, to=to, height=height, depth=depth, width=1, caption="1x1"),
         ToConv(f"{name}_conv2", s_filter, s_filter, offset="{(1,0,0)}", to=f"({name}_conv1-east)", height=height, depth=depth, width=2, caption="3x3"),
         ToConv(f"{name}_conv3", s_filter*4, s_filter*4, offset="{(1,0,0)}", to=f"({name}_conv2-east)", height=height, depth=depth, width=1, caption="1x1"),
         ToConnection(f"{name}_conv1", f"{name}_conv2"),
         ToConnection(f"{name}_conv2", f"{name}_conv3"),
-    ]
+    ])
 
 # Define ResNet-50 architecture
 arch = [
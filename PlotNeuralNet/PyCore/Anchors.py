@@ -0,0 +1,152 @@
+"""
+Pruning of the named anchors the pics define.
+
+By default every Box and RightBandedBox pic defines 23 named coordinates
+(``-east``, ``-nearnortheast``, ...) and every Ball five, although most
+diagrams only reference a few of them. Each coordinate costs TeX control
+sequences and main memory, which adds up on large networks.
+:func:`PruneAnchors` collects the anchors the architecture references
+through ``to=`` arguments, connections, skips and raw TikZ fragments, and
+has every layer define only those through its pic's ``anchors`` key.
+"""
+
+import re
+
+from .Layout import BALL_ANCHORS, BOX_ANCHORS
+from .Nodes import Begin, Colors, Connection, End, Flatten, Head, Input, Layer, Skip
+from .TikzGen import ToGenerate
+
+# Anchors defined as intersections of two others in Layers/Anchors.sty.
+_CORNERS = {
+    "northeast": ("north", "east"),
+    "northwest": ("north", "west"),
+    "southeast": ("south", "east"),
+    "southwest": ("south", "west"),
+}
+
+# A reference such as "(conv1-east)", also as either side of "-|" or "|-".
+_REFERENCES = re.compile(
+    r"(?:\(|-\||\|-)\s*([^\s(),$|]+?)-(%s)\s*(?=\)|-\||\|-)"
+    % "|".join(sorted(BOX_ANCHORS, key=len, reverse=True))
+)
+
+
+def _Scan(text, referenced):
+    """
+    Add the anchor references found in TikZ code.
+
+    Parameters
+    ----------
+    text : str
+        TikZ code.
+    referenced : dict
+        Layer name to set of anchor names, updated in place.
+
+    Returns
+    -------
+    None
+    """
+    for name, anchor in _REFERENCES.findall(text):
+        referenced.setdefault(name, set()).add(anchor)
+
+
+def ReferencedAnchors(arch):
+    """
+    Collect the anchors an architecture references.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+
+    Returns
+    -------
+    dict
+        Layer name to the set of its anchors referenced anywhere.
+    """
+    referenced = {}
+    for c in Flatten(arch):
+        if isinstance(c, Connection):
+            referenced.setdefault(c.of, set()).add("east")
+            referenced.setdefault(c.to, set()).add("west")
+        elif isinstance(c, Skip):
+            referenced.setdefault(c.of, set()).update(("southeast", "northeast"))
+            referenced.setdefault(c.to, set()).update(("south", "north"))
+        elif isinstance(c, (Layer, Input)):
+            _Scan(str(c.to), referenced)
+            _Scan(str(getattr(c, "offset", "")), referenced)
+        elif not isinstance(c, (Head, Colors, Begin, End)):
+            _Scan(c if isinstance(c, str) else str(c), referenced)
+    return referenced
+
+
+def Selection(pic, anchors):
+    """
+    Order the anchors of a pic as ``Layers/Anchors.sty`` defines them.
+
+    Parameters
+    ----------
+    pic : str
+        Pic name, e.g. "Box" or "Ball".
+    anchors : iterable of str
+        Anchors to define.
+
+    Returns
+    -------
+    tuple of str
+        The anchors the pic knows, with those the requested corners are
+        computed from, in definition order.
+    """
+    names = set(anchors)
+    for corner, parts in _CORNERS.items():
+        if corner in names:
+            names.update(parts)
+    order = BALL_ANCHORS if pic == "Ball" else BOX_ANCHORS
+    return tuple(anchor for anchor in order if anchor in names)
+
+
+def PruneAnchors(arch):
+    """
+    Rewrite an architecture so every pic defines only the anchors it needs.
+
+    The whole architecture is read first, since a layer can be referenced
+    after it is drawn. Layers that already select their anchors are kept.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+
+    Yields
+    ------
+    Node or str
+        The architecture, with ``anchors`` set on every layer.
+    """
+    arch = list(Flatten(arch))
+    referenced = ReferencedAnchors(arch)
+    for c in arch:
+        if isinstance(c, Layer) and c.anchors is None:
+            yield c.Replace(anchors=Selection(c.pic, referenced.get(c.name, ())))
+        else:
+            yield c
+
+
+def ToGeneratePruned(arch, pathname="file.tex", **kwargs):
+    """
+    Generate the LaTeX file with every pic defining only its referenced anchors.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    pathname : str or file object, optional
+        Output .tex file, by default "file.tex".
+    **kwargs
+        Passed to ``ToGenerate``.
+
+    Returns
+    -------
+    bool
+        Whether the output was written, as returned by ``ToGenerate``.
+    """
+    return ToGenerate(PruneAnchors(arch), pathname, **kwargs)
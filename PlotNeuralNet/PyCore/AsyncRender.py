@@ -0,0 +1,292 @@
+"""
+Rendering diagrams to PDF from asyncio applications.
+
+:func:`Render` generates an architecture's ``.tex`` in a private temporary
+directory and runs TeX on it with ``asyncio.create_subprocess_exec``, so
+the event loop keeps serving other requests meanwhile. A :class:`Renderer`
+bounds the number of TeX processes running at once, kills a run that
+exceeds its timeout, and kills it as well when the awaiting task is
+cancelled, so abandoned requests do not leave TeX processes behind.
+"""
+
+import asyncio
+import os
+import shutil
+import signal
+import tempfile
+import time
+import weakref
+
+from .Build import CompileError, CompileResult, Relocate, TexEnvironment, Transform
+from .CompileCache import DEFAULT_MAX_BYTES, CompileCache
+from .Engines import GetEngine
+from .TikzGen import ToGenerate
+
+DEFAULT_CONCURRENCY = os.cpu_count() or 1
+
+
+class RenderError(RuntimeError):
+    """
+    Raised when TeX fails to compile a diagram.
+
+    Attributes
+    ----------
+    compiled : Build.CompileResult
+        The failed run, with its exit status, log and metrics.
+    """
+
+    def __init__(self, message, compiled):
+        super().__init__(message)
+        self.compiled = compiled
+
+
+def _Kill(process):
+    """
+    Kill a TeX process and whatever it started.
+
+    Parameters
+    ----------
+    process : asyncio.subprocess.Process
+        The process, started in its own session on POSIX.
+
+    Returns
+    -------
+    None
+    """
+    if process.returncode is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def _Generate(arch, texPath, baseDir, transforms):
+    ToGenerate(Transform(Relocate(arch, baseDir), transforms), texPath)
+
+
+def _ReadBytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _ReadLog(path):
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+class Renderer:
+    """
+    Renders architectures to PDF with a bounded number of TeX processes.
+
+    One renderer is meant to be shared by every task of an application;
+    renders beyond ``concurrency`` wait for a free slot without blocking
+    the event loop. ``running`` and ``waiting`` count the renders in TeX
+    and those queued for a slot.
+
+    Parameters
+    ----------
+    concurrency : int, optional
+        Most TeX processes running at once, by default one per core.
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex".
+    timeout : float, optional
+        Default seconds before a TeX run is killed, by default no limit.
+    cacheDir : str, optional
+        Compile cache directory; unchanged documents are then served from
+        it without running TeX. By default no cache is used.
+    cacheMaxBytes : int, optional
+        Size limit of the compile cache, by default 512 MiB.
+    transforms : sequence of callable, optional
+        Rewrites applied in order to every architecture, e.g.
+        ``Layout.Flat``, by default none.
+    """
+
+    def __init__(
+        self,
+        concurrency=None,
+        engine="pdflatex",
+        timeout=None,
+        cacheDir=None,
+        cacheMaxBytes=DEFAULT_MAX_BYTES,
+        transforms=(),
+    ):
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.engine = GetEngine(engine)
+        self.timeout = timeout
+        self.transforms = tuple(transforms)
+        self.cache = None if cacheDir is None else CompileCache(cacheDir, cacheMaxBytes)
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def Render(self, arch, timeout=None, baseDir=None):
+        """
+        Render an architecture to PDF.
+
+        Parameters
+        ----------
+        arch : iterable
+            Architecture, as accepted by ``ToGenerate``. It is generated on
+            a worker thread, so it may be a long generator.
+        timeout : float, optional
+            Seconds before the TeX run is killed, by default the renderer's.
+        baseDir : str, optional
+            Directory relative input image paths are resolved against, by
+            default the current directory.
+
+        Returns
+        -------
+        bytes
+            The PDF.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If TeX ran longer than the timeout; it has been killed.
+        RenderError
+            If TeX failed.
+        OSError
+            If the engine could not be started.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        baseDir = os.getcwd() if baseDir is None else baseDir
+        workDir = tempfile.mkdtemp(prefix="plotneuralnet-")
+        try:
+            texPath = os.path.join(workDir, "diagram.tex")
+            await loop.run_in_executor(
+                None, _Generate, arch, texPath, baseDir, self.transforms
+            )
+            key = None
+            if self.cache is not None:
+                key = await loop.run_in_executor(None, self.cache.Key, texPath, self.engine)
+                cached = await loop.run_in_executor(None, self.cache.Get, key)
+                if cached is not None:
+                    return await loop.run_in_executor(None, _ReadBytes, cached)
+
+            self.waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            try:
+                self.running += 1
+                try:
+                    compiled = await self._Compile(texPath, timeout)
+                finally:
+                    self.running -= 1
+            finally:
+                self._semaphore.release()
+            if not compiled.ok:
+                raise RenderError(CompileError(compiled, compiled.engine), compiled)
+            if self.cache is not None:
+                await loop.run_in_executor(None, self.cache.Put, key, compiled.pdfPath)
+            return await loop.run_in_executor(None, _ReadBytes, compiled.pdfPath)
+        finally:
+            await asyncio.shield(
+                loop.run_in_executor(None, shutil.rmtree, workDir, True)
+            )
+
+    async def _Compile(self, texPath, timeout):
+        """
+        Run TeX on a file without blocking the event loop.
+
+        With the "auto" engine, a run that exceeds TeX's capacity is
+        repeated with the next engine, within the same slot.
+
+        Parameters
+        ----------
+        texPath : str
+            Path to the ``.tex`` file; outputs are written next to it.
+        timeout : float or None
+            Seconds before each run is killed.
+
+        Returns
+        -------
+        Build.CompileResult
+            The PDF path, exit status, timing, log and engine of the last run.
+        """
+        workDir, texName = os.path.split(texPath)
+        jobName = os.path.splitext(texName)[0]
+        loop = asyncio.get_running_loop()
+        seconds = 0.0
+        for attempt in self.engine.Attempts():
+            start = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *attempt.Command(texName),
+                cwd=workDir,
+                env=attempt.Environment(TexEnvironment()),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=hasattr(os, "killpg"),
+            )
+            try:
+                returncode = await asyncio.wait_for(process.wait(), timeout)
+            except BaseException:
+                # Timed out or cancelled: never leave the engine running.
+                _Kill(process)
+                await asyncio.shield(process.wait())
+                raise
+            seconds += time.perf_counter() - start
+
+            log = await loop.run_in_executor(None, _ReadLog, os.path.join(workDir, jobName + ".log"))
+            pdfPath = os.path.join(workDir, jobName + ".pdf")
+            if returncode != 0 or not os.path.exists(pdfPath):
+                pdfPath = None
+            compiled = CompileResult(pdfPath, returncode, seconds, log, engine=attempt.name)
+            if compiled.ok or not compiled.metrics.capacityExceeded:
+                break
+        return compiled
+
+
+# Default renderers of every running event loop, by engine and concurrency.
+_DEFAULTS = weakref.WeakKeyDictionary()
+
+
+async def Render(arch, engine="pdflatex", timeout=None, concurrency=None, baseDir=None):
+    """
+    Render an architecture to PDF on a shared default :class:`Renderer`.
+
+    Renders on the same event loop with the same engine and concurrency
+    share one renderer, so their TeX processes are bounded together.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex".
+    timeout : float, optional
+        Seconds before the TeX run is killed, by default no limit.
+    concurrency : int, optional
+        Most TeX processes running at once, by default one per core.
+    baseDir : str, optional
+        Directory relative input image paths are resolved against, by
+        default the current directory.
+
+    Returns
+    -------
+    bytes
+        The PDF.
+
+    Raises
+    ------
+    asyncio.TimeoutError
+        If TeX ran longer than the timeout; it has been killed.
+    RenderError
+        If TeX failed.
+    """
+    renderers = _DEFAULTS.setdefault(asyncio.get_running_loop(), {})
+    key = (GetEngine(engine), concurrency or DEFAULT_CONCURRENCY)
+    renderer = renderers.get(key)
+    if renderer is None:
+        renderer = renderers[key] = Renderer(concurrency, engine)
+    return await renderer.Render(arch, timeout=timeout, baseDir=baseDir)
@@ -0,0 +1,326 @@
+"""
+Benchmarks for generation and compilation.
+
+Each case runs in a fresh interpreter so its peak resident set size is its
+own. Results are plain JSON, so a run can be saved as a baseline and later
+runs compared against it to catch regressions in ``TikzGen.py`` or in the
+``Layers/`` packages.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .Build import CompileTex, LoadArch, Relocate, Transform
+from .Engines import GetEngine
+from .Nodes import Flatten
+from .Paths import PACKAGE_ROOT
+from .TikzGen import ToBegin, ToConnection, ToConv, ToCor, ToEnd, ToGenerate, ToHead
+
+SCRIPTS = {
+    "UNet": os.path.join("PyExamples", "UNet.py"),
+    "resnet50": os.path.join("Diagrams", "resnet50.py"),
+}
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.10
+
+# Metrics compared against a baseline, each with the smallest absolute
+# increase that counts, so timer noise on tiny cases is not a regression.
+METRICS = {
+    "buildSeconds": 0.005,
+    "generateSeconds": 0.005,
+    "compileSeconds": 0.05,
+    "peakRssKiB": 1024,
+    "texBytes": 0,
+    "pdfBytes": 0,
+}
+
+
+def SyntheticChain(n):
+    """
+    Generate a chain of convolutions joined by connections.
+
+    Parameters
+    ----------
+    n : int
+        Number of ``ToConv``/``ToConnection`` pairs.
+
+    Yields
+    ------
+    Nodes.Node
+        The architecture, from ``ToHead`` to ``ToEnd``.
+    """
+    yield ToHead(PACKAGE_ROOT)
+    yield ToCor()
+    yield ToBegin()
+    yield ToConv("conv0", 64, 64, offset="(0,0,0)", to="(0,0,0)", height=32, depth=32, width=2)
+    for i in range(1, n):
+        yield ToConv(
+            f"conv{i}", 64, 64, offset="(1,0,0)", to=f"(conv{i - 1}-east)", height=32, depth=32, width=2
+        )
+        yield ToConnection(f"conv{i - 1}", f"conv{i}")
+    yield ToEnd()
+
+
+def Cases(sizes=DEFAULT_SIZES):
+    """
+    List the benchmark case names.
+
+    Parameters
+    ----------
+    sizes : iterable of int, optional
+        Lengths of the synthetic chains, by default 10 to 100000.
+
+    Returns
+    -------
+    list of str
+        The example scripts followed by ``chain-<n>`` for every size.
+    """
+    return list(SCRIPTS) + [f"chain-{n}" for n in sizes]
+
+
+def _Arch(case):
+    """
+    Build the architecture of a case.
+
+    Parameters
+    ----------
+    case : str
+        Case name from :func:`Cases`.
+
+    Returns
+    -------
+    list
+        The architecture, with paths made absolute so it compiles anywhere.
+    """
+    if case.startswith("chain-"):
+        return list(SyntheticChain(int(case[len("chain-"):])))
+    script = os.path.join(PACKAGE_ROOT, SCRIPTS[case])
+    return list(Relocate(LoadArch(script), os.path.dirname(script)))
+
+
+def _PeakRssKiB():
+    """
+    Return the peak resident set size of this process.
+
+    Returns
+    -------
+    int or None
+        Peak RSS in KiB, None where ``resource`` is unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def RunCase(case, repeat=3, engine=None, timeout=None, transforms=()):
+    """
+    Measure one case in the current process.
+
+    Parameters
+    ----------
+    case : str
+        Case name from :func:`Cases`.
+    repeat : int, optional
+        Number of build and generation runs, the fastest of which are kept,
+        by default 3.
+    engine : str, optional
+        TeX engine to compile with, by default the case is not compiled.
+    timeout : float, optional
+        Seconds before the TeX run is killed, by default no limit.
+    transforms : sequence of callable, optional
+        Rewrites applied to the architecture as part of generation, as for
+        ``Build.Transform``, by default none.
+
+    Returns
+    -------
+    dict
+        Layer count, build and generation time, peak RSS, ``.tex`` size and,
+        if compiled, compile time, TeX's status, PDF size, main memory and
+        the resource closest to its limit.
+    """
+    buildSeconds = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        arch = _Arch(case)
+        seconds = time.perf_counter() - start
+        buildSeconds = seconds if buildSeconds is None else min(buildSeconds, seconds)
+    result = {"nodes": sum(1 for _ in Flatten(arch)), "buildSeconds": buildSeconds}
+
+    with tempfile.TemporaryDirectory(prefix="plotneuralnet-bench-") as workDir:
+        texPath = os.path.join(workDir, case + ".tex")
+        best = None
+        for _ in range(max(repeat, 1)):
+            if os.path.exists(texPath):
+                os.remove(texPath)
+            start = time.perf_counter()
+            ToGenerate(Transform(arch, transforms), texPath)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        result["generateSeconds"] = best
+        result["texBytes"] = os.path.getsize(texPath)
+        result["peakRssKiB"] = _PeakRssKiB()
+
+        if engine is not None:
+            compiled = CompileTex(texPath, engine=engine, timeout=timeout)
+            result["compileSeconds"] = compiled.seconds
+            result["compileEngine"] = compiled.engine
+            result["compileOk"] = compiled.ok
+            result["pdfBytes"] = os.path.getsize(compiled.pdfPath) if compiled.ok else None
+            mainMemory = compiled.metrics.mainMemory
+            result["texMainMemory"] = list(mainMemory) if mainMemory else None
+            tightest = compiled.metrics.Tightest()
+            result["texTightest"] = list(tightest) if tightest else None
+    return result
+
+
+def RunAll(
+    cases, repeat=3, engine="pdflatex", timeout=None, compileMaxNodes=5000, transforms=()
+):
+    """
+    Measure every case, each in a fresh process.
+
+    Parameters
+    ----------
+    cases : iterable of str
+        Case names from :func:`Cases`.
+    repeat : int, optional
+        Number of build and generation runs per case, by default 3.
+    engine : Engines.Engine, str or None, optional
+        TeX engine or its name, by default "pdflatex". Compilation is
+        skipped if it is None or not installed.
+    timeout : float, optional
+        Seconds before a TeX run is killed, by default no limit.
+    compileMaxNodes : int, optional
+        Cases with more nodes than this are not compiled, by default 5000.
+    transforms : sequence of callable, optional
+        Rewrites applied as part of generation, by default none.
+
+    Returns
+    -------
+    dict
+        Environment description and per-case results, ready for JSON.
+    """
+    if engine is not None and shutil.which(GetEngine(engine).Attempts()[0].name) is None:
+        engine = None
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        nodes = 2 * int(case[len("chain-"):]) + 3 if case.startswith("chain-") else 0
+        caseEngine = engine if nodes <= compileMaxNodes else None
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[case] = pool.submit(
+                RunCase, case, repeat, caseEngine, timeout, transforms
+            ).result()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "engine": None if engine is None else str(engine),
+        "cases": results,
+    }
+
+
+def Save(results, path):
+    """
+    Write benchmark results as JSON.
+
+    Parameters
+    ----------
+    results : dict
+        Results from :func:`RunAll`.
+    path : str
+        Output file.
+
+    Returns
+    -------
+    None
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def Load(path):
+    """
+    Read benchmark results written by :func:`Save`.
+
+    Parameters
+    ----------
+    path : str
+        Input file.
+
+    Returns
+    -------
+    dict
+        The results.
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def Changes(baseline, current):
+    """
+    Pair every metric with its baseline value.
+
+    Parameters
+    ----------
+    baseline : dict
+        Earlier results from :func:`RunAll`.
+    current : dict
+        New results from :func:`RunAll`.
+
+    Returns
+    -------
+    list of tuple of (str, str, float, float)
+        Case, metric, baseline value and current value of every metric in
+        ``METRICS`` measured in both runs.
+    """
+    changes = []
+    for case, now in current["cases"].items():
+        before = baseline.get("cases", {}).get(case)
+        if before is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), now.get(metric)
+            if old is not None and new is not None:
+                changes.append((case, metric, old, new))
+    return changes
+
+
+def Compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Find the metrics that got worse than a baseline.
+
+    Parameters
+    ----------
+    baseline : dict
+        Earlier results from :func:`RunAll`.
+    current : dict
+        New results from :func:`RunAll`.
+    threshold : float, optional
+        Relative increase tolerated, by default 0.10 (10%).
+
+    Returns
+    -------
+    list of tuple of (str, str, float, float)
+        Case, metric, baseline value and current value of every regression.
+    """
+    return [
+        (case, metric, old, new)
+        for case, metric, old, new in Changes(baseline, current)
+        if new > old * (1 + threshold) and new - old > METRICS[metric]
+    ]
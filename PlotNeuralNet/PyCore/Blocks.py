@@ -1,16 +1,35 @@
+import warnings
+
 from .TikzGen import *
 
 
+def _Filters(function, sFilter, nFilter, sFiler, nFiler):
+    """Resolve the deprecated ``sFiler``/``nFiler`` spellings of the filter arguments."""
+    if sFiler is not None:
+        warnings.warn(
+            f"{function}(): sFiler is deprecated, use sFilter", DeprecationWarning, stacklevel=3
+        )
+        sFilter = sFiler
+    if nFiler is not None:
+        warnings.warn(
+            f"{function}(): nFiler is deprecated, use nFilter", DeprecationWarning, stacklevel=3
+        )
+        nFilter = nFiler
+    return sFilter, nFilter
+
+
 # define new block
 def Block2ConvPool(
     name,
     botton,
     top,
-    sFiler=256,
-    nFiler=64,
+    sFilter=256,
+    nFilter=64,
     offset="(1,0,0)",
     size=(32, 32, 3.5),
     opacity=0.5,
+    sFiler=None,
+    nFiler=None,
 ):
     """
     Create a block with two convolutional layers followed by a pooling layer.
@@ -23,9 +42,9 @@ def Block2ConvPool(
         The node from which the block starts.
     top : str
         The node where the block ends.
-    sFiler : int, optional
+    sFilter : int, optional
         Size of the filter, by default 256.
-    nFiler : int, optional
+    nFilter : int, optional
         Number of filters, by default 64.
     offset : str, optional
         Position offset, by default "(1,0,0)".
@@ -33,45 +52,53 @@ def Block2ConvPool(
         Size dimensions (height, depth, width), by default (32, 32, 3.5).
     opacity : float, optional
         Opacity for the pooling layer, by default 0.5.
+    sFiler, nFiler : int, optional
+        Deprecated spellings of ``sFilter`` and ``nFilter``.
 
     Returns
     -------
-    list of str
+    list of Nodes.Node
         LaTeX code for the convolutional and pooling layers.
     """
-    return [
-        ToConvConvRelu(
-            name=f"ccr_{name}",
-            sFiler=str(sFiler),
-            nFiler=(nFiler, nFiler),
-            offset=offset,
-            to=f"({botton}-east)",
-            width=(size[2], size[2]),
-            height=size[0],
-            depth=size[1],
-        ),
-        ToPool(
-            name=f"{top}",
-            offset="(0,0,0)",
-            to=f"(ccr_{name}-east)",
-            width=1,
-            height=size[0] - int(size[0] / 4),
-            depth=size[1] - int(size[0] / 4),
-            opacity=opacity,
-        ),
-        ToConnection(f"{botton}", f"ccr_{name}"),
-    ]
+    sFilter, nFilter = _Filters("Block2ConvPool", sFilter, nFilter, sFiler, nFiler)
+    return ToGroup(
+        name,
+        [
+            ToConvConvRelu(
+                name=f"ccr_{name}",
+                sFilter=str(sFilter),
+                nFilter=(nFilter, nFilter),
+                offset=offset,
+                to=f"({botton}-east)",
+                width=(size[2], size[2]),
+                height=size[0],
+                depth=size[1],
+            ),
+            ToPool(
+                name=f"{top}",
+                offset="(0,0,0)",
+                to=f"(ccr_{name}-east)",
+                width=1,
+                height=size[0] - int(size[0] / 4),
+                depth=size[1] - int(size[0] / 4),
+                opacity=opacity,
+            ),
+            ToConnection(f"{botton}", f"ccr_{name}"),
+        ],
+    )
 
 
 def BlockUnconv(
     name,
     botton,
     top,
-    sFiler=256,
-    nFiler=64,
+    sFilter=256,
+    nFilter=64,
     offset="(1,0,0)",
     size=(32, 32, 3.5),
     opacity=0.5,
+    sFiler=None,
+    nFiler=None,
 ):
     """
     Create a block with an unpooling layer and convolutional layers.
@@ -84,9 +111,9 @@ def BlockUnconv(
         The node from which the block starts.
     top : str
         The node where the block ends.
-    sFiler : int, optional
+    sFilter : int, optional
         Size of the filter, by default 256.
-    nFiler : int, optional
+    nFilter : int, optional
         Number of filters, by default 64.
     offset : str, optional
         Position offset, by default "(1,0,0)".
@@ -94,66 +121,72 @@ def BlockUnconv(
         Size dimensions (height, depth, width), by default (32, 32, 3.5).
     opacity : float, optional
         Opacity for the layers, by default 0.5.
+    sFiler, nFiler : int, optional
+        Deprecated spellings of ``sFilter`` and ``nFilter``.
 
     Returns
     -------
-    list of str
+    list of Nodes.Node
         LaTeX code for the unpooling and convolutional layers.
     """
-    return [
-        ToUnPool(
-            name=f"unpool_{name}",
-            offset=offset,
-            to=f"({botton}-east)",
-            width=1,
-            height=size[0],
-            depth=size[1],
-            opacity=opacity,
-        ),
-        ToConvRes(
-            name=f"ccr_res_{name}",
-            offset="(0,0,0)",
-            to=f"(unpool_{name}-east)",
-            sFiler=str(sFiler),
-            nFiler=str(nFiler),
-            width=size[2],
-            height=size[0],
-            depth=size[1],
-            opacity=opacity,
-        ),
-        ToConv(
-            name=f"ccr_{name}",
-            offset="(0,0,0)",
-            to=f"(ccr_res_{name}-east)",
-            sFiler=str(sFiler),
-            nFiler=str(nFiler),
-            width=size[2],
-            height=size[0],
-            depth=size[1],
-        ),
-        ToConvRes(
-            name=f"ccr_res_c_{name}",
-            offset="(0,0,0)",
-            to=f"(ccr_{name}-east)",
-            sFiler=str(sFiler),
-            nFiler=str(nFiler),
-            width=size[2],
-            height=size[0],
-            depth=size[1],
-            opacity=opacity,
-        ),
-        ToConv(
-            name=f"{top}",
-            offset="(0,0,0)",
-            to=f"(ccr_res_c_{name}-east)",
-            sFiler=str(sFiler),
-            nFiler=str(nFiler),
-            width=size[2],
-            height=size[0],
-            depth=size[1],
-        ),
-        ToConnection(f"{botton}", f"unpool_{name}"),
-    ]
+    sFilter, nFilter = _Filters("BlockUnconv", sFilter, nFilter, sFiler, nFiler)
+    return ToGroup(
+        name,
+        [
+            ToUnPool(
+                name=f"unpool_{name}",
+                offset=offset,
+                to=f"({botton}-east)",
+                width=1,
+                height=size[0],
+                depth=size[1],
+                opacity=opacity,
+            ),
+            ToConvRes(
+                name=f"ccr_res_{name}",
+                offset="(0,0,0)",
+                to=f"(unpool_{name}-east)",
+                sFilter=str(sFilter),
+                nFilter=str(nFilter),
+                width=size[2],
+                height=size[0],
+                depth=size[1],
+                opacity=opacity,
+            ),
+            ToConv(
+                name=f"ccr_{name}",
+                offset="(0,0,0)",
+                to=f"(ccr_res_{name}-east)",
+                sFilter=str(sFilter),
+                nFilter=str(nFilter),
+                width=size[2],
+                height=size[0],
+                depth=size[1],
+            ),
+            ToConvRes(
+                name=f"ccr_res_c_{name}",
+                offset="(0,0,0)",
+                to=f"(ccr_{name}-east)",
+                sFilter=str(sFilter),
+                nFilter=str(nFilter),
+                width=size[2],
+                height=size[0],
+                depth=size[1],
+                opacity=opacity,
+            ),
+            ToConv(
+                name=f"{top}",
+                offset="(0,0,0)",
+                to=f"(ccr_res_c_{name}-east)",
+                sFilter=str(sFilter),
+                nFilter=str(nFilter),
+                width=size[2],
+                height=size[0],
+                depth=size[1],
+            ),
+            ToConnection(f"{botton}", f"unpool_{name}"),
+        ],
+    )
 
 
 def BlockRes(
@@ -161,11 +194,13 @@ def BlockRes(
     name,
     botton,
     top,
-    sFiler=256,
-    nFiler=64,
+    sFilter=256,
+    nFilter=64,
     offset="(0,0,0)",
     size=(32, 32, 3.5),
     opacity=0.5,
+    sFiler=None,
+    nFiler=None,
 ):
     """
     Create a residual block with multiple convolutional layers and a skip connection.
@@ -180,9 +215,9 @@ def BlockRes(
         The node from which the block starts.
     top : str
         The node where the block ends.
-    sFiler : int, optional
+    sFilter : int, optional
         Size of the filter, by default 256.
-    nFiler : int, optional
+    nFilter : int, optional
         Number of filters, by default 64.
     offset : str, optional
         Position offset, by default "(0,0,0)".
@@ -190,12 +225,15 @@ def BlockRes(
         Size dimensions (height, depth, width), by default (32, 32, 3.5).
     opacity : float, optional
         Opacity for the skip connection, by default 0.5.
+    sFiler, nFiler : int, optional
+        Deprecated spellings of ``sFilter`` and ``nFilter``.
 
     Returns
     -------
-    list of str
+    list of Nodes.Node
         LaTeX code for the residual block.
     """
+    sFilter, nFilter = _Filters("BlockRes", sFilter, nFilter, sFiler, nFiler)
     lys = []
     layers = [f"{name}_{i}" for i in range(num - 1)] + [top]
     for layerName in layers:
@@ -204,8 +242,8 @@ def BlockRes(
                 name=f"{layerName}",
                 offset=offset,
                 to=f"({botton}-east)",
-                sFiler=str(sFiler),
-                nFiler=str(nFiler),
+                sFilter=str(sFilter),
+                nFilter=str(nFilter),
                 width=size[2],
                 height=size[0],
                 depth=size[1],
@@ -218,4 +256,4 @@ def BlockRes(
     lys += [
         ToSkip(of=layers[1], to=layers[-2], pos=1.25),
     ]
-    return lys
+    return ToGroup(name, lys)
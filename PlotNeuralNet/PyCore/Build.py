@@ -0,0 +1,640 @@
+"""
+Batch building of architecture scripts into PDFs.
+
+Every job generates its ``.tex`` and runs TeX in a private temporary
+directory, so concurrent builds never see each other's files.
+"""
+
+import os
+import re
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from . import Pdf
+from .CompileCache import DEFAULT_MAX_BYTES, CompileCache, DefaultDirectory
+from .Engines import GetEngine, SelectEngine
+from .Format import EnsureFormat
+from .Nodes import Flatten, Head, Input, Node
+from .Onnx import LoadOnnx
+from .Paged import Cost, Segments
+from .Paths import LAYERS_DIR, PACKAGE_ROOT
+from .Spec import FORMATS, IsSpec, LoadSpec
+from .TexLog import ParseLog
+from .TikzGen import ToGenerate
+
+DEFAULT_ROOTS = ("PyExamples", "Diagrams")
+
+_ARCH_PATTERN = re.compile(r"^arch\s*=", re.MULTILINE)
+
+
+class CompileResult:
+    """
+    Outcome of one TeX run.
+
+    Attributes
+    ----------
+    pdfPath : str or None
+        Path to the produced PDF, None if TeX failed.
+    returncode : int
+        Exit status of the TeX engine.
+    seconds : float
+        Wall time of the TeX run.
+    log : str
+        Contents of the TeX log file, empty if none was written.
+    metrics : TexLog.TexMetrics
+        Resource usage, warnings and errors parsed from the log.
+    engine : str or None
+        Name of the engine that ran, None if unknown.
+    """
+
+    __slots__ = ("pdfPath", "returncode", "seconds", "log", "metrics", "engine")
+
+    def __init__(self, pdfPath, returncode, seconds, log, metrics=None, engine=None):
+        self.pdfPath = pdfPath
+        self.returncode = returncode
+        self.seconds = seconds
+        self.log = log
+        self.metrics = ParseLog(log) if metrics is None else metrics
+        self.engine = engine
+
+    @property
+    def ok(self):
+        return self.pdfPath is not None
+
+
+class BuildResult:
+    """
+    Outcome of building one architecture script.
+
+    Attributes
+    ----------
+    script : str
+        Path to the architecture script.
+    pdfPath : str or None
+        Path to the copied PDF, None if the build failed.
+    generateSeconds : float
+        Time spent importing the script and writing the ``.tex``.
+    compileSeconds : float
+        Time spent in TeX.
+    error : str or None
+        Description of the failure, None on success.
+    cached : bool
+        Whether the PDF came from the compile cache instead of TeX.
+    metrics : TexLog.TexMetrics or None
+        Metrics of the TeX run, None if TeX did not run.
+    engine : str or None
+        Name of the engine that compiled the PDF, None if TeX did not run.
+    """
+
+    __slots__ = (
+        "script",
+        "pdfPath",
+        "generateSeconds",
+        "compileSeconds",
+        "error",
+        "cached",
+        "metrics",
+        "engine",
+    )
+
+    def __init__(
+        self,
+        script,
+        pdfPath=None,
+        generateSeconds=0.0,
+        compileSeconds=0.0,
+        error=None,
+        cached=False,
+        metrics=None,
+        engine=None,
+    ):
+        self.script = script
+        self.pdfPath = pdfPath
+        self.generateSeconds = generateSeconds
+        self.compileSeconds = compileSeconds
+        self.error = error
+        self.cached = cached
+        self.metrics = metrics
+        self.engine = engine
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def Discover(roots=None):
+    """
+    Find architecture scripts, i.e. Python files defining a module-level
+    ``arch``, layer specs (see :mod:`Spec`) and ONNX models.
+
+    Parameters
+    ----------
+    roots : iterable of str, optional
+        Files or directories to search. Defaults to ``PyExamples/`` and
+        ``Diagrams/`` inside the package.
+
+    Returns
+    -------
+    list of str
+        Sorted paths to the scripts found.
+    """
+    if roots is None:
+        roots = [os.path.join(PACKAGE_ROOT, root) for root in DEFAULT_ROOTS]
+
+    scripts = set()
+    for root in roots:
+        if os.path.isfile(root):
+            scripts.add(os.path.abspath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith((".", "__"))]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.lower().endswith(".onnx"):
+                    scripts.add(os.path.abspath(path))
+                    continue
+                if os.path.splitext(filename)[1].lower() in FORMATS:
+                    if IsSpec(path):
+                        scripts.add(os.path.abspath(path))
+                    continue
+                if not filename.endswith(".py") or filename.startswith("__"):
+                    continue
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    if _ARCH_PATTERN.search(f.read()):
+                        scripts.add(os.path.abspath(path))
+    return sorted(scripts)
+
+
+def LoadArch(script):
+    """
+    Import an architecture script without running its ``__main__`` block.
+
+    As with ``python script.py``, the script's directory comes first on
+    ``sys.path`` while it runs, so it can import its sibling modules.
+
+    Parameters
+    ----------
+    script : str
+        Path to the script, or to a layer spec or ONNX model, which is read
+        instead.
+
+    Returns
+    -------
+    iterable
+        The script's ``arch``.
+    """
+    extension = os.path.splitext(script)[1].lower()
+    if extension == ".onnx":
+        return LoadOnnx(script)
+    if extension in FORMATS:
+        return LoadSpec(script)
+    path = list(sys.path)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    try:
+        namespace = runpy.run_path(script, run_name="__plotneuralnet_build__")
+    finally:
+        sys.path[:] = path
+    if "arch" not in namespace:
+        raise ValueError(f"{script} does not define 'arch'")
+    return namespace["arch"]
+
+
+def Relocate(arch, baseDir, projectPath=PACKAGE_ROOT):
+    """
+    Point an architecture's layer packages and input images at absolute paths.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture nodes and fragments.
+    baseDir : str
+        Directory relative input image paths are resolved against.
+    projectPath : str, optional
+        Directory containing ``Layers/``, by default the installed package.
+
+    Yields
+    ------
+    Node, str or list
+        The architecture with ``Head`` and ``Input`` nodes rewritten. Blocks
+        (nested lists) stay lists, so later rewrites can tell them apart.
+    """
+    for c in arch:
+        if not isinstance(c, (str, Node)) and hasattr(c, "__iter__"):
+            yield list(Relocate(c, baseDir, projectPath))
+            continue
+        if isinstance(c, Head):
+            c = c.Replace(projectPath=projectPath)
+        elif isinstance(c, Input) and not os.path.isabs(c.pathFile):
+            c = c.Replace(
+                pathFile=os.path.normpath(os.path.join(baseDir, c.pathFile)).replace("\\", "/")
+            )
+        yield c
+
+
+def UsePics(arch, pics):
+    """
+    Select the implementation of the layer pics of an architecture.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture nodes and fragments.
+    pics : str
+        One of ``Nodes.Head.PICS``.
+
+    Yields
+    ------
+    Node or str
+        The architecture with its ``Head`` nodes rewritten.
+    """
+    for c in Flatten(arch):
+        if isinstance(c, Head):
+            c = c.Replace(pics=pics)
+        yield c
+
+
+def Transform(arch, transforms=()):
+    """
+    Apply architecture rewrites in order.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture nodes and fragments.
+    transforms : sequence of callable, optional
+        Functions taking and returning an architecture, by default none.
+
+    Returns
+    -------
+    iterable
+        The rewritten architecture.
+    """
+    for transform in transforms:
+        arch = transform(arch)
+    return arch
+
+
+def TexEnvironment(env=None):
+    """
+    Return an environment whose ``TEXINPUTS`` finds the ``Layers/`` packages.
+
+    Parameters
+    ----------
+    env : dict, optional
+        Base environment, by default ``os.environ``.
+
+    Returns
+    -------
+    dict
+        Copy of the environment with ``TEXINPUTS`` extended.
+    """
+    env = dict(os.environ if env is None else env)
+    # The trailing separator keeps the engine's default search path.
+    env["TEXINPUTS"] = os.pathsep.join([LAYERS_DIR, env.get("TEXINPUTS", "")]).rstrip(
+        os.pathsep
+    ) + os.pathsep
+    return env
+
+
+def CompileTex(texPath, engine="pdflatex", timeout=None, fmt=None):
+    """
+    Run TeX on a file, writing all outputs next to it.
+
+    With the "auto" engine, a run that exceeds TeX's capacity is repeated
+    with the next engine of ``Engines.AUTO_ENGINES``.
+
+    Parameters
+    ----------
+    texPath : str
+        Path to the ``.tex`` file.
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex".
+    timeout : float, optional
+        Seconds before a run is killed, by default no limit.
+    fmt : str, optional
+        Precompiled format from :func:`Format.EnsureFormat` to load instead
+        of reading the preamble, by default None. It is only used by the
+        first engine tried.
+
+    Returns
+    -------
+    CompileResult
+        The PDF path, exit status, timing, log and engine of the last run;
+        the time includes the runs that ran out of capacity.
+    """
+    workDir, texName = os.path.split(os.path.abspath(texPath))
+    jobName = os.path.splitext(texName)[0]
+    seconds = 0.0
+    for attempt in GetEngine(engine).Attempts():
+        command = attempt.Command(texName, fmt)
+        env = attempt.Environment(TexEnvironment())
+        if fmt is not None:
+            env["TEXFORMATS"] = os.path.dirname(fmt) + os.pathsep + env.get("TEXFORMATS", "")
+        fmt = None
+
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(
+                command,
+                cwd=workDir,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+            )
+            returncode = completed.returncode
+        except subprocess.TimeoutExpired:
+            returncode = -1
+        seconds += time.perf_counter() - start
+
+        log = ""
+        logPath = os.path.join(workDir, jobName + ".log")
+        if os.path.exists(logPath):
+            with open(logPath, encoding="utf-8", errors="replace") as f:
+                log = f.read()
+
+        pdfPath = os.path.join(workDir, jobName + ".pdf")
+        if returncode != 0 or not os.path.exists(pdfPath):
+            pdfPath = None
+        compiled = CompileResult(pdfPath, returncode, seconds, log, engine=attempt.name)
+        if compiled.ok or not compiled.metrics.capacityExceeded:
+            break
+    return compiled
+
+
+def CompilePages(texPaths, pdfPath, engine="pdflatex", timeout=None, fmt=None, jobs=None):
+    """
+    Run TeX on the pages of a document in parallel and merge their PDFs.
+
+    Parameters
+    ----------
+    texPaths : list of str
+        Paths to the ``.tex`` file of every page, in order, each in a
+        directory of its own or with a distinct name.
+    pdfPath : str
+        Where to write the merged PDF.
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex".
+    timeout : float, optional
+        Seconds before a page's run is killed, by default no limit.
+    fmt : str, optional
+        Precompiled format of the pages' shared preamble, by default None.
+    jobs : int, optional
+        Most TeX runs at once, by default one per core.
+
+    Returns
+    -------
+    CompileResult
+        The first failed page's run, or the merged PDF with the wall time
+        of all runs, the engines that ran and the log and metrics of the
+        page closest to a TeX limit.
+    """
+    jobs = min(jobs or os.cpu_count() or 1, max(len(texPaths), 1))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pages = list(
+            pool.map(
+                lambda texPath: CompileTex(texPath, engine=engine, timeout=timeout, fmt=fmt),
+                texPaths,
+            )
+        )
+    seconds = time.perf_counter() - start
+
+    for page in pages:
+        if not page.ok:
+            return CompileResult(
+                None, page.returncode, seconds, page.log, page.metrics, page.engine
+            )
+    Pdf.Merge([page.pdfPath for page in pages], pdfPath)
+
+    def Headroom(page):
+        tightest = page.metrics.Tightest()
+        return 1.0 if tightest is None else tightest[1]
+
+    tightest = min(pages, key=Headroom)
+    # With "auto", pages may have needed different engines.
+    engines = ",".join(sorted({page.engine for page in pages}))
+    return CompileResult(pdfPath, 0, seconds, tightest.log, tightest.metrics, engines)
+
+
+def BuildScript(
+    script,
+    outputDir=None,
+    engine="pdflatex",
+    timeout=None,
+    cacheDir=None,
+    cacheMaxBytes=DEFAULT_MAX_BYTES,
+    precompile=False,
+    transforms=(),
+    pageLayers=None,
+    pageCost=None,
+):
+    """
+    Generate and compile one architecture script in an isolated directory.
+
+    Parameters
+    ----------
+    script : str
+        Path to the architecture script.
+    outputDir : str, optional
+        Where to copy the PDF, by default next to the script.
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex". With "auto", large
+        diagrams (or pages) go straight to LuaLaTeX.
+    timeout : float, optional
+        Seconds before the TeX run is killed, by default no limit.
+    cacheDir : str, optional
+        Compile cache directory. When given, an unchanged document is served
+        from the cache without running TeX. By default no cache is used.
+    cacheMaxBytes : int, optional
+        Size limit of the compile cache, by default 512 MiB.
+    precompile : bool, optional
+        Load the preamble from a precompiled format, dumping it on first use,
+        by default False.
+    transforms : sequence of callable, optional
+        Rewrites applied in order to the architecture before it is written,
+        e.g. ``Layout.Flat``. They must be picklable to run on a process
+        pool. By default none.
+    pageLayers : int, optional
+        Split the diagram into pages of at most this many layers, compiled
+        in parallel and merged into one PDF, by default one page.
+    pageCost : float, optional
+        Split the diagram into pages of at most this estimated TeX cost
+        (see ``Paged.Cost``), by default one page.
+
+    Returns
+    -------
+    BuildResult
+        The PDF path, timings and error, if any.
+    """
+    script = os.path.abspath(script)
+    scriptDir = os.path.dirname(script)
+    jobName = os.path.splitext(os.path.basename(script))[0]
+    result = BuildResult(script)
+
+    with tempfile.TemporaryDirectory(prefix="plotneuralnet-") as workDir:
+        texPaths = [os.path.join(workDir, jobName + ".tex")]
+
+        start = time.perf_counter()
+        try:
+            arch = list(Relocate(LoadArch(script), scriptDir))
+            pages = [arch]
+            if pageLayers or pageCost:
+                # The rewrites apply to every page, so ``Layout.Flat`` and the
+                # like still see layers.
+                pages = Segments(arch, pageLayers, pageCost)
+                texPaths = [
+                    os.path.join(workDir, f"{jobName}-{n}.tex") for n in range(1, len(pages) + 1)
+                ]
+                for page, texPath in zip(pages, texPaths):
+                    ToGenerate(Transform(page, transforms), texPath)
+            else:
+                ToGenerate(Transform(arch, transforms), texPaths[0])
+        except Exception as e:
+            result.error = f"generation failed: {type(e).__name__}: {e}"
+            return result
+        finally:
+            result.generateSeconds = time.perf_counter() - start
+
+        if GetEngine(engine).auto:
+            engine = SelectEngine(
+                engine, max(sum(Cost(c) for c in Flatten(page)) for page in pages)
+            )
+
+        cache = key = None
+        if cacheDir is not None:
+            cache = CompileCache(cacheDir, cacheMaxBytes)
+            key = cache.Key(texPaths, engine)
+            pdfPath = cache.Get(key)
+            result.cached = pdfPath is not None
+
+        if not result.cached:
+            fmt = None
+            if precompile:
+                fmt = EnsureFormat(
+                    texPaths[0],
+                    engine,
+                    directory=os.path.join(cacheDir or DefaultDirectory(), "formats"),
+                    timeout=timeout,
+                    env=TexEnvironment(),
+                )
+            try:
+                if len(texPaths) == 1:
+                    compiled = CompileTex(texPaths[0], engine=engine, timeout=timeout, fmt=fmt)
+                else:
+                    compiled = CompilePages(
+                        texPaths,
+                        os.path.join(workDir, jobName + ".pdf"),
+                        engine=engine,
+                        timeout=timeout,
+                        fmt=fmt,
+                    )
+            except OSError as e:
+                result.error = f"could not run {engine}: {e}"
+                return result
+            except Pdf.PdfError as e:
+                result.error = f"merging pages failed: {e}"
+                return result
+            result.compileSeconds = compiled.seconds
+            result.metrics = compiled.metrics
+            result.engine = compiled.engine
+            if not compiled.ok:
+                result.error = CompileError(compiled, compiled.engine or engine)
+                return result
+            pdfPath = compiled.pdfPath
+            if cache is not None:
+                cache.Put(key, pdfPath)
+
+        destination = os.path.join(outputDir or scriptDir, jobName + ".pdf")
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(pdfPath, destination)
+        result.pdfPath = destination
+
+    return result
+
+
+def BuildAll(scripts, jobs=None, **options):
+    """
+    Build many architecture scripts concurrently on a process pool.
+
+    Parameters
+    ----------
+    scripts : iterable of str
+        Paths to the architecture scripts.
+    jobs : int, optional
+        Number of worker processes, by default one per core.
+    **options
+        Passed to :func:`BuildScript` for every script.
+
+    Yields
+    ------
+    BuildResult
+        One result per script, in completion order.
+    """
+    scripts = list(scripts)
+    jobs = min(jobs or os.cpu_count() or 1, max(len(scripts), 1))
+    if jobs == 1:
+        for script in scripts:
+            yield BuildScript(script, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(BuildScript, script, **options): script
+            for script in scripts
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield BuildResult(futures[future], error=f"{type(e).__name__}: {e}")
+
+
+def CompileError(compiled, engine="pdflatex"):
+    """
+    Describe a failed TeX run.
+
+    Parameters
+    ----------
+    compiled : CompileResult
+        The failed run.
+    engine : str, optional
+        TeX engine that ran, by default "pdflatex".
+
+    Returns
+    -------
+    str
+        Exit status, the exhausted resource if any, and the tail of the log.
+    """
+    error = f"{engine} exited with status {compiled.returncode}"
+    if compiled.metrics.capacityExceeded:
+        error += f" (TeX capacity exceeded: {compiled.metrics.capacityExceeded})"
+    return error + _LogTail(compiled.log)
+
+
+def _LogTail(log, lines=10):
+    """
+    Return the last lines of a TeX log, indented for error messages.
+
+    Parameters
+    ----------
+    log : str
+        Contents of the log.
+    lines : int, optional
+        Number of lines kept, by default 10.
+
+    Returns
+    -------
+    str
+        The tail of the log, or an empty string.
+    """
+    tail = [line for line in log.splitlines() if line.strip()][-lines:]
+    if not tail:
+        return ""
+    return "\n" + "\n".join("    " + line for line in tail)
@@ -0,0 +1,750 @@
+"""
+Command line interface, run as ``python -m PlotNeuralNet``.
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+
+from . import Bench, Build, Multi, Server
+from .Watch import Watcher
+from .Anchors import PruneAnchors
+from .Collapse import MODES, Collapse
+from .CompileCache import CompileCache, DefaultDirectory
+from .Engines import AUTO, ENGINES, MEMORY_SETTINGS, Engine
+from .Externalize import Externalize
+from .Images import PrepareImages
+from .Layout import Flat, Reuse
+from .Nodes import Head, Input
+from .Svg import ToGenerateSvg
+from .TikzGen import Draft
+
+
+def _Engine(args):
+    """
+    Build the TeX engine selected on the command line.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    Engines.Engine
+        The engine, with its extra arguments and memory settings.
+    """
+    return Engine(args.engine, args=args.engine_arg, memory=dict(args.tex_memory))
+
+
+def _MemorySetting(text):
+    """
+    Parse a ``--tex-memory`` value.
+
+    Parameters
+    ----------
+    text : str
+        Setting as ``name=value``, e.g. "extra_mem_top=10000000".
+
+    Returns
+    -------
+    tuple of (str, str)
+        The setting's name and value.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the text is not ``name=value`` or the name is unknown.
+    """
+    name, separator, value = text.partition("=")
+    name = name.strip()
+    if not separator or not value.strip():
+        raise argparse.ArgumentTypeError(f"expected name=value, got {text!r}")
+    if name not in MEMORY_SETTINGS:
+        raise argparse.ArgumentTypeError(
+            f"unknown setting {name!r}, expected one of {', '.join(MEMORY_SETTINGS)}"
+        )
+    return name, value.strip()
+
+
+def _Transforms(args):
+    """
+    Collect the architecture rewrites selected on the command line.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    list of callable
+        Rewrites for ``Build.Transform``, in the order they apply.
+    """
+    transforms = []
+    if args.collapse:
+        transforms.append(functools.partial(Collapse, mode=args.collapse))
+    if args.draft:
+        transforms.append(Draft)
+    elif args.pics != "standard":
+        transforms.append(functools.partial(Build.UsePics, pics=args.pics))
+    cacheDir = getattr(args, "cache_dir", None)
+    if args.externalize:
+        transforms.append(
+            functools.partial(
+                Externalize, cacheDir=cacheDir, engine=_Engine(args), timeout=args.timeout
+            )
+        )
+    elif args.reuse:
+        transforms.append(Reuse)
+    elif args.flat:
+        transforms.append(Flat)
+    if args.prune_anchors:
+        transforms.append(PruneAnchors)
+    if args.image_dpi:
+        transforms.append(functools.partial(PrepareImages, dpi=args.image_dpi, cacheDir=cacheDir))
+    return transforms
+
+
+def _DraftConflict(args):
+    """
+    Report draft pics requested together with a transform that replaces them.
+
+    ``--flat``, ``--reuse`` and ``--externalize`` draw every layer with the
+    full standard box paths, which would silently drop ``--draft``.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    bool
+        Whether the combination was requested; it is then reported.
+    """
+    if not (args.draft or args.pics == "draft"):
+        return False
+    replacing = [
+        f"--{name}" for name in ("flat", "reuse", "externalize") if getattr(args, name, False)
+    ]
+    if not replacing:
+        return False
+    print(f"--draft cannot be used with {', '.join(replacing)}", file=sys.stderr)
+    return True
+
+
+def _Build(args):
+    """
+    Build every architecture script found under the given paths.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit status, non-zero if any build failed.
+    """
+    scripts = Build.Discover(args.paths or None)
+    if not scripts:
+        print("no architecture scripts found", file=sys.stderr)
+        return 1
+
+    if _DraftConflict(args):
+        return 1
+
+    paging = {}
+    if args.page_layers or args.page_cost:
+        if args.single_pass:
+            print("--page-layers and --page-cost cannot be used with --single-pass", file=sys.stderr)
+            return 1
+        paging = {"pageLayers": args.page_layers, "pageCost": args.page_cost}
+
+    metricsFile = open(args.metrics_file, "a", encoding="utf-8") if args.metrics_file else None
+    start = time.perf_counter()
+    failed = 0
+    builder = Multi.BuildAll if args.single_pass else Build.BuildAll
+    for result in builder(
+        scripts,
+        jobs=args.jobs,
+        outputDir=args.output_dir,
+        engine=_Engine(args),
+        timeout=args.timeout,
+        cacheDir=None if args.no_cache else args.cache_dir,
+        cacheMaxBytes=int(args.cache_size * 1024 * 1024),
+        precompile=args.precompile,
+        transforms=_Transforms(args),
+        **paging,
+    ):
+        name = os.path.relpath(result.script)
+        timing = f"gen {result.generateSeconds * 1000:8.1f}ms  tex {result.compileSeconds:7.2f}s"
+        if args.engine == AUTO and result.engine:
+            timing += f" ({result.engine})"
+        if result.ok:
+            status = "cached" if result.cached else "ok"
+            print(f"{status:7s}{timing}  {name} -> {os.path.relpath(result.pdfPath)}")
+        else:
+            failed += 1
+            print(f"FAIL   {timing}  {name}: {result.error}")
+        if result.metrics is not None:
+            tightest = result.metrics.Tightest()
+            if tightest is not None and tightest[1] < args.headroom_warning:
+                print(f"warn   {name}: TeX {tightest[0]} is {1 - tightest[1]:.0%} full")
+            if metricsFile is not None:
+                record = {
+                    "time": time.time(),
+                    "script": result.script,
+                    "engine": result.engine or args.engine,
+                    "ok": result.ok,
+                    "compileSeconds": result.compileSeconds,
+                }
+                record.update(result.metrics.ToDict())
+                metricsFile.write(json.dumps(record) + "\n")
+    if metricsFile is not None:
+        metricsFile.close()
+    print(
+        f"{len(scripts) - failed}/{len(scripts)} built in {time.perf_counter() - start:.2f}s"
+    )
+    return 1 if failed else 0
+
+
+def _Watch(args):
+    """
+    Regenerate and recompile architecture scripts whenever their sources change.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit status, non-zero if there was nothing to watch.
+    """
+    scripts = Build.Discover(args.paths or None)
+    if not scripts:
+        print("no architecture scripts found", file=sys.stderr)
+        return 1
+
+    def Report(event):
+        name = os.path.relpath(event.script)
+        tex = f"gen {event.generateSeconds * 1000:8.1f}ms"
+        if event.compiled is not None:
+            tex += f"  tex {event.compiled.seconds:7.2f}s"
+        if not event.ok:
+            print(f"FAIL   {tex}  {name}: {event.error}", flush=True)
+        elif event.compiled is not None:
+            pdfPath = os.path.relpath(event.compiled.pdfPath)
+            print(f"ok     {tex}  {name} -> {pdfPath}", flush=True)
+        else:
+            status = "tex" if event.texChanged else "same"
+            print(f"{status:7s}{tex}  {name} -> {os.path.relpath(event.texPath)}", flush=True)
+
+    print(f"watching {len(scripts)} scripts, press Ctrl-C to stop", flush=True)
+    Watcher(
+        scripts,
+        outputDir=args.output_dir,
+        engine=_Engine(args),
+        timeout=args.timeout,
+        compile=not args.no_compile,
+        transforms=[Draft] if args.draft else [],
+    ).Run(args.interval, Report)
+    return 0
+
+
+def _Bench(args):
+    """
+    Run the benchmarks, optionally saving them or comparing with a baseline.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit status, non-zero if a metric regressed past the threshold.
+    """
+    if _DraftConflict(args):
+        return 1
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    cases = args.cases or Bench.Cases(sizes)
+    results = Bench.RunAll(
+        cases,
+        repeat=args.repeat,
+        engine=None if args.no_compile else _Engine(args),
+        timeout=args.timeout,
+        compileMaxNodes=args.compile_max_nodes,
+        transforms=_Transforms(args),
+    )
+
+    print(f"{'case':14s}{'nodes':>8s}{'build ms':>10s}{'gen ms':>10s}{'rss MiB':>9s}{'tex KiB':>10s}{'tex s':>8s}{'pdf KiB':>9s}")
+    for case, r in results["cases"].items():
+        rss = f"{r['peakRssKiB'] / 1024:9.1f}" if r.get("peakRssKiB") else f"{'-':>9s}"
+        tex = f"{r['compileSeconds']:8.2f}" if "compileSeconds" in r else f"{'-':>8s}"
+        pdf = f"{r['pdfBytes'] / 1024:9.1f}" if r.get("pdfBytes") else f"{'-':>9s}"
+        print(
+            f"{case:14s}{r['nodes']:8d}{r['buildSeconds'] * 1000:10.1f}"
+            f"{r['generateSeconds'] * 1000:10.1f}{rss}"
+            f"{r['texBytes'] / 1024:10.1f}{tex}{pdf}"
+        )
+
+    if args.save:
+        Bench.Save(results, args.save)
+        print(f"saved {args.save}")
+    if args.baseline:
+        baseline = Bench.Load(args.baseline)
+        for case, metric, old, new in Bench.Changes(baseline, results):
+            if metric in ("buildSeconds", "generateSeconds", "compileSeconds") and old > 0:
+                print(f"{case:14s}{metric:16s}{old:10.3f}s -> {new:8.3f}s ({new / old - 1:+.0%})")
+        regressions = Bench.Compare(baseline, results, args.threshold)
+        for case, metric, old, new in regressions:
+            print(f"REGRESSION  {case} {metric}: {old:g} -> {new:g} ({new / old - 1:+.0%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+def _Svg(args):
+    """
+    Render architecture scripts to SVG without TeX.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit status, non-zero if a script failed.
+    """
+    scripts = Build.Discover(args.paths or None)
+    if not scripts:
+        print("no architecture scripts found", file=sys.stderr)
+        return 1
+    transforms = [functools.partial(Collapse, mode=args.collapse)] if args.collapse else []
+    failed = 0
+    for script in scripts:
+        baseDir = os.path.dirname(os.path.abspath(script))
+        outputDir = os.path.abspath(args.output_dir) if args.output_dir else baseDir
+        svgPath = os.path.join(outputDir, os.path.splitext(os.path.basename(script))[0] + ".svg")
+        start = time.perf_counter()
+        try:
+            arch = []
+            for c in Build.Transform(Build.LoadArch(script), transforms):
+                if isinstance(c, Input) and not os.path.isabs(c.pathFile):
+                    # Image paths are relative to the script, links to the SVG.
+                    imagePath = os.path.join(baseDir, c.pathFile)
+                    c = c.Replace(pathFile=os.path.relpath(imagePath, outputDir).replace("\\", "/"))
+                arch.append(c)
+            os.makedirs(outputDir, exist_ok=True)
+            ToGenerateSvg(arch, svgPath)
+        except Exception as e:
+            failed += 1
+            print(f"FAIL   {os.path.relpath(script)}: {e}")
+            continue
+        seconds = time.perf_counter() - start
+        print(f"ok     svg {seconds * 1000:8.1f}ms  {os.path.relpath(script)} -> {os.path.relpath(svgPath)}")
+    return 1 if failed else 0
+
+
+def _Serve(args):
+    """
+    Run the local render service.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit status.
+    """
+    print(f"serving on http://{args.host}:{args.port}/ (POST /render.pdf or /render.svg, GET /metrics)")
+    Server.Serve(
+        args.host,
+        args.port,
+        concurrency=args.jobs,
+        engine=_Engine(args),
+        timeout=args.timeout,
+        cacheDir=None if args.no_cache else args.cache_dir,
+        cacheMaxBytes=int(args.cache_size * 1024 * 1024),
+        cacheBytes=int(args.result_cache_size * 1024 * 1024),
+    )
+    return 0
+
+
+def _Cache(args):
+    """
+    Show or clear the compile cache.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command line arguments.
+
+    Returns
+    -------
+    int
+        Exit status.
+    """
+    cache = CompileCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+    if args.action == "clear":
+        cache.Clear()
+        print(f"cleared {cache.directory}")
+        return 0
+
+    stats = cache.Stats()
+    print(f"directory  {stats['directory']}")
+    print(f"entries    {stats['entries']}")
+    print(f"size       {stats['bytes'] / 1024 / 1024:.1f} / {stats['maxBytes'] / 1024 / 1024:.1f} MiB")
+    print(f"hits       {stats['hits']}")
+    print(f"misses     {stats['misses']}")
+    print(f"evictions  {stats['evictions']}")
+    print(f"hit ratio  {stats['hitRatio']:.1%}")
+    return 0
+
+
+def _AddEngineArguments(parser):
+    """
+    Add the TeX engine options to a parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        Parser to extend.
+
+    Returns
+    -------
+    None
+    """
+    parser.add_argument(
+        "--engine",
+        default="pdflatex",
+        help=f"TeX engine: {', '.join(ENGINES)}, {AUTO} (pdflatex, or lualatex for large "
+        "diagrams and when pdflatex runs out of memory) or an executable (default: pdflatex)",
+    )
+    parser.add_argument(
+        "--engine-arg",
+        action="append",
+        default=[],
+        metavar="ARG",
+        help="extra command line argument for the engine, may be repeated",
+    )
+    parser.add_argument(
+        "--tex-memory",
+        action="append",
+        default=[],
+        type=_MemorySetting,
+        metavar="NAME=VALUE",
+        help=(
+            "TeX capacity setting from texmf.cnf, e.g. extra_mem_top=10000000, may be "
+            "repeated; main_memory only applies to formats built with --precompile"
+        ),
+    )
+
+
+def _AddCacheArguments(parser):
+    """
+    Add the compile cache location and size options to a parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        Parser to extend.
+
+    Returns
+    -------
+    None
+    """
+    parser.add_argument(
+        "--cache-dir", default=DefaultDirectory(), help="compile cache directory"
+    )
+    parser.add_argument(
+        "--cache-size", type=float, default=512, help="compile cache size limit in MiB"
+    )
+
+
+def Main(argv=None):
+    """
+    Parse the command line and run the requested command.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Arguments, by default ``sys.argv[1:]``.
+
+    Returns
+    -------
+    int
+        Exit status.
+    """
+    parser = argparse.ArgumentParser(prog="python -m PlotNeuralNet")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    build = commands.add_parser("build", help="build architecture scripts into PDFs")
+    build.add_argument(
+        "paths",
+        nargs="*",
+        help="scripts or directories to build (default: PyExamples/ and Diagrams/)",
+    )
+    build.add_argument(
+        "-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)"
+    )
+    build.add_argument(
+        "-o", "--output-dir", default=None, help="where to put PDFs (default: next to each script)"
+    )
+    _AddEngineArguments(build)
+    build.add_argument(
+        "--timeout", type=float, default=None, help="seconds before a TeX run is killed"
+    )
+    build.add_argument(
+        "--no-cache", action="store_true", help="always run TeX, ignoring the compile cache"
+    )
+    build.add_argument(
+        "--precompile",
+        action="store_true",
+        help="load the shared preamble from a cached precompiled format",
+    )
+    build.add_argument(
+        "--metrics-file",
+        default=None,
+        help="append the TeX resource metrics of every compile to this JSONL file",
+    )
+    build.add_argument(
+        "--headroom-warning",
+        type=float,
+        default=0.1,
+        help="warn when a TeX resource has less than this fraction left (default: 0.1)",
+    )
+    build.add_argument(
+        "--flat",
+        action="store_true",
+        help="draw layers at coordinates resolved in Python instead of through the pics",
+    )
+    build.add_argument(
+        "--reuse",
+        action="store_true",
+        help="like --flat, and draw identical layers once as PDF form XObjects",
+    )
+    build.add_argument(
+        "--externalize",
+        action="store_true",
+        help="compile every block to a cached PDF of its own and assemble the diagram from them",
+    )
+    build.add_argument(
+        "--image-dpi",
+        type=float,
+        default=None,
+        help="embed input images downsampled to this resolution at their drawn size",
+    )
+    build.add_argument(
+        "--collapse",
+        choices=MODES,
+        default=None,
+        help="draw runs of repeated units once, with a repeat count badge or as a stack",
+    )
+    build.add_argument(
+        "--prune-anchors",
+        action="store_true",
+        help="have every pic define only the anchors the diagram references",
+    )
+    build.add_argument(
+        "--pics",
+        choices=Head.PICS,
+        default="standard",
+        help="implementation of the layer pics; fast is experimental (default: standard)",
+    )
+    build.add_argument(
+        "--draft",
+        action="store_true",
+        help="render a quick preview with minimal pics (same as --pics draft)",
+    )
+    build.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="compile each worker's share of diagrams as pages of one document",
+    )
+    build.add_argument(
+        "--page-layers",
+        type=int,
+        default=None,
+        help="split each diagram into pages of at most this many layers, compiled in parallel",
+    )
+    build.add_argument(
+        "--page-cost",
+        type=float,
+        default=None,
+        help="split each diagram into pages of at most this estimated TeX cost, in boxes drawn",
+    )
+    _AddCacheArguments(build)
+    build.set_defaults(func=_Build)
+
+    watch = commands.add_parser(
+        "watch", help="rebuild architecture scripts whenever they change"
+    )
+    watch.add_argument(
+        "paths",
+        nargs="*",
+        help="scripts or directories to watch (default: PyExamples/ and Diagrams/)",
+    )
+    watch.add_argument(
+        "-o", "--output-dir", default=None, help="where to put .tex and PDFs (default: next to each script)"
+    )
+    _AddEngineArguments(watch)
+    watch.add_argument(
+        "--timeout", type=float, default=None, help="seconds before a TeX run is killed"
+    )
+    watch.add_argument(
+        "--no-compile", action="store_true", help="only regenerate the .tex files"
+    )
+    watch.add_argument(
+        "--interval", type=float, default=0.5, help="seconds between polls (default: 0.5)"
+    )
+    watch.add_argument(
+        "--draft",
+        action="store_true",
+        help="render quick previews with minimal pics",
+    )
+    watch.set_defaults(func=_Watch)
+
+    bench = commands.add_parser("bench", help="benchmark generation and compilation")
+    bench.add_argument(
+        "cases", nargs="*", help="cases to run (default: UNet, resnet50 and every chain size)"
+    )
+    bench.add_argument(
+        "--sizes",
+        default=",".join(map(str, Bench.DEFAULT_SIZES)),
+        help="comma-separated synthetic chain lengths",
+    )
+    bench.add_argument(
+        "--repeat", type=int, default=3, help="build and generation runs per case, the fastest are kept"
+    )
+    _AddEngineArguments(bench)
+    bench.add_argument(
+        "--timeout", type=float, default=None, help="seconds before a TeX run is killed"
+    )
+    bench.add_argument("--no-compile", action="store_true", help="only time generation")
+    bench.add_argument(
+        "--compile-max-nodes",
+        type=int,
+        default=5000,
+        help="do not compile cases with more nodes than this (default: 5000)",
+    )
+    bench.add_argument(
+        "--flat",
+        action="store_true",
+        help="draw layers at coordinates resolved in Python instead of through the pics",
+    )
+    bench.add_argument(
+        "--reuse",
+        action="store_true",
+        help="like --flat, and draw identical layers once as PDF form XObjects",
+    )
+    bench.add_argument(
+        "--externalize",
+        action="store_true",
+        help="compile every block to a cached PDF of its own and assemble the diagram from them",
+    )
+    bench.add_argument(
+        "--image-dpi",
+        type=float,
+        default=None,
+        help="embed input images downsampled to this resolution at their drawn size",
+    )
+    bench.add_argument(
+        "--collapse",
+        choices=MODES,
+        default=None,
+        help="draw runs of repeated units once, with a repeat count badge or as a stack",
+    )
+    bench.add_argument(
+        "--prune-anchors",
+        action="store_true",
+        help="have every pic define only the anchors the diagram references",
+    )
+    bench.add_argument(
+        "--pics",
+        choices=Head.PICS,
+        default="standard",
+        help="implementation of the layer pics; fast is experimental (default: standard)",
+    )
+    bench.add_argument(
+        "--draft",
+        action="store_true",
+        help="render a quick preview with minimal pics (same as --pics draft)",
+    )
+    bench.add_argument("--save", default=None, help="write the results to this JSON file")
+    bench.add_argument(
+        "--baseline", default=None, help="compare with results saved by --save"
+    )
+    bench.add_argument(
+        "--threshold",
+        type=float,
+        default=Bench.DEFAULT_THRESHOLD,
+        help="relative increase reported as a regression (default: 0.10)",
+    )
+    bench.set_defaults(func=_Bench)
+
+    svg = commands.add_parser("svg", help="render architecture scripts to SVG without TeX")
+    svg.add_argument(
+        "paths",
+        nargs="*",
+        help="scripts or directories to render (default: PyExamples/ and Diagrams/)",
+    )
+    svg.add_argument(
+        "-o", "--output-dir", default=None, help="where to put SVGs (default: next to each script)"
+    )
+    svg.add_argument(
+        "--collapse",
+        choices=MODES,
+        default=None,
+        help="draw runs of repeated units once, with a repeat count badge or as a stack",
+    )
+    svg.set_defaults(func=_Svg)
+
+    serve = commands.add_parser("serve", help="render specs to PDF or SVG over HTTP")
+    serve.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: 127.0.0.1)")
+    serve.add_argument(
+        "--port", type=int, default=Server.DEFAULT_PORT, help="port to listen on (default: 8000)"
+    )
+    serve.add_argument(
+        "-j", "--jobs", type=int, default=None, help="TeX processes at once (default: all cores)"
+    )
+    _AddEngineArguments(serve)
+    serve.add_argument(
+        "--timeout", type=float, default=None, help="seconds before a TeX run is killed"
+    )
+    serve.add_argument(
+        "--no-cache", action="store_true", help="do not use the compile cache on disk"
+    )
+    serve.add_argument(
+        "--result-cache-size",
+        type=float,
+        default=64,
+        help="in-memory cache of rendered diagrams in MiB (default: 64)",
+    )
+    _AddCacheArguments(serve)
+    serve.set_defaults(func=_Serve)
+
+    cache = commands.add_parser("cache", help="inspect or clear the compile cache")
+    cache.add_argument("action", choices=("stats", "clear"), nargs="?", default="stats")
+    _AddCacheArguments(cache)
+    cache.set_defaults(func=_Cache)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
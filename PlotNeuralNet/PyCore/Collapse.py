@@ -0,0 +1,309 @@
+"""
+Level-of-detail collapsing of repeated stages.
+
+Deep networks repeat the same unit many times: the bottleneck blocks of a
+ResNet stage, the layers of a transformer stack. :func:`Collapse` finds
+consecutive runs of structurally identical units and draws each run once,
+with a "×N" badge, so generation and compile cost scale with the number of
+distinct units instead of the depth of the network.
+
+Units are compared by their node types and parameters with layer names
+left out, so ``ResBlock("conv2_1", ...)`` and ``ResBlock("conv2_2", ...)``
+match while a block with other shapes, captions or offsets does not.
+References to the layers of dropped copies are redirected to the
+corresponding layers of the copy that is kept.
+"""
+
+import re
+
+from .Layout import ANCHORS, Layout
+from .Nodes import Badge, Begin, Colors, Edge, End, Flatten, Head, Input, Layer, Node
+from .TikzGen import ToGenerate
+
+MODES = ("badge", "stack")
+
+# Shift between the ghost copies drawn behind a collapsed run in "stack"
+# mode, in TikZ units: up and towards the back.
+STACK_SHIFT = (0.3, 0.3, -0.6)
+
+# A layer name in a reference such as "(conv1-east)", also as either side
+# of "-|" or "|-".
+_NAMES = re.compile(
+    r"(?:(?<=\()|(?<=-\|)|(?<=\|-))(\s*)([^\s(),$|]+?)-(%s)(?=\s*(?:\)|-\||\|-))"
+    % "|".join(sorted(ANCHORS, key=len, reverse=True))
+)
+
+
+def _Rename(text, rename):
+    """
+    Replace the layer names referenced in TikZ code.
+
+    Parameters
+    ----------
+    text : str
+        TikZ code.
+    rename : dict or callable
+        Old name to new name, or a function returning the new name.
+
+    Returns
+    -------
+    str
+        The code with every known name replaced.
+    """
+    get = rename if callable(rename) else (lambda name: rename.get(name, name))
+    return _NAMES.sub(lambda m: f"{m.group(1)}{get(m.group(2))}-{m.group(3)}", text)
+
+
+def _Key(c):
+    """
+    Return what identifies a node up to the names it defines and references.
+
+    Parameters
+    ----------
+    c : Node or str
+        Node or raw fragment.
+
+    Returns
+    -------
+    hashable or None
+        The structural key, None for document nodes, which never repeat.
+    """
+    if not isinstance(c, Node):
+        return _Rename(c, lambda name: "*")
+    if isinstance(c, (Head, Colors, Begin, End)):
+        return None
+    values = []
+    for field, value in zip(c._fields, c.Fields()):
+        if field in c._instanceFields:
+            text = str(value)
+            # Bare names (edge ends, layer names) are wildcards; coordinates
+            # keep their shape with the names they reference left out.
+            value = _Rename(text, lambda name: "*") if "(" in text else "*"
+        values.append(value)
+    key = (type(c), tuple(values))
+    try:
+        hash(key)
+    except TypeError:
+        return (type(c), repr(tuple(values)))
+    return key
+
+
+def _Runs(ids, layers, minRepeat, maxPeriod):
+    """
+    Find consecutive repeats of the same unit.
+
+    Parameters
+    ----------
+    ids : list of int
+        Structural key of every node, as a small integer.
+    layers : list of int
+        Running count of layers, ``layers[i]`` being the number before node i.
+    minRepeat : int
+        Fewest copies worth collapsing.
+    maxPeriod : int
+        Most nodes in one unit.
+
+    Returns
+    -------
+    list of tuple of (int, int, int)
+        Start, unit length and number of copies of every run, in order.
+    """
+    runs = []
+    n = len(ids)
+    i = 0
+    while i < n:
+        best = None
+        for period in range(1, min(maxPeriod, (n - i) // minRepeat) + 1):
+            if ids[i] != ids[i + period] or layers[i + period] == layers[i]:
+                continue
+            unit = ids[i : i + period]
+            count = 1
+            while ids[i + count * period : i + (count + 1) * period] == unit:
+                count += 1
+            if count >= minRepeat and (best is None or count * period > best[0] * best[1]):
+                best = (period, count)
+        if best is None:
+            i += 1
+            continue
+        runs.append((i,) + best)
+        i += best[0] * best[1]
+    return runs
+
+
+def _Renamed(c, rename):
+    """
+    Redirect the references of a node.
+
+    Parameters
+    ----------
+    c : Node or str
+        Node or raw fragment.
+    rename : dict
+        Old layer name to new one.
+
+    Returns
+    -------
+    Node or str
+        The node with its references renamed.
+    """
+    if not rename:
+        return c
+    if not isinstance(c, Node):
+        return _Rename(c, rename)
+    if isinstance(c, Edge):
+        return c.Replace(of=rename.get(c.of, c.of), to=rename.get(c.to, c.to))
+    if isinstance(c, Badge):
+        return c.Replace(of=rename.get(c.of, c.of))
+    if isinstance(c, (Layer, Input)):
+        to = _Rename(str(c.to), rename)
+        return c if to == str(c.to) else c.Replace(to=to)
+    return c
+
+
+def _Badge(unit, count):
+    """
+    Return the repeat count badge of a collapsed run.
+
+    Parameters
+    ----------
+    unit : list
+        The copy of the unit that is drawn.
+    count : int
+        Number of copies it stands for.
+
+    Returns
+    -------
+    Nodes.Badge
+        Badge over the last layer of the unit.
+    """
+    last = [c for c in unit if isinstance(c, Layer)][-1]
+    return Badge(last.name, "north" if last.pic == "Ball" else "farnortheast", count)
+
+
+def _Ghosts(unit, count, ghosts):
+    """
+    Return the copies of a unit drawn behind it in "stack" mode.
+
+    Layers placed relative to other layers of the unit follow them; the
+    others are moved by a multiple of ``STACK_SHIFT``.
+
+    Parameters
+    ----------
+    unit : list
+        The copy of the unit that is drawn.
+    count : int
+        Number of copies it stands for.
+    ghosts : int
+        Most copies to draw behind it.
+
+    Returns
+    -------
+    list of Nodes.Layer
+        The ghost layers, farthest first, empty if an offset is not a plain
+        coordinate.
+    """
+    layers = [c for c in unit if isinstance(c, Layer)]
+    names = {c.name for c in layers}
+    parser = Layout()
+    result = []
+    for k in range(min(count - 1, ghosts), 0, -1):
+        suffix = f"_ghost{k}"
+        for c in layers:
+            changes = {"name": c.name + suffix}
+            if "caption" in c._fields:
+                changes["caption"] = ""
+            referenced = [m.group(2) for m in _NAMES.finditer(str(c.to))]
+            if referenced and all(name in names for name in referenced):
+                changes["to"] = _Rename(str(c.to), lambda name: name + suffix)
+            else:
+                offset = parser.Point(c.offset)
+                if offset is None:
+                    return []
+                x, y, z = (o + k * s for o, s in zip(offset, STACK_SHIFT))
+                changes["offset"] = f"({x:g},{y:g},{z:g})"
+            result.append(c.Replace(**changes))
+    return result
+
+
+def Collapse(arch, mode="badge", minRepeat=2, maxPeriod=64, ghosts=2):
+    """
+    Draw every run of repeated units once.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    mode : str, optional
+        "badge" (the default) draws the first copy of each run with a "×N"
+        badge; "stack" also draws up to ``ghosts`` copies of it behind,
+        like a deck of cards.
+    minRepeat : int, optional
+        Fewest consecutive copies collapsed, by default 2.
+    maxPeriod : int, optional
+        Most nodes in one unit, by default 64.
+    ghosts : int, optional
+        Most copies drawn behind a run in "stack" mode, by default 2.
+
+    Yields
+    ------
+    Node or str
+        The collapsed architecture.
+
+    Raises
+    ------
+    ValueError
+        If ``mode`` is not one of ``MODES``.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+    arch = list(Flatten(arch))
+    interned = {}
+    ids = []
+    layers = [0]
+    for i, c in enumerate(arch):
+        key = _Key(c)
+        ids.append(-1 - i if key is None else interned.setdefault(key, len(interned)))
+        layers.append(layers[-1] + isinstance(c, Layer))
+
+    rename = {}
+    done = 0
+    for start, period, count in _Runs(ids, layers, max(minRepeat, 2), maxPeriod):
+        for c in arch[done:start]:
+            yield _Renamed(c, rename)
+        kept = arch[start : start + period]
+        unit = [_Renamed(c, rename) for c in kept]
+        if mode == "stack":
+            yield from _Ghosts(unit, count, ghosts)
+        yield from unit
+        yield _Badge(unit, count)
+        for k in range(1, count):
+            copy = arch[start + k * period : start + (k + 1) * period]
+            for first, c in zip(kept, copy):
+                if isinstance(c, (Layer, Input)) and c.name != first.name:
+                    rename[c.name] = first.name
+        done = start + period * count
+    for c in arch[done:]:
+        yield _Renamed(c, rename)
+
+
+def ToGenerateCollapsed(arch, pathname="file.tex", mode="badge", **kwargs):
+    """
+    Generate the LaTeX file with every run of repeated units drawn once.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    pathname : str or file object, optional
+        Output .tex file, by default "file.tex".
+    mode : str, optional
+        "badge" or "stack", as for :func:`Collapse`, by default "badge".
+    **kwargs
+        Passed to ``ToGenerate``.
+
+    Returns
+    -------
+    bool
+        Whether the output was written, as returned by ``ToGenerate``.
+    """
+    return ToGenerate(Collapse(arch, mode), pathname, **kwargs)
@@ -0,0 +1,332 @@
+"""
+Content-addressed on-disk cache of compiled PDFs.
+
+A document is keyed on its own bytes, the TeX engine with its arguments
+and memory settings, every file in ``Layers/`` and every image it pulls in
+with ``\\includegraphics``, so a cached PDF is reused only when TeX would
+produce the same output.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from .Engines import GetEngine
+from .Paths import LAYERS_DIR
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_INCLUDE_PATTERN = re.compile(rb"\\includegraphics\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}")
+_CHUNK = 1 << 20
+
+
+def DefaultDirectory():
+    """
+    Return the default cache directory.
+
+    ``$PLOTNEURALNET_CACHE`` wins, then ``$XDG_CACHE_HOME/PlotNeuralNet``,
+    then ``~/.cache/PlotNeuralNet``.
+
+    Returns
+    -------
+    str
+        Path to the cache directory.
+    """
+    if os.environ.get("PLOTNEURALNET_CACHE"):
+        return os.environ["PLOTNEURALNET_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "PlotNeuralNet")
+
+
+def _HashFile(digest, path):
+    """
+    Feed a file's path and contents into a running digest.
+
+    Parameters
+    ----------
+    digest : hashlib._Hash
+        Digest to update.
+    path : str
+        File to hash. Missing files hash as such instead of failing.
+
+    Returns
+    -------
+    None
+    """
+    digest.update(os.path.basename(path).encode() + b"\0")
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                digest.update(chunk)
+    except OSError:
+        digest.update(b"\0missing")
+    digest.update(b"\0")
+
+
+def HashLayers(digest, layersDir=LAYERS_DIR):
+    """
+    Feed every ``.sty`` and ``.tex`` file of ``Layers/`` into a running digest.
+
+    Parameters
+    ----------
+    digest : hashlib._Hash
+        Digest to update.
+    layersDir : str, optional
+        The ``Layers/`` directory, by default the installed one.
+
+    Returns
+    -------
+    None
+    """
+    if os.path.isdir(layersDir):
+        for name in sorted(os.listdir(layersDir)):
+            if name.endswith((".sty", ".tex")):
+                _HashFile(digest, os.path.join(layersDir, name))
+
+
+def _ResolveImage(name, texDir):
+    """
+    Find the file ``\\includegraphics{name}`` refers to.
+
+    Parameters
+    ----------
+    name : str
+        Argument of ``\\includegraphics``.
+    texDir : str
+        Directory of the document.
+
+    Returns
+    -------
+    str
+        Path to the image, with the first matching graphics extension if
+        ``name`` has none.
+    """
+    path = name if os.path.isabs(name) else os.path.join(texDir, name)
+    if os.path.splitext(path)[1] or os.path.exists(path):
+        return path
+    for extension in (".pdf", ".png", ".jpg", ".jpeg"):
+        if os.path.exists(path + extension):
+            return path + extension
+    return path
+
+
+class CompileCache:
+    """
+    Size-bounded, content-addressed cache of compiled PDFs.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Where cached PDFs live, by default :func:`DefaultDirectory`.
+    maxBytes : int, optional
+        Total size above which the least recently used PDFs are evicted,
+        by default 512 MiB.
+    layersDir : str, optional
+        The ``Layers/`` directory whose files are part of every key.
+    """
+
+    def __init__(self, directory=None, maxBytes=DEFAULT_MAX_BYTES, layersDir=LAYERS_DIR):
+        self.directory = directory or DefaultDirectory()
+        self.maxBytes = maxBytes
+        self.layersDir = layersDir
+        self._objects = os.path.join(self.directory, "objects")
+        self._statsPath = os.path.join(self.directory, "stats.json")
+
+    def Key(self, texPath, engine="pdflatex"):
+        """
+        Compute the cache key of a document.
+
+        Parameters
+        ----------
+        texPath : str or list of str
+            Path to the ``.tex`` file, or to the files of every page of a
+            document compiled in parts.
+        engine : Engines.Engine or str, optional
+            TeX engine the document is compiled with, by default "pdflatex".
+
+        Returns
+        -------
+        str
+            Hex digest identifying the compiled output.
+        """
+        texPaths = [texPath] if isinstance(texPath, str) else list(texPath)
+        digest = hashlib.sha256()
+        digest.update(GetEngine(engine).Key().encode() + b"\0")
+        sources = []
+        for path in texPaths:
+            with open(path, "rb") as f:
+                sources.append(f.read())
+            digest.update(sources[-1])
+            digest.update(b"\0")
+
+        HashLayers(digest, self.layersDir)
+
+        for path, source in zip(texPaths, sources):
+            texDir = os.path.dirname(os.path.abspath(path))
+            for name in _INCLUDE_PATTERN.findall(source):
+                _HashFile(digest, _ResolveImage(name.decode("utf-8", "replace").strip(), texDir))
+        return digest.hexdigest()
+
+    def _Path(self, key):
+        return os.path.join(self._objects, key[:2], key + ".pdf")
+
+    def Get(self, key):
+        """
+        Look up a cached PDF.
+
+        Parameters
+        ----------
+        key : str
+            Key from :meth:`Key`.
+
+        Returns
+        -------
+        str or None
+            Path to the cached PDF, None on a miss.
+        """
+        path = self._Path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            self._Count("misses")
+            return None
+        self._Count("hits")
+        return path
+
+    def Put(self, key, pdfPath):
+        """
+        Store a compiled PDF and evict old entries if over budget.
+
+        Parameters
+        ----------
+        key : str
+            Key from :meth:`Key`.
+        pdfPath : str
+            PDF to store.
+
+        Returns
+        -------
+        str
+            Path to the cached copy.
+        """
+        path = self._Path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(pdfPath, tmpPath)
+        os.replace(tmpPath, path)
+        self.Evict()
+        return path
+
+    def _Entries(self):
+        """
+        List the cached PDFs.
+
+        Returns
+        -------
+        list of tuple of (float, int, str)
+            Last use time, size and path of every entry.
+        """
+        entries = []
+        if not os.path.isdir(self._objects):
+            return entries
+        for dirpath, _, filenames in os.walk(self._objects):
+            for filename in filenames:
+                if not filename.endswith(".pdf"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def Evict(self):
+        """
+        Remove least recently used entries until the cache fits ``maxBytes``.
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        entries = sorted(self._Entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            self._Count("evictions", removed)
+        return removed
+
+    def Clear(self):
+        """
+        Remove every cached PDF and reset the counters.
+
+        Returns
+        -------
+        None
+        """
+        shutil.rmtree(self._objects, ignore_errors=True)
+        try:
+            os.remove(self._statsPath)
+        except OSError:
+            pass
+
+    def Stats(self):
+        """
+        Return the cache size and its hit/miss counters.
+
+        Counters are shared by every process using the directory and are
+        updated without locking, so they are approximate under concurrency.
+
+        Returns
+        -------
+        dict
+            Entries, bytes, size limit, hits, misses, evictions and hit ratio.
+        """
+        entries = self._Entries()
+        counters = self._ReadCounters()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "directory": self.directory,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "maxBytes": self.maxBytes,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "evictions": counters["evictions"],
+            "hitRatio": counters["hits"] / lookups if lookups else 0.0,
+        }
+
+    def _ReadCounters(self):
+        counters = {"hits": 0, "misses": 0, "evictions": 0}
+        try:
+            with open(self._statsPath) as f:
+                counters.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return counters
+
+    def _Count(self, counter, n=1):
+        counters = self._ReadCounters()
+        counters[counter] += n
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(counters, f)
+            os.replace(tmpPath, self._statsPath)
+        except OSError:
+            pass
@@ -0,0 +1,216 @@
+"""
+TeX engines and the policy choosing between them.
+
+pdfLaTeX is the fastest engine on these diagrams, but its memory pools are
+fixed when it starts, so a large network can run out of main memory or
+hash space however it is drawn. LuaLaTeX allocates memory as it goes, and
+XeLaTeX is supported as well. An :class:`Engine` names the engine to run,
+with extra command line arguments and memory settings (``texmf.cnf``
+variables such as ``extra_mem_top``, passed through the environment).
+``main_memory`` is only read when a format is dumped, so it has no effect
+on the installation's formats; it applies to the ones ``Format`` builds.
+
+The ``"auto"`` engine picks one per document: pdfLaTeX, unless the
+diagram's estimated cost (see ``Paged.Cost``) exceeds
+:data:`AUTO_MAX_COST`, and LuaLaTeX when pdfLaTeX runs out of capacity.
+Everywhere an engine is accepted, its name works as well, and any other
+string is taken as the executable to run.
+"""
+
+import os
+
+ENGINES = ("pdflatex", "lualatex", "xelatex")
+AUTO = "auto"
+
+# Engines tried by "auto", fastest first; the last has dynamic memory.
+AUTO_ENGINES = ("pdflatex", "lualatex")
+
+# Estimated cost above which "auto" skips pdfLaTeX: about the size at which
+# a default TeX Live pdfLaTeX exhausts its main memory with standard pics.
+AUTO_MAX_COST = 3000
+
+# Capacity settings of ``texmf.cnf`` that kpathsea reads from the environment.
+MEMORY_SETTINGS = (
+    "main_memory",
+    "extra_mem_top",
+    "extra_mem_bot",
+    "font_mem_size",
+    "pool_size",
+    "string_vacancies",
+    "max_strings",
+    "hash_extra",
+    "save_size",
+    "stack_size",
+    "buf_size",
+    "nest_size",
+    "param_size",
+)
+
+
+class Engine:
+    """
+    A TeX engine and how to run it.
+
+    Parameters
+    ----------
+    name : str, optional
+        "pdflatex", "lualatex", "xelatex", "auto" or the path to another
+        executable, by default "pdflatex".
+    args : sequence of str, optional
+        Extra command line arguments, placed before the file name, by
+        default none.
+    memory : dict, optional
+        Capacity settings, e.g. ``{"extra_mem_top": 10000000}``, by default
+        the installation's. Keys must be in :data:`MEMORY_SETTINGS`.
+
+    Raises
+    ------
+    ValueError
+        If a memory setting is unknown.
+    """
+
+    __slots__ = ("name", "args", "memory")
+
+    def __init__(self, name="pdflatex", args=(), memory=None):
+        memory = dict(memory or {})
+        unknown = sorted(set(memory) - set(MEMORY_SETTINGS))
+        if unknown:
+            raise ValueError(f"unknown TeX memory settings: {', '.join(unknown)}")
+        self.name = name
+        self.args = tuple(args)
+        self.memory = memory
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"Engine({self.name!r}, args={self.args!r}, memory={self.memory!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Engine) and (self.name, self.args, self.memory) == (
+            other.name,
+            other.args,
+            other.memory,
+        )
+
+    def __hash__(self):
+        return hash((self.name, self.args))
+
+    @property
+    def auto(self):
+        return self.name == AUTO
+
+    def Attempts(self):
+        """
+        Return the engines to run, in order, while TeX runs out of capacity.
+
+        Returns
+        -------
+        list of Engine
+            This engine, or for "auto" pdfLaTeX then LuaLaTeX, with this
+            engine's arguments and memory settings.
+        """
+        if not self.auto:
+            return [self]
+        return [Engine(name, self.args, self.memory) for name in AUTO_ENGINES]
+
+    def Key(self):
+        """
+        Return what identifies the engine's output, for cache keys.
+
+        Returns
+        -------
+        str
+            The name, arguments and memory settings.
+        """
+        memory = (f"{key}={value}" for key, value in sorted(self.memory.items()))
+        return "\0".join([self.name, *self.args, "", *memory])
+
+    def Command(self, texName, fmt=None):
+        """
+        Return the command line compiling a file.
+
+        Parameters
+        ----------
+        texName : str
+            The ``.tex`` file, relative to the directory TeX runs in.
+        fmt : str, optional
+            Precompiled format to load instead of the preamble, by default
+            None.
+
+        Returns
+        -------
+        list of str
+            The command and its arguments.
+
+        Raises
+        ------
+        ValueError
+            For "auto", which is not an executable; run one of its
+            :meth:`Attempts`.
+        """
+        if self.auto:
+            raise ValueError("the auto engine has no command; run one of its attempts")
+        command = [self.name, "-interaction=nonstopmode", "-halt-on-error"]
+        if fmt is not None:
+            command.append("-fmt=" + os.path.splitext(os.path.basename(fmt))[0])
+        return command + list(self.args) + [texName]
+
+    def Environment(self, env):
+        """
+        Return an environment applying the memory settings.
+
+        Parameters
+        ----------
+        env : dict
+            Base environment.
+
+        Returns
+        -------
+        dict
+            Copy of the environment with the settings added.
+        """
+        env = dict(env)
+        env.update((key, str(value)) for key, value in self.memory.items())
+        return env
+
+
+def GetEngine(engine):
+    """
+    Return the engine an engine argument stands for.
+
+    Parameters
+    ----------
+    engine : Engine or str
+        Engine, or its name.
+
+    Returns
+    -------
+    Engine
+        The engine, with default arguments and memory for a name.
+    """
+    return engine if isinstance(engine, Engine) else Engine(engine)
+
+
+def SelectEngine(engine, cost=None):
+    """
+    Apply the "auto" policy to a document of a given size.
+
+    Parameters
+    ----------
+    engine : Engine or str
+        Requested engine.
+    cost : float, optional
+        Estimated cost of the document, by default unknown.
+
+    Returns
+    -------
+    Engine
+        LuaLaTeX, with the requested arguments and memory settings, for
+        "auto" and a cost above :data:`AUTO_MAX_COST`; otherwise the
+        requested engine.
+    """
+    engine = GetEngine(engine)
+    if engine.auto and cost is not None and cost > AUTO_MAX_COST:
+        return engine.Attempts()[-1]
+    return engine
@@ -0,0 +1,256 @@
+"""
+Blocks compiled to PDFs of their own and reused across runs.
+
+Editing one stage of a large diagram normally recompiles the whole
+picture. :func:`Externalize` compiles every block of an architecture (the
+layers of a ``Block2ConvPool``, ``BlockRes`` or any group made with
+``ToGroup``, or of a nested list) into a separate PDF, cached under the
+hash of the block's generated TeX, the engine and the pics, and draws
+the main picture with those PDFs in place of the block's layers. A later
+run only compiles the blocks whose TeX changed, plus a cheap assembly
+pass, and identical blocks, in one diagram or in several, share one PDF.
+
+Layer positions are resolved in Python as for ``Layout.Flat``; blocks with
+a layer whose position does not resolve are drawn as usual, and so are
+blocks that fail to compile. Connections, skips and raw fragments are
+always drawn in the main picture.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from .Build import CompileTex
+from .CompileCache import DefaultDirectory, HashLayers
+from .Engines import GetEngine
+from .Layout import FLAT_PRELUDE, Flat, FlatLayer, Layout, Placement
+from .Nodes import Begin, End, Flatten, Group, Layer, Node
+
+# Bumped whenever the block documents change, so stale PDFs are not reused.
+CACHE_VERSION = 1
+
+# Margin standalone leaves around a picture, as set by ``Nodes.Head``.
+BORDER_PT = 8
+
+_ORIGIN_PREFIX = "PlotNeuralNet-block-origin="
+_ORIGIN = re.compile(re.escape(_ORIGIN_PREFIX) + r"(-?[\d.]+)pt,(-?[\d.]+)pt")
+
+# Logged by every block document: where the picture's bounding box starts
+# relative to the block's origin.
+_ORIGIN_REPORT = rf"""\makeatletter
+\pgfpointanchor{{current bounding box}}{{south west}}
+\typeout{{{_ORIGIN_PREFIX}\the\pgf@x,\the\pgf@y}}
+\makeatother
+"""
+
+
+def _Blocks(arch):
+    """
+    Flatten an architecture, remembering which nodes form blocks.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+
+    Returns
+    -------
+    tuple of (list, list of list)
+        Every node in order, and the nodes of every outermost block: a
+        nested list or the nodes between ``Group`` markers.
+    """
+    nodes = []
+    blocks = []
+    depth = 0
+    for item in arch:
+        nested = not isinstance(item, (str, Node)) and hasattr(item, "__iter__")
+        if nested and depth == 0:
+            blocks.append([])
+        for c in Flatten([item]):
+            if isinstance(c, Group):
+                if not c.end:
+                    if depth == 0 and not nested:
+                        blocks.append([])
+                    depth += 1
+                elif depth > 0:
+                    depth -= 1
+            elif depth > 0 or nested:
+                blocks[-1].append(c)
+            nodes.append(c)
+    return nodes, blocks
+
+
+def _Document(preamble, drawings):
+    """
+    Return the standalone document of a block.
+
+    Parameters
+    ----------
+    preamble : list of str
+        Rendered nodes of the main document before ``Begin``.
+    drawings : list of str
+        TikZ code of the block's layers, around the block's origin.
+
+    Returns
+    -------
+    str
+        The LaTeX document.
+    """
+    return "".join(
+        preamble + [Begin().Render(), FLAT_PRELUDE] + drawings + [_ORIGIN_REPORT, End().Render()]
+    )
+
+
+def _KeyDigest(engine):
+    """
+    Start the cache keys of the blocks compiled with an engine.
+
+    Like ``CompileCache.Key``, the keys cover the engine with its arguments
+    and memory settings and the pics of ``Layers/``, hashed once for all
+    the blocks of a diagram.
+
+    Parameters
+    ----------
+    engine : Engines.Engine or str
+        TeX engine or its name.
+
+    Returns
+    -------
+    hashlib._Hash
+        Digest to copy and feed each block document into.
+    """
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{GetEngine(engine).Key()}\0".encode())
+    HashLayers(digest)
+    return digest
+
+
+def _Compile(tex, directory, digest, engine, timeout):
+    """
+    Compile a block document into the cache unless it is there already.
+
+    Parameters
+    ----------
+    tex : str
+        The block document.
+    directory : str
+        Cache directory for blocks.
+    digest : hashlib._Hash
+        Digest of everything besides the document the PDF depends on, from
+        :func:`_KeyDigest`.
+    engine : Engines.Engine or str
+        TeX engine or its name.
+    timeout : float or None
+        Seconds before TeX is killed.
+
+    Returns
+    -------
+    tuple of (str, float, float) or None
+        The PDF and the position of its lower left corner relative to the
+        block's origin, in points, None if TeX failed.
+    """
+    digest = digest.copy()
+    digest.update(tex.encode())
+    key = digest.hexdigest()
+    base = os.path.join(directory, key[:2], key)
+    pdfPath = base + ".pdf"
+    try:
+        # Written last, so its presence means the PDF is complete.
+        with open(base + ".origin", encoding="utf-8") as f:
+            x, y = map(float, f.read().split())
+        return pdfPath, x, y
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    workDir = tempfile.mkdtemp(prefix="block-", dir=os.path.dirname(base))
+    try:
+        texPath = os.path.join(workDir, "block.tex")
+        with open(texPath, "w", encoding="utf-8") as f:
+            f.write(tex)
+        compiled = CompileTex(texPath, engine, timeout)
+        match = _ORIGIN.search(compiled.log)
+        if not compiled.ok or match is None:
+            return None
+        x, y = (float(v) - BORDER_PT for v in match.groups())
+        os.replace(compiled.pdfPath, pdfPath)
+        with open(os.path.join(workDir, "origin"), "w", encoding="utf-8") as f:
+            f.write(f"{x} {y}\n")
+        os.replace(os.path.join(workDir, "origin"), base + ".origin")
+        return pdfPath, x, y
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+def Externalize(arch, cacheDir=None, engine="pdflatex", timeout=None, minLayers=2):
+    """
+    Rewrite an architecture so its blocks are drawn from cached PDFs.
+
+    Blocks are compiled while the architecture is rewritten, before the
+    main document exists, so the main compile only places their PDFs.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``, with an absolute
+        ``ToHead`` path, as after ``Build.Relocate``.
+    cacheDir : str, optional
+        Cache directory, by default ``CompileCache.DefaultDirectory()``.
+    engine : Engines.Engine or str, optional
+        TeX engine compiling the blocks, or its name, by default "pdflatex".
+    timeout : float, optional
+        Seconds before a block's TeX run is killed, by default no limit.
+    minLayers : int, optional
+        Fewest layers in a block worth compiling apart, by default 2.
+
+    Returns
+    -------
+    iterable of Node or str
+        Fragments of the flattened architecture.
+    """
+    nodes, blocks = _Blocks(arch)
+    preamble = []
+    for c in nodes:
+        if isinstance(c, Begin):
+            break
+        preamble.append(c if isinstance(c, str) else c.Render())
+
+    layout = Layout()
+    placements = {}
+    for c in nodes:
+        placement = layout.Add(c)
+        if isinstance(c, Layer):
+            placements[id(c)] = placement
+
+    directory = os.path.join(DefaultDirectory() if cacheDir is None else cacheDir, "blocks")
+    digest = _KeyDigest(engine)
+    included = {}
+    for block in blocks:
+        layers = [c for c in block if isinstance(c, Layer)]
+        if len(layers) < max(minLayers, 1) or any(placements[id(c)] is None for c in layers):
+            continue
+        ox, oy, oz = placements[id(layers[0])].origin
+        drawings = []
+        for c in layers:
+            placement = placements[id(c)]
+            x, y, z = placement.origin
+            relative = Placement(c.name, c.pic, (x - ox, y - oy, z - oz), placement.size)
+            drawings.append(FlatLayer(c, relative))
+        result = _Compile(_Document(preamble, drawings), directory, digest, engine, timeout)
+        if result is None:
+            continue
+        pdfPath, x, y = result
+        for c in layers:
+            included[id(c)] = ""
+        included[id(layers[0])] = (
+            f"\\path ({ox:g},{oy:g},{oz:g}) ++({x:g}pt,{y:g}pt) "
+            f"node[anchor=south west,inner sep=0pt,outer sep=0pt] "
+            f"{{\\includegraphics{{{pdfPath.replace(os.sep, '/')}}}}};\n"
+        )
+
+    def Draw(c, placement):
+        text = included.get(id(c))
+        return FlatLayer(c, placement) if text is None else text
+
+    return Flat(nodes, draw=Draw)
@@ -0,0 +1,142 @@
+"""
+Precompiled LaTeX formats for the shared document preamble.
+
+Loading ``standalone``, TikZ, its libraries and the ``Layers/`` pics is a
+large share of compile time for small diagrams. The preamble of a document
+(everything before ``\\begin{document}``, i.e. ``ToHead``, ``Layers/init.tex``
+and ``ToCor``) is dumped once into a ``.fmt`` file with ``mylatexformat``;
+later compiles load the format and skip the preamble instead of re-reading
+it. Formats are keyed on the preamble text, the engine with its arguments
+and memory settings, and every file in ``Layers/``, so editing a ``.sty``
+transparently builds a fresh one.
+"""
+
+import hashlib
+import os
+import subprocess
+import tempfile
+
+from .CompileCache import DefaultDirectory, HashLayers
+from .Engines import GetEngine
+from .Paths import LAYERS_DIR
+
+_BEGIN_DOCUMENT = "\\begin{document}"
+
+
+def SplitPreamble(source):
+    """
+    Return the preamble of a LaTeX document.
+
+    Parameters
+    ----------
+    source : str
+        Contents of the document.
+
+    Returns
+    -------
+    str or None
+        Everything before ``\\begin{document}``, None if it is missing.
+    """
+    index = source.find(_BEGIN_DOCUMENT)
+    if index < 0:
+        return None
+    return source[:index]
+
+
+def FormatName(preamble, engine="pdflatex", layersDir=LAYERS_DIR):
+    """
+    Compute the name of the format for a preamble.
+
+    Parameters
+    ----------
+    preamble : str
+        Document preamble.
+    engine : Engines.Engine or str, optional
+        TeX engine, with the arguments and memory settings it runs with, by
+        default "pdflatex".
+    layersDir : str, optional
+        The ``Layers/`` directory whose files are part of the key.
+
+    Returns
+    -------
+    str
+        Format name, without the ``.fmt`` extension.
+    """
+    engine = GetEngine(engine)
+    digest = hashlib.sha256()
+    digest.update(engine.Key().encode() + b"\0" + preamble.encode() + b"\0")
+    HashLayers(digest, layersDir)
+    return f"pnn-{os.path.basename(engine.name)}-{digest.hexdigest()[:20]}"
+
+
+def EnsureFormat(texPath, engine="pdflatex", directory=None, timeout=None, env=None):
+    """
+    Return the precompiled format for a document's preamble, building it if needed.
+
+    Parameters
+    ----------
+    texPath : str
+        Path to the ``.tex`` file.
+    engine : Engines.Engine or str, optional
+        TeX engine the document is compiled with, by default "pdflatex";
+        for "auto", the first engine it tries.
+    directory : str, optional
+        Where formats are kept, by default ``formats/`` in the compile cache
+        directory.
+    timeout : float, optional
+        Seconds before dumping the format is abandoned, by default no limit.
+    env : dict, optional
+        Environment for the TeX run, by default ``os.environ``.
+
+    Returns
+    -------
+    str or None
+        Path to the ``.fmt`` file, None if the document has no preamble or
+        the format could not be built (the caller then compiles normally).
+    """
+    with open(texPath, encoding="utf-8") as f:
+        preamble = SplitPreamble(f.read())
+    if preamble is None:
+        return None
+
+    engine = GetEngine(engine).Attempts()[0]
+    directory = directory or os.path.join(DefaultDirectory(), "formats")
+    name = FormatName(preamble, engine)
+    fmtPath = os.path.join(directory, name + ".fmt")
+    if os.path.exists(fmtPath):
+        return fmtPath
+
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="tmp-", dir=directory) as workDir:
+        with open(os.path.join(workDir, "preamble.tex"), "w", encoding="utf-8") as f:
+            f.write(preamble)
+            f.write(_BEGIN_DOCUMENT + "\n\\end{document}\n")
+        command = [
+            engine.name,
+            "-ini",
+            "-interaction=nonstopmode",
+            "-halt-on-error",
+            f"-jobname={name}",
+            f"&{os.path.basename(engine.name)}",
+            "mylatexformat.ltx",
+            "preamble.tex",
+        ]
+        try:
+            completed = subprocess.run(
+                command,
+                cwd=workDir,
+                env=engine.Environment(os.environ if env is None else env),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        built = os.path.join(workDir, name + ".fmt")
+        if completed.returncode != 0 or not os.path.exists(built):
+            return None
+        # Concurrent builders race benignly: every one of them writes the
+        # same format and the last rename wins.
+        os.replace(built, fmtPath)
+    return fmtPath
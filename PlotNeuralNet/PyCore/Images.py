@@ -0,0 +1,277 @@
+"""
+Input images downsampled to the size they are drawn at.
+
+``ToInput`` draws its image 8cm wide, but ``\\includegraphics`` embeds the
+file at full resolution, so a photo from a camera costs megabytes of PDF
+and the time to copy them. :func:`PrepareImages` reads only the header of
+every input image to get its pixel size, and when it has more pixels than
+its drawn size needs at the chosen resolution, embeds a downsampled copy
+instead. Copies are kept in the cache directory under the hash of the
+original's contents and the target size, so later builds reuse them.
+
+Downsampling needs Pillow, installed with the ``images`` extra; without it
+images already small enough are recognised from their header alone and
+the others are embedded unchanged, with a warning.
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+import warnings
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .CompileCache import DefaultDirectory
+from .Nodes import Flatten, Input
+
+DEFAULT_DPI = 150
+
+# Bumped whenever resampling changes, so stale copies are not reused.
+CACHE_VERSION = 1
+JPEG_QUALITY = 90
+
+_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "gif": ".png"}
+_CHUNK = 1 << 20
+
+# Content hashes by path, size and modification time, so unchanged images
+# are hashed once per process.
+_DIGESTS = {}
+
+
+def _JpegSize(f):
+    """
+    Find the frame size in the markers of a JPEG file.
+
+    Parameters
+    ----------
+    f : file object
+        The file, positioned after the start of image marker.
+
+    Returns
+    -------
+    tuple of (int, int) or None
+        Width and height, None if no frame header is found.
+    """
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD9:
+            # Markers without a segment.
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        (length,) = struct.unpack(">H", header)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def ImageSize(path):
+    """
+    Read the pixel size of an image from its header, without decoding it.
+
+    Parameters
+    ----------
+    path : str
+        PNG, JPEG or GIF file.
+
+    Returns
+    -------
+    tuple of (str, int, int) or None
+        Format ("png", "jpeg" or "gif"), width and height, None for other
+        or unreadable files.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(24)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+                width, height = struct.unpack(">II", head[16:24])
+                return "png", width, height
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                width, height = struct.unpack("<HH", head[6:10])
+                return "gif", width, height
+            if head.startswith(b"\xff\xd8"):
+                f.seek(2)
+                size = _JpegSize(f)
+                return None if size is None else ("jpeg",) + size
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def TargetSize(width, height, dpi=DEFAULT_DPI):
+    """
+    Return the pixels an image needs to be drawn at a size.
+
+    Parameters
+    ----------
+    width, height : float
+        Drawn size in cm.
+    dpi : float, optional
+        Resolution, by default 150 dots per inch.
+
+    Returns
+    -------
+    tuple of (int, int)
+        Width and height in pixels.
+    """
+    return (
+        max(1, round(float(width) / 2.54 * dpi)),
+        max(1, round(float(height) / 2.54 * dpi)),
+    )
+
+
+def _Digest(path):
+    stat = os.stat(path)
+    stamp = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _DIGESTS.get(stamp)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+        digest = _DIGESTS[stamp] = h.hexdigest()
+    return digest
+
+
+def _Resample(path, outPath, fmt, size):
+    """
+    Write a downsampled copy of an image atomically.
+
+    Parameters
+    ----------
+    path : str
+        Original image.
+    outPath : str
+        Where to write the copy.
+    fmt : str
+        Format of the original, as returned by :func:`ImageSize`.
+    size : tuple of (int, int)
+        Width and height of the copy.
+
+    Returns
+    -------
+    None
+    """
+    os.makedirs(os.path.dirname(outPath), exist_ok=True)
+    resampling = getattr(Image, "Resampling", Image).LANCZOS
+    with Image.open(path) as image:
+        if fmt == "jpeg":
+            # Let the decoder scale by a power of two before resampling.
+            image.draft("RGB", size)
+        image = image.resize(size, resampling)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(outPath), suffix=_EXTENSIONS[fmt])
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if fmt == "jpeg":
+                    image.convert("RGB").save(f, "JPEG", quality=JPEG_QUALITY, optimize=True)
+                else:
+                    image.save(f, "PNG", optimize=True)
+            os.replace(temporary, outPath)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+
+def PrepareImage(path, width, height, dpi=DEFAULT_DPI, cacheDir=None):
+    """
+    Return an image file no larger than needed to draw it at a size.
+
+    Parameters
+    ----------
+    path : str
+        Original image.
+    width, height : float
+        Drawn size in cm.
+    dpi : float, optional
+        Resolution, by default 150 dots per inch.
+    cacheDir : str, optional
+        Cache directory, by default ``CompileCache.DefaultDirectory()``.
+
+    Returns
+    -------
+    str
+        Path to a cached downsampled copy, or ``path`` itself if it is small
+        enough, not a PNG, JPEG or GIF, or cannot be resampled.
+
+    Warns
+    -----
+    UserWarning
+        If the image needs downsampling but Pillow is not installed.
+    """
+    info = ImageSize(path)
+    if info is None:
+        return path
+    fmt, pixelsWide, pixelsHigh = info
+    targetWide, targetHigh = TargetSize(width, height, dpi)
+    size = (min(pixelsWide, targetWide), min(pixelsHigh, targetHigh))
+    if size == (pixelsWide, pixelsHigh):
+        return path
+    if Image is None:
+        warnings.warn(
+            f"{path}: embedded at {pixelsWide}x{pixelsHigh} instead of {size[0]}x{size[1]}, "
+            "downsampling needs Pillow (pip install 'PlotNeuralNet[images]')",
+            stacklevel=2,
+        )
+        return path
+
+    key = hashlib.sha256(
+        f"{CACHE_VERSION}\0{_Digest(path)}\0{size[0]}x{size[1]}".encode()
+    ).hexdigest()
+    if cacheDir is None:
+        cacheDir = DefaultDirectory()
+    outPath = os.path.join(cacheDir, "images", key[:2], key + _EXTENSIONS[fmt])
+    if not os.path.exists(outPath):
+        try:
+            _Resample(path, outPath, fmt, size)
+        except (OSError, ValueError):
+            return path
+    return outPath
+
+
+def PrepareImages(arch, dpi=DEFAULT_DPI, cacheDir=None):
+    """
+    Embed downsampled copies of an architecture's input images.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture nodes and fragments, with image paths absolute or
+        relative to the current directory, as after ``Build.Relocate``.
+    dpi : float, optional
+        Resolution, by default 150 dots per inch.
+    cacheDir : str, optional
+        Cache directory, as for :func:`PrepareImage`.
+
+    Yields
+    ------
+    Node or str
+        The architecture with ``Input`` nodes pointing at the copies.
+    """
+    for c in Flatten(arch):
+        if isinstance(c, Input):
+            path = PrepareImage(c.pathFile, c.width, c.height, dpi, cacheDir)
+            if path != c.pathFile:
+                c = c.Replace(pathFile=os.path.abspath(path).replace("\\", "/"))
+        yield c
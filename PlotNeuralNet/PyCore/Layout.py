@@ -0,0 +1,732 @@
+"""
+Python-side geometry of an architecture.
+
+Every pic is placed relative to an anchor of an earlier one, so TeX has to
+evaluate each pic (its ``\\pgfmathsetmacro`` calls and the ``\\foreach`` over
+the box widths) before the next one can be positioned. :class:`Layout`
+replays that geometry in Python: it resolves every layer to an absolute 3D
+origin and answers anchor queries such as ``("conv2", "east")`` from a dict.
+
+:func:`Flat` uses it to emit a document in which layers, connections and
+skips are drawn directly at pre-computed coordinates, so TeX only draws.
+:func:`Reuse` does the same and draws identical layers only once.
+Coordinates stay in TikZ's 3D ``(x,y,z)`` form, so the picture's axis
+vectors apply exactly as before.
+"""
+
+import hashlib
+import re
+
+from .Nodes import Begin, Colors, Connection, End, Flatten, Head, Input, Layer, Skip
+from .TikzGen import ToGenerate
+
+SCALE = 0.2
+
+# Defaults of the pic keys in Layers/*.sty.
+BOX_DEFAULTS = {
+    "fill": "{rgb:red,5;green,5;blue,5;white,15}",
+    "opacity": 0.4,
+    "width": 2,
+    "height": 13,
+    "depth": 15,
+    "xlabel": "",
+    "ylabel": "",
+    "zlabel": "",
+    "caption": "",
+    "bandfill": "{rgb:red,5;green,5;blue,5;white,5}",
+    "bandopacity": 0.6,
+}
+BALL_DEFAULTS = {
+    "fill": "green",
+    "opacity": 0.10,
+    "radius": 0.5,
+    "logo": r"$\Sigma$",
+    "caption": "",
+}
+
+# Anchors of the Box and RightBandedBox pics, as functions of the total
+# length and the scaled height and depth. The "-|" intersections of the
+# sty files lie in the z=0 plane, so they reduce to plain corners here.
+BOX_ANCHORS = {
+    "west": lambda l, y, z: (0, 0, 0),
+    "east": lambda l, y, z: (l, 0, 0),
+    "north": lambda l, y, z: (l / 2, y / 2, 0),
+    "south": lambda l, y, z: (l / 2, -y / 2, 0),
+    "anchor": lambda l, y, z: (l / 2, 0, 0),
+    "near": lambda l, y, z: (l / 2, 0, z / 2),
+    "far": lambda l, y, z: (l / 2, 0, -z / 2),
+    "nearwest": lambda l, y, z: (0, 0, z / 2),
+    "neareast": lambda l, y, z: (l, 0, z / 2),
+    "farwest": lambda l, y, z: (0, 0, -z / 2),
+    "fareast": lambda l, y, z: (l, 0, -z / 2),
+    "northeast": lambda l, y, z: (l, y / 2, 0),
+    "northwest": lambda l, y, z: (0, y / 2, 0),
+    "southeast": lambda l, y, z: (l, -y / 2, 0),
+    "southwest": lambda l, y, z: (0, -y / 2, 0),
+    "nearnortheast": lambda l, y, z: (l, y / 2, z / 2),
+    "farnortheast": lambda l, y, z: (l, y / 2, -z / 2),
+    "nearsoutheast": lambda l, y, z: (l, -y / 2, z / 2),
+    "farsoutheast": lambda l, y, z: (l, -y / 2, -z / 2),
+    "nearnorthwest": lambda l, y, z: (0, y / 2, z / 2),
+    "farnorthwest": lambda l, y, z: (0, y / 2, -z / 2),
+    "nearsouthwest": lambda l, y, z: (0, -y / 2, z / 2),
+    "farsouthwest": lambda l, y, z: (0, -y / 2, -z / 2),
+}
+BALL_ANCHORS = {
+    "anchor": lambda r: (0, 0, 0),
+    "east": lambda r: (r, 0, 0),
+    "west": lambda r: (-r, 0, 0),
+    "north": lambda r: (0, r, 0),
+    "south": lambda r: (0, -r, 0),
+}
+ANCHORS = frozenset(BOX_ANCHORS) | {"top"}
+
+_NUMBERS = re.compile(r"^\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*(?:,\s*(-?[\d.]+)\s*)?\)$")
+_REFERENCE = re.compile(r"^\(\s*(\S+?)-(\w+)\s*\)$")
+_REFERENCES = re.compile(r"\(\s*([^\s(),$]+?)-(%s)\s*\)" % "|".join(sorted(ANCHORS, key=len, reverse=True)))
+
+# Emitted once after \begin{tikzpicture}. "flat pic actions" stands for the
+# pics' "pic actions", empty since layers are placed without any; "flat
+# edges" adds the dashed hidden edges every box style of the pics appends to
+# "every edge".
+FLAT_PRELUDE = r"""\tikzset{flat pic actions/.style={},
+    flat edges/.style={every edge/.append style={flat pic actions, densely dashed, opacity=.7}, flat pic actions}}
+"""
+
+
+def _Number(value):
+    """
+    Format a coordinate for TikZ.
+
+    Parameters
+    ----------
+    value : float
+        Value to format.
+
+    Returns
+    -------
+    str
+        The value with at most five decimals and no trailing zeros.
+    """
+    text = f"{value:.5f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def TikzPoint(point):
+    """
+    Format a 3D point for TikZ.
+
+    Parameters
+    ----------
+    point : tuple of float
+        The x, y and z coordinates.
+
+    Returns
+    -------
+    str
+        The point as ``(x,y,z)``.
+    """
+    return "(" + ",".join(map(_Number, point)) + ")"
+
+
+def _Add(a, b):
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+
+
+def _Lerp(a, b, t):
+    return (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t, a[2] + (b[2] - a[2]) * t)
+
+
+def _StripBraces(text):
+    """
+    Remove the braces pgfkeys would strip from an option value.
+
+    Parameters
+    ----------
+    text : object
+        Option value.
+
+    Returns
+    -------
+    str
+        The value as text without surrounding whitespace and braces.
+    """
+    text = str(text).strip()
+    while text.startswith("{") and text.endswith("}"):
+        text = text[1:-1].strip()
+    return text
+
+
+def Numbers(value):
+    """
+    Parse a number or a comma-separated list of numbers.
+
+    Parameters
+    ----------
+    value : object
+        A number, a tuple of numbers or text such as ``"{ 2, 2 }"``.
+
+    Returns
+    -------
+    list of float
+        The numbers.
+
+    Raises
+    ------
+    ValueError
+        If an item is not a number.
+    """
+    if isinstance(value, (tuple, list)):
+        return [float(v) for v in value]
+    return [float(v) for v in _StripBraces(value).split(",") if v.strip()]
+
+
+class Placement:
+    """
+    Absolute position and extent of one named node.
+
+    Attributes
+    ----------
+    name : str
+        Node name.
+    pic : str or None
+        "Box", "RightBandedBox", "Ball", or None for an input image.
+    origin : tuple of float
+        Where the pic's ``(0,0,0)`` lies.
+    size : tuple of float
+        Total length, height and depth of a box after scaling, or the
+        radius of a ball.
+    extra : dict
+        Anchors defined outside the pic, e.g. the ``top`` of a skip.
+    """
+
+    __slots__ = ("name", "pic", "origin", "size", "extra")
+
+    def __init__(self, name, pic, origin, size=()):
+        self.name = name
+        self.pic = pic
+        self.origin = origin
+        self.size = size
+        self.extra = {}
+
+    def Anchor(self, anchor="anchor"):
+        """
+        Return the absolute position of an anchor.
+
+        Parameters
+        ----------
+        anchor : str, optional
+            Anchor name without the node name, e.g. "east", by default the
+            centre.
+
+        Returns
+        -------
+        tuple of float
+            The x, y and z coordinates.
+
+        Raises
+        ------
+        KeyError
+            If the node has no such anchor.
+        """
+        if anchor in self.extra:
+            return self.extra[anchor]
+        if self.pic == "Ball":
+            return _Add(self.origin, BALL_ANCHORS[anchor](*self.size))
+        if self.pic is None:
+            if anchor != "anchor":
+                raise KeyError(anchor)
+            return self.origin
+        return _Add(self.origin, BOX_ANCHORS[anchor](*self.size))
+
+    def __repr__(self):
+        return f"Placement({self.name!r}, {self.pic!r}, origin={self.origin}, size={self.size})"
+
+
+class Layout:
+    """
+    Index of the absolute positions of an architecture's nodes.
+
+    Parameters
+    ----------
+    arch : iterable, optional
+        Nodes to place, as accepted by ``ToGenerate``. More can be added
+        with :meth:`Add`.
+    """
+
+    def __init__(self, arch=()):
+        self._placements = {}
+        for c in Flatten(arch):
+            self.Add(c)
+
+    def __contains__(self, name):
+        return name in self._placements
+
+    def __len__(self):
+        return len(self._placements)
+
+    def __getitem__(self, name):
+        return self._placements[name]
+
+    def Names(self):
+        """
+        Return the names of the placed nodes.
+
+        Returns
+        -------
+        list of str
+            Names in placement order.
+        """
+        return list(self._placements)
+
+    def Position(self, name, anchor="anchor"):
+        """
+        Return the absolute position of a node's anchor.
+
+        Parameters
+        ----------
+        name : str
+            Node name.
+        anchor : str, optional
+            Anchor, e.g. "east" or "north", by default the centre.
+
+        Returns
+        -------
+        tuple of float
+            The x, y and z coordinates.
+
+        Raises
+        ------
+        KeyError
+            If the node is unknown or has no such anchor.
+        """
+        return self._placements[name].Anchor(anchor)
+
+    def Point(self, text):
+        """
+        Resolve a TikZ coordinate such as ``"(1,0,0)"`` or ``"(conv1-east)"``.
+
+        Parameters
+        ----------
+        text : str
+            Coordinate, optionally wrapped in braces.
+
+        Returns
+        -------
+        tuple of float or None
+            The point, None if it is not a plain or anchor coordinate of a
+            placed node.
+        """
+        text = _StripBraces(text)
+        match = _NUMBERS.match(text)
+        if match:
+            try:
+                return tuple(float(v) for v in match.groups("0"))
+            except ValueError:
+                return None
+        match = _REFERENCE.match(text)
+        if match and match.group(1) in self._placements:
+            try:
+                return self.Position(match.group(1), match.group(2))
+            except KeyError:
+                return None
+        return None
+
+    def Add(self, node):
+        """
+        Place a node after the ones added so far.
+
+        Parameters
+        ----------
+        node : Nodes.Node or str
+            Node to place. Skips record the ``top`` anchors they define;
+            anything else without a name is ignored.
+
+        Returns
+        -------
+        Placement or None
+            The new placement, None if the node has no position or it
+            cannot be resolved in Python.
+        """
+        if isinstance(node, Skip):
+            self._AddSkip(node)
+            return None
+        if isinstance(node, Input):
+            origin = self.Point(node.to)
+            if origin is None:
+                self._placements.pop(node.name, None)
+                return None
+            placement = Placement(node.name, None, origin)
+        elif isinstance(node, Layer):
+            placement = self._PlaceLayer(node)
+            if placement is None:
+                self._placements.pop(node.name, None)
+                return None
+        else:
+            return None
+        self._placements[placement.name] = placement
+        return placement
+
+    def _PlaceLayer(self, node):
+        to = self.Point(node.to)
+        offset = self.Point(node.offset)
+        if to is None or offset is None:
+            return None
+        origin = _Add(to, offset)
+        options = dict(node.Options())
+        try:
+            if node.pic == "Ball":
+                radius = float(options.get("radius", BALL_DEFAULTS["radius"]))
+                return Placement(node.name, node.pic, origin, (radius * SCALE,))
+            widths = Numbers(options.get("width", BOX_DEFAULTS["width"]))
+            height = float(options.get("height", BOX_DEFAULTS["height"]))
+            depth = float(options.get("depth", BOX_DEFAULTS["depth"]))
+        except (TypeError, ValueError):
+            return None
+        size = (sum(widths) * SCALE, height * SCALE, depth * SCALE)
+        return Placement(node.name, node.pic, origin, size)
+
+    def _AddSkip(self, node):
+        try:
+            pos = float(node.pos)
+            of = self._placements[node.of]
+            to = self._placements[node.to]
+            of.extra["top"] = _Lerp(of.Anchor("southeast"), of.Anchor("northeast"), pos)
+            to.extra["top"] = _Lerp(to.Anchor("south"), to.Anchor("north"), pos)
+        except (KeyError, TypeError, ValueError):
+            pass
+
+
+def _Labels(value):
+    """
+    Split a pic's ``xlabel`` array into its items.
+
+    Parameters
+    ----------
+    value : object
+        Option value, e.g. ``"{ 64, }"`` or ``'{" ","dummy"}'``.
+
+    Returns
+    -------
+    list of str
+        Label text per box. Quoted items are pgfmath strings and are used
+        as is; other items are numbers pgfmath formats, so they are still
+        parsed by pgfmath to print exactly as the pics do.
+    """
+    labels = []
+    for item in _StripBraces(value).split(","):
+        item = item.strip()
+        if len(item) >= 2 and item[0] == item[-1] == '"':
+            labels.append(item[1:-1])
+        elif item:
+            labels.append(rf"{{\pgfmathparse{{{item}}}\pgfmathresult}}")
+        else:
+            labels.append("")
+    return labels
+
+
+def _FlatBox(node, placement):
+    """
+    Draw a Box or RightBandedBox pic at an absolute position.
+
+    Parameters
+    ----------
+    node : Nodes.Layer
+        Layer drawn by the pic.
+    placement : Placement
+        Its resolved position.
+
+    Returns
+    -------
+    str
+        TikZ paths equivalent to the pic.
+    """
+    options = dict(BOX_DEFAULTS)
+    options.update(node.Options())
+    origin = placement.origin
+    widths = [w * SCALE for w in Numbers(options["width"])]
+    _, y, z = placement.size
+    banded = node.pic == "RightBandedBox"
+    labels = _Labels(options["xlabel"])
+
+    # Every corner shares one of two y and two z values; format those once.
+    ox = origin[0]
+    top, bottom = _Number(origin[1] + y / 2), _Number(origin[1] - y / 2)
+    near, far = _Number(origin[2] + z / 2), _Number(origin[2] - z / 2)
+
+    box = f"flat edges,fill opacity={options['opacity']},fill={options['fill']}"
+    band = (
+        f"flat edges,fill opacity={options['bandopacity']},"
+        f"fill={options['bandfill']},draw={options['bandfill']}"
+    )
+    lines = ["\n"]
+    k = 0
+    for i, x in enumerate(widths):
+        k += x
+        west, east = _Number(ox + k - x), _Number(ox + k)
+        a, b = f"({west},{top},{near})", f"({west},{bottom},{near})"
+        c, d = f"({east},{bottom},{near})", f"({east},{top},{near})"
+        e, f = f"({east},{top},{far})", f"({east},{bottom},{far})"
+        g, h = f"({west},{bottom},{far})", f"({west},{top},{far})"
+        faces = f"{d} -- {a} -- {b} -- {c} -- cycle {d} -- {a} -- {h} -- {e} -- cycle"
+        if banded:
+            third = _Number(ox + k - x / 3)
+            art, brt, hrt = f"({third},{top},{near})", f"({third},{bottom},{near})", f"({third},{top},{far})"
+            lines.append(f"\\draw [{box}] {faces};\n")
+            lines.append(f"\\draw [{box}] {f} edge {g} {b} edge {g} {h} edge {g};\n")
+            lines.append(
+                f"\\draw [{band}] {d} -- {art} -- {brt} -- {c} -- cycle "
+                f"{d} -- {art} -- {hrt} -- {e} -- cycle;\n"
+            )
+            lines.append(f"\\draw [{box},fill opacity=0] {faces};\n")
+        else:
+            lines.append(f"\\draw [{box}] {faces} {f} edge {g} {b} edge {g} {h} edge {g};\n")
+        label = labels[i] if i < len(labels) else ""
+        lines.append(f"\\path {b} edge [\"{label}\"',midway] {c};\n")
+
+    east = f"{d} -- {e} -- {f} -- {c} -- cycle"
+    lines.append(f"\\draw [{box}] {east};\n")
+    if banded:
+        lines.append(f"\\draw [{band}] {east};\n")
+        lines.append(f"\\draw [flat pic actions] {east};\n")
+    length = k
+    west, middle = _Number(ox), _Number(ox + length / 2)
+    lines.append(
+        f"\\path {c} edge [\"\\small {options['zlabel']}\"',pos=0,"
+        f"text width={_Number(14 * z)}pt,text centered,sloped] {f};\n"
+    )
+    lines.append(
+        f"\\path ({west},{bottom},{near}) edge [\"{options['ylabel']}\",midway] ({west},{top},{near});\n"
+    )
+    lines.append(
+        f"\\path ({middle},{bottom},{near}) + (0,-25pt) coordinate (cap) "
+        f"edge [\"\\textcolor{{black}}{{ \\bf {options['caption']}}}\"',"
+        f"text width={_Number(15 * length / SCALE)}pt,text centered] (cap);\n"
+    )
+    return "".join(lines)
+
+
+def _FlatBall(node, placement):
+    """
+    Draw a Ball pic at an absolute position.
+
+    Parameters
+    ----------
+    node : Nodes.Layer
+        Layer drawn by the pic.
+    placement : Placement
+        Its resolved position.
+
+    Returns
+    -------
+    str
+        TikZ paths equivalent to the pic.
+    """
+    options = dict(BALL_DEFAULTS)
+    options.update(node.Options())
+    (r,) = placement.size
+    center = TikzPoint(placement.origin)
+    south = TikzPoint(placement.Anchor("south"))
+    return (
+        f"\n\\shade[ball color={options['fill']},opacity={options['opacity']}] "
+        f"{center} circle ({_Number(r)});\n"
+        f"\\draw {center} circle [radius={_Number(r)}] node[scale={_Number(4 * r)}] {{{options['logo']}}};\n"
+        f"\\path {south} + (0,-20pt) coordinate (caption-node)\n"
+        f"edge [\"\\textcolor{{black}}{{\\bf {options.get('caption', '')}}}\"'] (caption-node);\n"
+    )
+
+
+def FlatLayer(node, placement):
+    """
+    Draw a layer at an absolute position, without its pic.
+
+    Parameters
+    ----------
+    node : Nodes.Layer
+        Layer to draw.
+    placement : Placement
+        Its resolved position.
+
+    Returns
+    -------
+    str
+        TikZ paths equivalent to the pic.
+    """
+    return (_FlatBall if node.pic == "Ball" else _FlatBox)(node, placement)
+
+
+def Flat(arch, layout=None, draw=None):
+    """
+    Rewrite an architecture so TeX draws it at pre-computed coordinates.
+
+    Layers, connections and skips whose positions resolve in Python are
+    drawn directly; any other node or raw TikZ fragment is kept as is, and
+    the named anchors it references are defined for it first.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    layout : Layout, optional
+        Layout to fill in while rewriting, by default a new one.
+    draw : callable, optional
+        Function of a layer and its :class:`Placement` returning the TikZ
+        code drawing it, by default paths equivalent to its pic.
+
+    Yields
+    ------
+    Node or str
+        Fragments of the flattened architecture.
+    """
+    layout = Layout() if layout is None else layout
+    draw = FlatLayer if draw is None else draw
+    flat = set()
+    defined = set()
+    for c in Flatten(arch):
+        if isinstance(c, (Head, Colors, End)):
+            yield c
+            continue
+        if isinstance(c, Begin):
+            yield c
+            yield FLAT_PRELUDE
+            continue
+
+        placement = layout.Add(c)
+        if isinstance(c, Layer) and placement is not None:
+            flat.add(c.name)
+            yield draw(c, placement)
+            continue
+        if isinstance(c, Input) and placement is not None:
+            flat.add(c.name)
+            yield c.Replace(to=TikzPoint(placement.origin))
+            continue
+        if isinstance(c, Connection) and c.of in flat and c.to in flat:
+            try:
+                yield (
+                    f"\n\\draw [connection]  {TikzPoint(layout.Position(c.of, 'east'))} -- "
+                    f"node {{\\midarrow}} {TikzPoint(layout.Position(c.to, 'west'))};\n"
+                )
+                continue
+            except KeyError:
+                pass
+        if isinstance(c, Skip) and c.of in flat and c.to in flat:
+            try:
+                yield (
+                    f"\n\\draw [copyconnection]  {TikzPoint(layout.Position(c.of, 'northeast'))}\n"
+                    f"    -- node {{\\copymidarrow}} {TikzPoint(layout.Position(c.of, 'top'))}\n"
+                    f"    -- node {{\\copymidarrow}} {TikzPoint(layout.Position(c.to, 'top'))}\n"
+                    f"    -- node {{\\copymidarrow}} {TikzPoint(layout.Position(c.to, 'north'))};\n"
+                )
+                continue
+            except KeyError:
+                pass
+
+        if isinstance(c, Layer):
+            # Drawn by its pic again, which redefines the name's anchors.
+            flat.discard(c.name)
+            defined = {ref for ref in defined if ref[0] != c.name}
+        text = c if isinstance(c, str) else str(c)
+        for name, anchor in _REFERENCES.findall(text):
+            if name in flat and (name, anchor) not in defined:
+                try:
+                    point = layout.Position(name, anchor)
+                except KeyError:
+                    continue
+                defined.add((name, anchor))
+                yield f"\\coordinate ({name}-{anchor}) at {TikzPoint(point)};\n"
+        yield c
+
+
+def Reuse(arch, minCopies=2):
+    """
+    Rewrite an architecture like :func:`Flat`, drawing repeated layers once.
+
+    Layers whose drawings are identical up to their position (same pic,
+    size, colors, labels and caption) are typeset once with ``\\ReuseSave``
+    from ``Layers/Reuse.sty`` and placed with ``\\ReuseUse``. pdfTeX and
+    LuaTeX store each such drawing as a PDF form XObject, so the content
+    stream and TeX's work shrink with the amount of repetition.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    minCopies : int, optional
+        Fewest identical layers drawn once, by default 2.
+
+    Yields
+    ------
+    Node or str
+        Fragments of the flattened architecture.
+    """
+    arch = list(Flatten(arch))
+    layout = Layout()
+    drawings = {}
+    counts = {}
+    for c in arch:
+        placement = layout.Add(c)
+        if isinstance(c, Layer) and placement is not None:
+            origin = Placement(c.name, c.pic, (0, 0, 0), placement.size)
+            drawing = drawings[id(c)] = FlatLayer(c, origin)
+            counts[drawing] = counts.get(drawing, 0) + 1
+    keys = {
+        drawing: hashlib.sha1(drawing.encode()).hexdigest()[:12]
+        for drawing, count in counts.items()
+        if count >= max(minCopies, 2)
+    }
+
+    def Draw(c, placement):
+        key = keys.get(drawings.get(id(c)))
+        if key is None:
+            return FlatLayer(c, placement)
+        return f"\n\\ReuseUse{{{key}}}{{{TikzPoint(placement.origin)}}}\n"
+
+    for c in Flat(arch, draw=Draw):
+        yield c
+        if isinstance(c, Begin):
+            for drawing, key in keys.items():
+                yield f"\\ReuseSave{{{key}}}{{{FLAT_PRELUDE}{drawing}}}\n"
+
+
+def ToGenerateFlat(arch, pathname="file.tex", **kwargs):
+    """
+    Generate the LaTeX file with every resolvable layer drawn at absolute coordinates.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    pathname : str or file object, optional
+        Output .tex file, by default "file.tex".
+    **kwargs
+        Passed to ``ToGenerate``.
+
+    Returns
+    -------
+    bool
+        Whether the output was written, as returned by ``ToGenerate``.
+    """
+    return ToGenerate(Flat(arch), pathname, **kwargs)
+
+
+def ToGenerateReused(arch, pathname="file.tex", minCopies=2, **kwargs):
+    """
+    Generate the LaTeX file with identical layers drawn once, as for :func:`Reuse`.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    pathname : str or file object, optional
+        Output .tex file, by default "file.tex".
+    minCopies : int, optional
+        Fewest identical layers drawn once, by default 2.
+    **kwargs
+        Passed to ``ToGenerate``.
+
+    Returns
+    -------
+    bool
+        Whether the output was written, as returned by ``ToGenerate``.
+    """
+    return ToGenerate(Reuse(arch, minCopies), pathname, **kwargs)
@@ -0,0 +1,368 @@
+"""
+Single-pass compilation of many architectures.
+
+``ToHead`` declares ``standalone`` in ``multi`` mode, so every
+``tikzpicture`` of a document becomes its own page. Emitting N
+architectures as N pictures of one document compiles them in one TeX run,
+paying process startup and preamble loading once; the pages are then split
+back into one PDF per architecture.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import Pdf
+from .Build import (
+    BuildResult,
+    BuildScript,
+    CompileTex,
+    LoadArch,
+    Relocate,
+    TexEnvironment,
+    Transform,
+)
+from .CompileCache import DEFAULT_MAX_BYTES, CompileCache, DefaultDirectory
+from .Engines import GetEngine, SelectEngine
+from .Format import EnsureFormat
+from .Nodes import Begin, End, Flatten
+from .Paged import Cost
+from .TikzGen import ToGenerate
+
+
+def _Preamble(nodes):
+    """
+    Read an architecture up to its ``ToBegin``.
+
+    Parameters
+    ----------
+    nodes : iterator
+        Flattened architecture; it is left positioned after the ``ToBegin``.
+
+    Returns
+    -------
+    tuple of (list, Begin)
+        The fragments before the ``ToBegin``, ending with the start of the
+        document, and the ``ToBegin`` itself.
+
+    Raises
+    ------
+    ValueError
+        If the architecture has no ``ToBegin``.
+    """
+    fragments = []
+    for c in nodes:
+        if isinstance(c, Begin):
+            fragments.append(c.Document())
+            return fragments, c
+        fragments.append(c)
+    raise ValueError("the architecture has no ToBegin")
+
+
+def _MultiDocument(archs):
+    """
+    Merge architectures into the fragments of one multi-picture document.
+
+    Every architecture contributes its own ``tikzpicture``; they must share
+    one preamble, which is written once.
+
+    Parameters
+    ----------
+    archs : iterable
+        Architectures, each as accepted by ``ToGenerate``.
+
+    Yields
+    ------
+    Node or str
+        Fragments of the combined document.
+
+    Raises
+    ------
+    ValueError
+        If an architecture has no ``ToBegin`` or its preamble differs from
+        the first one's.
+    """
+    preamble = None
+    for arch in archs:
+        nodes = iter(Flatten(arch))
+        fragments, begin = _Preamble(nodes)
+        if preamble is None:
+            preamble = "".join(fragments)
+            yield from fragments
+        elif "".join(fragments) != preamble:
+            raise ValueError("architectures with different preambles cannot share a document")
+        yield begin.Picture()
+        for c in nodes:
+            yield c.Picture() if isinstance(c, End) else c
+    yield End().Document()
+
+
+def ToGenerateMulti(archs, pathname="file.tex", **kwargs):
+    """
+    Generate one LaTeX file holding every architecture as its own page.
+
+    Parameters
+    ----------
+    archs : iterable
+        Architectures, each as accepted by ``ToGenerate``.
+    pathname : str or file object, optional
+        Output .tex file, by default "file.tex".
+    **kwargs
+        Passed to ``ToGenerate``.
+
+    Returns
+    -------
+    None
+    """
+    ToGenerate(_MultiDocument(archs), pathname, **kwargs)
+
+
+def CompileMulti(archs, outputPaths, engine="pdflatex", timeout=None, fmt=None, baseDir=None):
+    """
+    Compile many architectures in one TeX run and split them into separate PDFs.
+
+    Parameters
+    ----------
+    archs : list
+        Architectures, each with exactly one ``ToBegin``/``ToEnd`` pair,
+        sharing one preamble (``ToHead``, ``ToCor`` and anything else before
+        ``ToBegin``).
+    outputPaths : list of str
+        One output PDF path per architecture.
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex".
+    timeout : float, optional
+        Seconds before the run is killed, by default no limit.
+    fmt : str or bool, optional
+        Precompiled format to load, or True to build one for the shared
+        preamble, by default None.
+    baseDir : str or list of str, optional
+        Directory (or one per architecture) relative input image paths are
+        resolved against, by default the current directory.
+
+    Returns
+    -------
+    Build.CompileResult
+        Result of the single TeX run, with ``pdfPath`` set to the first
+        output path on success and None on failure.
+
+    Raises
+    ------
+    ValueError
+        If the preambles of the architectures differ.
+    """
+    if baseDir is None or isinstance(baseDir, str):
+        baseDir = [baseDir or os.getcwd()] * len(archs)
+
+    with tempfile.TemporaryDirectory(prefix="plotneuralnet-") as workDir:
+        texPath = os.path.join(workDir, "multi.tex")
+        ToGenerateMulti(
+            (Relocate(arch, base) for arch, base in zip(archs, baseDir)), texPath
+        )
+        if fmt is True:
+            fmt = EnsureFormat(texPath, engine, timeout=timeout, env=TexEnvironment())
+        result = CompileTex(texPath, engine=engine, timeout=timeout, fmt=fmt or None)
+        if result.ok:
+            for path in outputPaths:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            Pdf.Split(result.pdfPath, outputPaths)
+            result.pdfPath = outputPaths[0] if outputPaths else None
+    return result
+
+
+def BuildChunk(
+    scripts,
+    outputDir=None,
+    engine="pdflatex",
+    timeout=None,
+    cacheDir=None,
+    cacheMaxBytes=DEFAULT_MAX_BYTES,
+    precompile=False,
+    transforms=(),
+):
+    """
+    Build several architecture scripts with a single TeX run.
+
+    Scripts whose document is already in the compile cache are served from
+    it; the rest are compiled together, one TeX run per distinct preamble
+    and engine. With "auto", every script gets the engine
+    :func:`Build.BuildScript` would pick for it.
+    If a combined run fails, its scripts are rebuilt one by one so the
+    failure is attributed correctly.
+
+    Parameters
+    ----------
+    scripts : list of str
+        Paths to the architecture scripts.
+    outputDir, engine, timeout, cacheDir, cacheMaxBytes, precompile, transforms
+        As for :func:`Build.BuildScript`.
+
+    Returns
+    -------
+    list of Build.BuildResult
+        One result per script.
+    """
+    options = dict(
+        outputDir=outputDir,
+        engine=engine,
+        timeout=timeout,
+        cacheDir=cacheDir,
+        cacheMaxBytes=cacheMaxBytes,
+        precompile=precompile,
+        transforms=transforms,
+    )
+    cache = CompileCache(cacheDir, cacheMaxBytes) if cacheDir is not None else None
+    results = []
+    # Scripts awaiting compilation, by the preamble and engine they share.
+    groups = {}
+    auto = GetEngine(engine).auto
+
+    with tempfile.TemporaryDirectory(prefix="plotneuralnet-") as workDir:
+        for script in scripts:
+            script = os.path.abspath(script)
+            scriptDir = os.path.dirname(script)
+            jobName = os.path.splitext(os.path.basename(script))[0]
+            result = BuildResult(script)
+            results.append(result)
+            destination = os.path.join(outputDir or scriptDir, jobName + ".pdf")
+
+            start = time.perf_counter()
+            try:
+                arch = list(Transform(Relocate(LoadArch(script), scriptDir), transforms))
+                scriptEngine = engine
+                if auto:
+                    scriptEngine = SelectEngine(engine, sum(Cost(c) for c in Flatten(arch)))
+                key = None
+                if cache is not None:
+                    texPath = os.path.join(workDir, f"{len(results)}-{jobName}.tex")
+                    ToGenerate(arch, texPath)
+                    key = cache.Key(texPath, scriptEngine)
+            except Exception as e:
+                result.error = f"generation failed: {type(e).__name__}: {e}"
+                continue
+            finally:
+                result.generateSeconds = time.perf_counter() - start
+
+            cached = cache.Get(key) if cache is not None else None
+            if cached is not None:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copyfile(cached, destination)
+                result.pdfPath = destination
+                result.cached = True
+            else:
+                pages = os.path.join(workDir, f"{len(results)}-{jobName}.pdf")
+                try:
+                    preamble = "".join(_Preamble(iter(Flatten(arch)))[0])
+                except ValueError as e:
+                    result.error = f"generation failed: {e}"
+                    continue
+                scriptEngine = GetEngine(scriptEngine)
+                groups.setdefault((preamble, scriptEngine.Key()), (scriptEngine, []))[1].append(
+                    (result, arch, key, pages, destination)
+                )
+
+        fmt = None
+        if precompile:
+            fmt = os.path.join(cacheDir or DefaultDirectory(), "formats")
+        for index, (groupEngine, pending) in enumerate(groups.values()):
+            try:
+                compiled = CompileMulti(
+                    [arch for _, arch, _, _, _ in pending],
+                    [pages for _, _, _, pages, _ in pending],
+                    engine=groupEngine,
+                    timeout=timeout,
+                    fmt=_EnsureChunkFormat(pending, fmt, groupEngine, timeout, workDir, index),
+                )
+            except (OSError, ValueError, Pdf.PdfError):
+                compiled = None
+
+            if compiled is None or not compiled.ok:
+                for result, _, _, _, _ in pending:
+                    single = BuildScript(result.script, **options)
+                    results[results.index(result)] = single
+                continue
+
+            share = compiled.seconds / len(pending)
+            for result, _, key, pages, destination in pending:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copyfile(pages, destination)
+                if cache is not None:
+                    cache.Put(key, pages)
+                result.pdfPath = destination
+                result.compileSeconds = share
+                result.metrics = compiled.metrics
+                result.engine = compiled.engine
+    return results
+
+
+def _EnsureChunkFormat(pending, directory, engine, timeout, workDir, index=0):
+    """
+    Build the precompiled format shared by scripts with one preamble, if requested.
+
+    Parameters
+    ----------
+    pending : list of tuple
+        Scripts awaiting compilation with the same preamble, as collected by
+        :func:`BuildChunk`.
+    directory : str or None
+        Format directory, None when formats are not used.
+    engine : Engines.Engine or str
+        TeX engine.
+    timeout : float or None
+        Seconds before dumping the format is abandoned.
+    workDir : str
+        Scratch directory.
+    index : int, optional
+        Number of the preamble within the chunk, keeping its scratch file
+        apart, by default 0.
+
+    Returns
+    -------
+    str or None
+        Path to the format, None if not requested or unavailable.
+    """
+    if directory is None:
+        return None
+    texPath = os.path.join(workDir, f"preamble-{index}.tex")
+    ToGenerateMulti([pending[0][1]], texPath)
+    return EnsureFormat(texPath, engine, directory=directory, timeout=timeout, env=TexEnvironment())
+
+
+def BuildAll(scripts, jobs=None, **options):
+    """
+    Build architecture scripts in as few TeX runs as there are workers.
+
+    The scripts are dealt round-robin into one chunk per worker and each
+    chunk is compiled with :func:`BuildChunk`.
+
+    Parameters
+    ----------
+    scripts : iterable of str
+        Paths to the architecture scripts.
+    jobs : int, optional
+        Number of worker processes, by default one per core.
+    **options
+        Passed to :func:`BuildChunk`.
+
+    Yields
+    ------
+    Build.BuildResult
+        One result per script, chunk by chunk in completion order.
+    """
+    scripts = list(scripts)
+    jobs = min(jobs or os.cpu_count() or 1, max(len(scripts), 1))
+    chunks = [scripts[i::jobs] for i in range(jobs)]
+    if jobs == 1:
+        yield from BuildChunk(scripts, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(BuildChunk, chunk, **options): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                yield from future.result()
+            except Exception as e:
+                for script in futures[future]:
+                    yield BuildResult(script, error=f"{type(e).__name__}: {e}")
@@ -0,0 +1,741 @@
+"""
+Typed intermediate representation behind the TikZ helpers.
+
+Every ``To*`` helper in :mod:`TikzGen` returns one of these nodes. A node
+is the string of TikZ code it renders to, so it can be joined, written and
+compared like the strings the helpers always returned, and it keeps its
+parameters for the architecture rewrites to inspect and replace.
+"""
+
+import os
+
+from .RenderCache import RenderCache
+
+# Templates shared by the nodes rendered so far, see ``Node._memoize``.
+TEMPLATES = RenderCache()
+
+
+class Node(str):
+    """
+    Base class of every architecture node.
+
+    Subclasses list their parameters in ``_params``; positional and keyword
+    arguments to the constructor fill them in that order, and fields listed
+    in ``_defaults`` may be omitted. The fields are kept in the instance
+    dictionary, since a ``str`` subclass cannot have slots, and the node is
+    rendered once, when it is created. Most kinds implement the static
+    method :meth:`Text`, called with the field values before the node
+    exists. ``_memoize`` marks the kinds expensive enough for sharing
+    rendered templates to pay off; they implement :meth:`Render` instead,
+    and fields listed in ``_instanceFields`` (names and anchors) vary
+    between otherwise identical nodes and are filled into the templates.
+    """
+
+    __slots__ = ()
+    _params = ()
+    _fields = ()
+    _defaults = {}
+    _instanceFields = ()
+    _memoize = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(
+            field
+            for klass in reversed(cls.__mro__)
+            for field in klass.__dict__.get("_params", ())
+        )
+        cls.__new__ = _Constructor(cls)
+
+    @classmethod
+    def _Bind(cls, args, kwargs):
+        """Map constructor arguments to a dictionary of fields, in field order."""
+        fields = cls._fields
+        if len(args) > len(fields):
+            raise TypeError(
+                f"{cls.__name__}() takes {len(fields)} arguments "
+                f"but {len(args)} were given"
+            )
+        values = dict(zip(fields, args))
+        if len(args) == len(fields) and not kwargs:
+            return values
+        for field in fields[len(args) :]:
+            if field in kwargs:
+                values[field] = kwargs.pop(field)
+            elif field in cls._defaults:
+                values[field] = cls._defaults[field]
+            else:
+                raise TypeError(f"{cls.__name__}() missing argument '{field}'")
+        if kwargs:
+            raise TypeError(f"{cls.__name__}() got unexpected arguments {sorted(kwargs)}")
+        return values
+
+    @classmethod
+    def Unrendered(cls, *args, **kwargs):
+        """
+        Create a node with its fields set but its text still empty.
+
+        Used to render templates of memoized kinds, see ``RenderCache``.
+
+        Parameters
+        ----------
+        *args, **kwargs
+            Field values, as for the constructor.
+
+        Returns
+        -------
+        Node
+            The node, whose :meth:`Render` returns its TikZ code.
+        """
+        node = super().__new__(cls)
+        node.__dict__ = cls._Bind(args, kwargs)
+        return node
+
+    @staticmethod
+    def Text(*values):
+        """
+        Render a node of this kind from its field values.
+
+        Parameters
+        ----------
+        *values
+            The fields, in declaration order.
+
+        Returns
+        -------
+        str
+            LaTeX code for the node.
+        """
+        raise NotImplementedError
+
+    def Fields(self):
+        """
+        Return the node parameters in declaration order.
+
+        Returns
+        -------
+        tuple
+            The value of every field in ``_params``.
+        """
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def Replace(self, **changes):
+        """
+        Return a copy of the node with some fields replaced.
+
+        Parameters
+        ----------
+        **changes
+            New values keyed by field name.
+
+        Returns
+        -------
+        Node
+            The modified copy.
+        """
+        values = dict(zip(self._fields, self.Fields()))
+        values.update(changes)
+        return type(self)(**values)
+
+    def Render(self):
+        """
+        Render the node to TikZ.
+
+        Returns
+        -------
+        str
+            LaTeX code for the node.
+        """
+        return self.Text(*self.Fields())
+
+    def __eq__(self, other):
+        if isinstance(other, Node):
+            return type(self) is type(other) and self.Fields() == other.Fields()
+        return str.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Equal nodes render alike, so the text's hash is consistent with both.
+    __hash__ = str.__hash__
+
+    def __repr__(self):
+        args = ", ".join(
+            f"{field}={value!r}"
+            for field, value in zip(self._fields, self.Fields())
+        )
+        return f"{type(self).__name__}({args})"
+
+    def __reduce__(self):
+        return type(self), self.Fields()
+
+
+def _Constructor(cls):
+    """
+    Generate the ``__new__`` of a node class.
+
+    Like the methods ``dataclasses`` generates, it takes the fields as its
+    parameters, so the constructor does no argument processing of its own:
+    it renders the text, straight from the field values or through the
+    shared templates for memoized kinds, and stores the fields.
+
+    Parameters
+    ----------
+    cls : type
+        Node class, with its ``_fields`` set.
+
+    Returns
+    -------
+    function
+        The constructor.
+
+    Raises
+    ------
+    TypeError
+        If a field without a default follows one with a default.
+    """
+    parameters = []
+    for field in cls._fields:
+        if field in cls._defaults:
+            parameters.append(f"{field}=_defaults[{field!r}]")
+        elif parameters and "=" in parameters[-1]:
+            raise TypeError(f"{cls.__name__}: field '{field}' without a default follows one with a default")
+        else:
+            parameters.append(field)
+    values = "{" + ", ".join(f"{field!r}: {field}" for field in cls._fields) + "}"
+    if cls._memoize:
+        # Inlined RenderCache.TemplateKey.
+        key = "".join(
+            f", {field}, type({field})" for field in cls._fields if field not in cls._instanceFields
+        )
+        body = f"""    values = {values}
+    node = _New(cls, _TEMPLATES.Fill(cls, values, (cls{key})))
+    node.__dict__ = values
+"""
+    else:
+        body = f"""    node = _New(cls, cls.Text({", ".join(cls._fields)}))
+    node.__dict__ = {values}
+"""
+    source = f"def __new__({', '.join(['cls'] + parameters)}):\n{body}    return node\n"
+    namespace = {"_defaults": cls._defaults, "_New": str.__new__, "_TEMPLATES": TEMPLATES}
+    exec(source, namespace)
+    constructor = namespace["__new__"]
+    constructor.__qualname__ = f"{cls.__qualname__}.__new__"
+    return constructor
+
+
+def Flatten(arch):
+    """
+    Flatten an architecture into a stream of nodes and raw fragments.
+
+    Parameters
+    ----------
+    arch : iterable
+        Nodes or strings, or nested iterables of them such as Block outputs.
+
+    Yields
+    ------
+    Node or str
+        Each leaf in order.
+    """
+    stack = [iter(arch)]
+    while stack:
+        for c in stack[-1]:
+            if isinstance(c, (str, Node)) or not hasattr(c, "__iter__"):
+                yield c
+            else:
+                stack.append(iter(c))
+                break
+        else:
+            stack.pop()
+
+
+# Document structure
+
+
+class Head(Node):
+    """
+    Document class, layer packages and TikZ libraries.
+
+    ``pics`` names the implementation of the layer pics: "standard" for
+    the ones of ``Layers/init.tex``, or the name of a ``Layers/<pics>.tex``
+    loaded after it to replace them.
+    """
+
+    _params = ("projectPath", "pics")
+    _defaults = {"pics": "standard"}
+    PICS = ("standard", "fast", "draft")
+
+    @staticmethod
+    def Text(projectPath, pics):
+        pathLayers = os.path.join(projectPath, "Layers/").replace("\\", "/")
+        pics = "" if pics == "standard" else f"\\subimport{{{pathLayers}}}{{{pics}}}\n"
+        return rf"""
+\documentclass[border=8pt, multi, tikz]{{standalone}}
+\usepackage{{import}}
+\subimport{{{pathLayers}}}{{init}}
+{pics}\usetikzlibrary{{positioning}}
+\usetikzlibrary{{3d}} %for including external image
+"""
+
+
+class Colors(Node):
+    """Color scheme shared by the layer helpers."""
+
+    _params = ()
+
+    @staticmethod
+    def Text():
+        return rf"""
+\def\ConvColor{{rgb:yellow,5;red,2.5;white,5}}
+\def\ConvReluColor{{rgb:yellow,5;red,5;white,5}}
+\def\PoolColor{{rgb:red,1;black,0.3}}
+\def\UnpoolColor{{rgb:blue,2;green,1;black,0.3}}
+\def\FcColor{{rgb:blue,5;red,2.5;white,5}}
+\def\FcReluColor{{rgb:blue,5;red,5;white,4}}
+\def\SoftmaxColor{{rgb:magenta,5;black,7}}
+\def\SumColor{{rgb:blue,5;green,15}}
+"""
+
+
+class Begin(Node):
+    """
+    Start of the document and of the TikZ picture.
+
+    With ``draft`` set, connections are drawn without transparency.
+    """
+
+    _params = ("draft",)
+    _defaults = {"draft": False}
+
+    @staticmethod
+    def Text(draft):
+        return Begin.Document() + Begin._Picture(draft)
+
+    @staticmethod
+    def Document():
+        """
+        Return the preamble commands and the start of the document.
+
+        Returns
+        -------
+        str
+            LaTeX code up to and including ``\\begin{document}``.
+        """
+        return rf"""
+\newcommand{{\copymidarrow}}{{\tikz \draw[-Stealth,line width=0.8mm,draw={{rgb:blue,4;red,1;green,1;black,3}}] (-0.3,0) -- ++(0.3,0);}}
+
+\begin{{document}}
+"""
+
+    def Picture(self):
+        """
+        Return the start of the TikZ picture and its connection styles.
+
+        Returns
+        -------
+        str
+            LaTeX code opening a ``tikzpicture``.
+        """
+        return self._Picture(self.draft)
+
+    @staticmethod
+    def _Picture(draft):
+        opacity = "" if draft else ",opacity=0.7"
+        return rf"""\begin{{tikzpicture}}
+\tikzstyle{{connection}}=[ultra thick,every node/.style={{sloped,allow upside down}},draw=\edgecolor{opacity}]
+\tikzstyle{{copyconnection}}=[ultra thick,every node/.style={{sloped,allow upside down}},draw={{rgb:blue,4;red,1;green,1;black,3}}{opacity}]
+"""
+
+
+class End(Node):
+    """End of the TikZ picture and of the document."""
+
+    _params = ()
+
+    @staticmethod
+    def Text():
+        return End.Picture() + End.Document()
+
+    @staticmethod
+    def Picture():
+        """
+        Return the end of the TikZ picture.
+
+        Returns
+        -------
+        str
+            LaTeX code closing the ``tikzpicture``.
+        """
+        return r"""
+\end{tikzpicture}
+"""
+
+    @staticmethod
+    def Document():
+        """
+        Return the end of the document.
+
+        Returns
+        -------
+        str
+            LaTeX code closing the document.
+        """
+        return r"""\end{document}
+"""
+
+
+# Layers
+
+
+class Input(Node):
+    """Input image drawn on the zy plane."""
+
+    _params = ("pathFile", "to", "width", "height", "name")
+    _instanceFields = ("to", "name")
+    _memoize = True
+
+    def Render(self):
+        return rf"""
+\node[canvas is zy plane at x=0] ({self.name}) at {self.to} {{\includegraphics[width={self.width}cm,height={self.height}cm]{{{self.pathFile}}}}};
+"""
+
+
+class Layer(Node):
+    """
+    A layer drawn with one of the pics from ``Layers/``.
+
+    Subclasses set ``pic``, implement :meth:`Options` and end their
+    ``_params`` with ``anchors``: the names of the anchors the pic defines,
+    or None (the default) for all of them.
+    """
+
+    _params = ()
+    _defaults = {"anchors": None}
+    _instanceFields = ("name", "offset", "to")
+    _memoize = True
+    pic = None
+
+    def Options(self):
+        """
+        Return the pic options in rendering order.
+
+        Returns
+        -------
+        list of tuple of (str, object)
+            Option keys and values.
+        """
+        raise NotImplementedError
+
+    def Render(self):
+        options = self.Options()
+        if self.anchors is not None:
+            options.append(("anchors", "{" + ",".join(self.anchors) + "}"))
+        options = ",\n        ".join(f"{key}={value}" for key, value in options)
+        return rf"""
+\pic[shift={self.offset}] at {self.to} {{
+    {self.pic}={{
+        {options}
+    }}
+}};
+"""
+
+
+class Conv(Layer):
+    """Convolutional layer."""
+
+    _params = (
+        "name",
+        "sFilter",
+        "nFilter",
+        "offset",
+        "to",
+        "width",
+        "height",
+        "depth",
+        "caption",
+        "anchors",
+    )
+    pic = "Box"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("xlabel", f"{{ {self.nFilter}, }}"),
+            ("zlabel", self.sFilter),
+            ("fill", r"\ConvColor"),
+            ("height", self.height),
+            ("width", self.width),
+            ("depth", self.depth),
+        ]
+
+
+class ConvConvRelu(Layer):
+    """Two convolutions followed by a ReLU band."""
+
+    _params = (
+        "name",
+        "sFilter",
+        "nFilter",
+        "offset",
+        "to",
+        "width",
+        "height",
+        "depth",
+        "caption",
+        "anchors",
+    )
+    pic = "RightBandedBox"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("xlabel", f"{{ {self.nFilter[0]}, {self.nFilter[1]} }}"),
+            ("zlabel", self.sFilter),
+            ("fill", r"\ConvColor"),
+            ("bandfill", r"\ConvReluColor"),
+            ("height", self.height),
+            ("width", f"{{ {self.width[0]}, {self.width[1]} }}"),
+            ("depth", self.depth),
+        ]
+
+
+class Pool(Layer):
+    """Pooling layer."""
+
+    _params = ("name", "offset", "to", "width", "height", "depth", "opacity", "caption", "anchors")
+    pic = "Box"
+    fill = r"\PoolColor"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("fill", self.fill),
+            ("opacity", self.opacity),
+            ("height", self.height),
+            ("width", self.width),
+            ("depth", self.depth),
+        ]
+
+
+class UnPool(Pool):
+    """Unpooling layer."""
+
+    _params = ()
+    fill = r"\UnpoolColor"
+
+
+class ConvRes(Layer):
+    """Convolutional residual layer."""
+
+    _params = (
+        "name",
+        "sFilter",
+        "nFilter",
+        "offset",
+        "to",
+        "width",
+        "height",
+        "depth",
+        "opacity",
+        "caption",
+        "anchors",
+    )
+    pic = "RightBandedBox"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("xlabel", f"{{ {self.nFilter}, }}"),
+            ("zlabel", self.sFilter),
+            ("fill", "{rgb:white,1;black,3}"),
+            ("bandfill", "{rgb:white,1;black,2}"),
+            ("opacity", self.opacity),
+            ("height", self.height),
+            ("width", self.width),
+            ("depth", self.depth),
+        ]
+
+
+class ConvSoftMax(Layer):
+    """Convolutional softmax layer."""
+
+    _params = (
+        "name",
+        "sFilter",
+        "offset",
+        "to",
+        "width",
+        "height",
+        "depth",
+        "caption",
+        "anchors",
+    )
+    pic = "Box"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("zlabel", self.sFilter),
+            ("fill", r"\SoftmaxColor"),
+            ("height", self.height),
+            ("width", self.width),
+            ("depth", self.depth),
+        ]
+
+
+class SoftMax(Layer):
+    """Softmax layer."""
+
+    _params = (
+        "name",
+        "sFilter",
+        "offset",
+        "to",
+        "width",
+        "height",
+        "depth",
+        "opacity",
+        "caption",
+        "anchors",
+    )
+    pic = "Box"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("xlabel", '{" ","dummy"}'),
+            ("zlabel", self.sFilter),
+            ("fill", r"\SoftmaxColor"),
+            ("opacity", self.opacity),
+            ("height", self.height),
+            ("width", self.width),
+            ("depth", self.depth),
+        ]
+
+
+class FullyConnected(Layer):
+    """Fully connected layer."""
+
+    _params = (
+        "name",
+        "sFilter",
+        "offset",
+        "to",
+        "width",
+        "height",
+        "depth",
+        "caption",
+        "anchors",
+    )
+    pic = "Box"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("caption", self.caption),
+            ("xlabel", '{" ","dummy"}'),
+            ("zlabel", self.sFilter),
+            ("fill", r"\FcColor"),
+            ("height", self.height),
+            ("width", self.width),
+            ("depth", self.depth),
+        ]
+
+
+class Sum(Layer):
+    """Elementwise summation drawn as a ball."""
+
+    _params = ("name", "offset", "to", "radius", "opacity", "anchors")
+    pic = "Ball"
+
+    def Options(self):
+        return [
+            ("name", self.name),
+            ("fill", r"\SumColor"),
+            ("opacity", self.opacity),
+            ("radius", self.radius),
+            ("logo", "$+$"),
+        ]
+
+
+# Edges
+
+
+class Edge(Node):
+    """Base class of the nodes that connect two layers."""
+
+    _params = ()
+    _instanceFields = ("of", "to")
+
+
+class Connection(Edge):
+    """Arrow from the east side of one layer to the west side of another."""
+
+    _params = ("of", "to")
+
+    @staticmethod
+    def Text(of, to):
+        return rf"""
+\draw [connection]  ({of}-east) -- node {{\midarrow}} ({to}-west);
+"""
+
+
+class Skip(Edge):
+    """Skip connection drawn over the top of the layers in between."""
+
+    _params = ("of", "to", "pos")
+
+    @staticmethod
+    def Text(of, to, pos):
+        return rf"""
+\path ({of}-southeast) -- ({of}-northeast) coordinate[pos={pos}] ({of}-top);
+\path ({to}-south) -- ({to}-north) coordinate[pos={pos}] ({to}-top);
+\draw [copyconnection]  ({of}-northeast)
+    -- node {{\copymidarrow}} ({of}-top)
+    -- node {{\copymidarrow}} ({to}-top)
+    -- node {{\copymidarrow}} ({to}-north);
+"""
+
+
+# Grouping
+
+
+class Group(Node):
+    """
+    Start or end of a block of nodes; draws nothing.
+
+    The markers keep a block's boundaries when its nodes are unpacked into
+    ``arch``, so ``Externalize`` can compile the block on its own.
+    """
+
+    _params = ("name", "end")
+    _defaults = {"end": False}
+    _instanceFields = ("name",)
+
+    @staticmethod
+    def Text(name, end):
+        return ""
+
+
+# Annotations
+
+
+class Badge(Node):
+    """Repeat count drawn above a layer standing for a collapsed run."""
+
+    _params = ("of", "anchor", "repeats")
+    _instanceFields = ("of",)
+
+    @staticmethod
+    def Text(of, anchor, repeats):
+        position = "south east" if anchor.endswith("east") else "south"
+        return rf"""
+\node[anchor={position},font=\bfseries] at ({of}-{anchor}) {{$\times{repeats}$}};
+"""
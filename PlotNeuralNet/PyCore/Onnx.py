@@ -0,0 +1,725 @@
+"""
+Diagrams of exported ONNX models.
+
+:func:`LoadOnnx` reads a ``.onnx`` file with a small built-in protobuf
+decoder, so no ``onnx`` package is needed. The file is memory-mapped and
+only the graph structure is decoded: initializer tensors are stepped over
+by their length, apart from their names and dimensions, which give the
+layer widths. Importing a model therefore takes time and memory in
+proportion to its number of nodes, not to the size of its weights.
+
+Convolutions, pools, fully connected layers, additions and softmaxes are
+drawn with the usual ``To*`` helpers, sized from the inferred tensor
+shapes like :mod:`Spec` layers. Activations, normalizations and reshapes
+are folded into the layer before them. Layers follow each other in the
+graph's topological order; an input that does not come from the layer
+just before is drawn as a skip connection.
+"""
+
+import mmap
+import os
+import re
+import struct
+
+from .Nodes import Sum
+from .Paths import PACKAGE_ROOT
+from .Spec import BoxSize
+from .TikzGen import (
+    ToBegin,
+    ToConnection,
+    ToConv,
+    ToCor,
+    ToEnd,
+    ToFullyConnected,
+    ToHead,
+    ToPool,
+    ToSkip,
+    ToSoftMax,
+    ToSum,
+    ToUnPool,
+)
+
+# Field numbers of the parts of onnx.proto that are read.
+_MODEL_GRAPH = 7
+_GRAPH_NODE, _GRAPH_INITIALIZER = 1, 5
+_GRAPH_INPUT, _GRAPH_OUTPUT, _GRAPH_VALUE_INFO = 11, 12, 13
+_NODE_INPUT, _NODE_OUTPUT, _NODE_NAME, _NODE_OP, _NODE_ATTRIBUTE = 1, 2, 3, 4, 5
+_ATTR_NAME, _ATTR_F, _ATTR_I, _ATTR_S, _ATTR_FLOATS, _ATTR_INTS = 1, 2, 3, 4, 7, 8
+_TENSOR_DIMS, _TENSOR_TYPE, _TENSOR_FLOATS, _TENSOR_INT64S = 1, 2, 4, 7
+_TENSOR_NAME, _TENSOR_RAW = 8, 9
+_VALUE_NAME, _VALUE_TYPE = 1, 2
+_TYPE_TENSOR, _TENSOR_TYPE_SHAPE, _SHAPE_DIM, _DIM_VALUE = 1, 2, 1, 1
+_FLOAT, _INT64 = 1, 7
+
+# Initializers up to this size are decoded, for the scales of Resize.
+SMALL_TENSOR_BYTES = 256
+
+# How each operator is drawn; operators not listed are folded.
+KINDS = {
+    "Conv": "conv",
+    "MaxPool": "pool",
+    "AveragePool": "pool",
+    "GlobalMaxPool": "pool",
+    "GlobalAveragePool": "pool",
+    "LpPool": "pool",
+    "ConvTranspose": "unpool",
+    "Upsample": "unpool",
+    "Resize": "unpool",
+    "MaxUnpool": "unpool",
+    "Gemm": "fullyconn",
+    "MatMul": "fullyconn",
+    "Add": "sum",
+    "Sum": "sum",
+    "Softmax": "softmax",
+    "LogSoftmax": "softmax",
+}
+
+
+def _Varint(buf, pos):
+    """
+    Decode a base-128 varint.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        Encoded message.
+    pos : int
+        Offset of the varint.
+
+    Returns
+    -------
+    tuple of (int, int)
+        The value and the offset after it.
+    """
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _Signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _Fields(buf, start, end):
+    """
+    Iterate over the fields of a protobuf message without copying it.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        Buffer holding the message.
+    start, end : int
+        Extent of the message in ``buf``.
+
+    Yields
+    ------
+    tuple of (int, int, object)
+        Field number, wire type and value: an int for varints, the
+        ``(start, end)`` extent of length-delimited fields and the offset of
+        fixed-size ones, which are skipped.
+
+    Raises
+    ------
+    ValueError
+        If the message is malformed.
+    """
+    pos = start
+    while pos < end:
+        key, pos = _Varint(buf, pos)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _Varint(buf, pos)
+        elif wire == 2:
+            length, pos = _Varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire == 1:
+            value = pos
+            pos += 8
+        elif wire == 5:
+            value = pos
+            pos += 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire}")
+        if pos > end:
+            raise ValueError("truncated protobuf message")
+        yield number, wire, value
+
+
+def _String(buf, extent):
+    return bytes(buf[extent[0] : extent[1]]).decode("utf-8", "replace")
+
+
+def _Ints(buf, wire, value, into):
+    """
+    Append a repeated int64 field, packed or not.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        Buffer holding the message.
+    wire : int
+        Wire type of the field.
+    value : int or tuple of int
+        Its value, as yielded by :func:`_Fields`.
+    into : list
+        List to extend.
+
+    Returns
+    -------
+    None
+    """
+    if wire == 0:
+        into.append(_Signed(value))
+        return
+    pos, end = value
+    while pos < end:
+        item, pos = _Varint(buf, pos)
+        into.append(_Signed(item))
+
+
+def _Floats(buf, wire, value, into):
+    if wire == 5:
+        into.append(struct.unpack_from("<f", buf, value)[0])
+        return
+    start, end = value
+    into.extend(struct.unpack_from(f"<{(end - start) // 4}f", buf, start))
+
+
+def _Tensor(buf, extent):
+    """
+    Read the name and dimensions of a TensorProto, and the values of small ones.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        Buffer holding the tensor.
+    extent : tuple of int
+        Extent of the tensor in ``buf``.
+
+    Returns
+    -------
+    tuple
+        Name, tuple of dimensions and list of values (None unless the
+        tensor is a small float or int64 one).
+    """
+    name, dims, kind, raw, values = "", [], 0, None, []
+    small = True
+    for number, wire, value in _Fields(buf, *extent):
+        if number == _TENSOR_NAME:
+            name = _String(buf, value)
+        elif number == _TENSOR_DIMS:
+            _Ints(buf, wire, value, dims)
+        elif number == _TENSOR_TYPE:
+            kind = value
+        elif number in (_TENSOR_RAW, _TENSOR_FLOATS, _TENSOR_INT64S) and small:
+            # Weights are stepped over; only a few values are ever decoded.
+            size = value[1] - value[0] if wire == 2 else 8
+            small = size + 8 * len(values) <= SMALL_TENSOR_BYTES
+            if not small:
+                raw, values = None, []
+            elif number == _TENSOR_RAW:
+                raw = value
+            elif number == _TENSOR_FLOATS:
+                _Floats(buf, wire, value, values)
+            else:
+                _Ints(buf, wire, value, values)
+    if raw is not None:
+        start, end = raw
+        if kind == _FLOAT:
+            values = list(struct.unpack_from(f"<{(end - start) // 4}f", buf, start))
+        elif kind == _INT64:
+            values = list(struct.unpack_from(f"<{(end - start) // 8}q", buf, start))
+    return name, tuple(dims), values or None
+
+
+def _ValueInfo(buf, extent):
+    """
+    Read the name and static shape of a ValueInfoProto.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        Buffer holding the value info.
+    extent : tuple of int
+        Its extent in ``buf``.
+
+    Returns
+    -------
+    tuple
+        Name and tuple of dimensions, None for symbolic ones; the shape is
+        None if it is not given.
+    """
+    name, shape = "", None
+    for number, _, value in _Fields(buf, *extent):
+        if number == _VALUE_NAME:
+            name = _String(buf, value)
+        elif number == _VALUE_TYPE:
+            for n1, _, tensor in _Fields(buf, *value):
+                if n1 != _TYPE_TENSOR:
+                    continue
+                for n2, _, shapeExtent in _Fields(buf, *tensor):
+                    if n2 != _TENSOR_TYPE_SHAPE:
+                        continue
+                    shape = []
+                    for n3, _, dim in _Fields(buf, *shapeExtent):
+                        if n3 != _SHAPE_DIM:
+                            continue
+                        size = None
+                        for n4, wire, v in _Fields(buf, *dim):
+                            if n4 == _DIM_VALUE and wire == 0:
+                                size = _Signed(v)
+                        shape.append(size)
+                    shape = tuple(shape)
+    return name, shape
+
+
+def _Node(buf, extent):
+    """
+    Read a NodeProto.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        Buffer holding the node.
+    extent : tuple of int
+        Its extent in ``buf``.
+
+    Returns
+    -------
+    OnnxNode
+        The node.
+    """
+    node = OnnxNode()
+    for number, _, value in _Fields(buf, *extent):
+        if number == _NODE_INPUT:
+            node.inputs.append(_String(buf, value))
+        elif number == _NODE_OUTPUT:
+            node.outputs.append(_String(buf, value))
+        elif number == _NODE_NAME:
+            node.name = _String(buf, value)
+        elif number == _NODE_OP:
+            node.op = _String(buf, value)
+        elif number == _NODE_ATTRIBUTE:
+            name, ints, floats, single = "", [], [], None
+            for n, wire, v in _Fields(buf, *value):
+                if n == _ATTR_NAME:
+                    name = _String(buf, v)
+                elif n == _ATTR_I:
+                    single = _Signed(v)
+                elif n == _ATTR_F:
+                    single = struct.unpack_from("<f", buf, v)[0]
+                elif n == _ATTR_S:
+                    single = _String(buf, v)
+                elif n == _ATTR_INTS:
+                    _Ints(buf, wire, v, ints)
+                elif n == _ATTR_FLOATS:
+                    _Floats(buf, wire, v, floats)
+            node.attributes[name] = ints or floats or single
+    return node
+
+
+class OnnxNode:
+    """
+    Operator of an ONNX graph.
+
+    Attributes
+    ----------
+    name : str
+        Node name, possibly empty.
+    op : str
+        Operator type, e.g. "Conv".
+    inputs, outputs : list of str
+        Names of the tensors it reads and writes.
+    attributes : dict
+        Attribute name to int, float, string or list value.
+    """
+
+    __slots__ = ("name", "op", "inputs", "outputs", "attributes")
+
+    def __init__(self):
+        self.name = ""
+        self.op = ""
+        self.inputs = []
+        self.outputs = []
+        self.attributes = {}
+
+    def __repr__(self):
+        return f"OnnxNode({self.name!r}, {self.op!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+class OnnxGraph:
+    """
+    Structure of an ONNX model's main graph.
+
+    Attributes
+    ----------
+    nodes : list of OnnxNode
+        Operators in topological order.
+    initializers : dict
+        Weight name to tuple of dimensions.
+    constants : dict
+        Name of a small initializer to its values.
+    shapes : dict
+        Tensor name to the static shape declared for it, if any.
+    inputs : list of str
+        Names of the graph inputs that are not initializers.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.initializers = {}
+        self.constants = {}
+        self.shapes = {}
+        self.inputs = []
+
+
+def _ReadGraph(buf, path):
+    """
+    Decode the main graph of a mapped ModelProto.
+
+    Parameters
+    ----------
+    buf : bytes or mmap.mmap
+        The model.
+    path : str
+        File name reported in errors.
+
+    Returns
+    -------
+    OnnxGraph
+        The graph structure.
+
+    Raises
+    ------
+    ValueError
+        If the model has no graph or is malformed.
+    """
+    graph = None
+    for number, wire, value in _Fields(buf, 0, len(buf)):
+        if number == _MODEL_GRAPH and wire == 2:
+            graph = value
+    if graph is None:
+        raise ValueError(f"{path} has no graph")
+
+    result = OnnxGraph()
+    inputs = []
+    for number, _, value in _Fields(buf, *graph):
+        if number == _GRAPH_NODE:
+            result.nodes.append(_Node(buf, value))
+        elif number == _GRAPH_INITIALIZER:
+            name, dims, values = _Tensor(buf, value)
+            result.initializers[name] = dims
+            if values is not None:
+                result.constants[name] = values
+        elif number in (_GRAPH_INPUT, _GRAPH_OUTPUT, _GRAPH_VALUE_INFO):
+            name, shape = _ValueInfo(buf, value)
+            if shape is not None:
+                result.shapes[name] = shape
+            if number == _GRAPH_INPUT:
+                inputs.append(name)
+    result.inputs = [name for name in inputs if name not in result.initializers]
+    return result
+
+
+def ReadOnnx(path):
+    """
+    Read the graph structure of an ONNX model.
+
+    Parameters
+    ----------
+    path : str
+        The ``.onnx`` file.
+
+    Returns
+    -------
+    OnnxGraph
+        Nodes, weight dimensions and declared shapes of the main graph.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid model or has no graph.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _ReadGraph(buf, path)
+    except (IndexError, struct.error):
+        raise ValueError(f"{path} is not a valid ONNX model") from None
+    finally:
+        buf.close()
+
+
+def _Spatial(size, kernel, stride, padding, dilation, ceil):
+    extent = size + padding - dilation * (kernel - 1) - 1
+    return (-(-extent // stride) if ceil else extent // stride) + 1
+
+
+def _InferShape(node, shapes, graph):
+    """
+    Infer the output shape of an operator from its inputs.
+
+    Parameters
+    ----------
+    node : OnnxNode
+        Operator.
+    shapes : dict
+        Tensor name to known shape.
+    graph : OnnxGraph
+        The graph, for weight dimensions and constants.
+
+    Returns
+    -------
+    tuple or None
+        Shape of the first output, None if unknown.
+    """
+    op, attrs = node.op, node.attributes
+    inputs = [shapes.get(name) for name in node.inputs]
+    x = inputs[0] if inputs else None
+    weight = graph.initializers.get(node.inputs[1]) if len(node.inputs) > 1 else None
+    if weight is None and len(inputs) > 1:
+        weight = inputs[1]
+
+    if op in ("Conv", "MaxPool", "AveragePool", "LpPool"):
+        if x is None or len(x) < 3 or any(d is None for d in x[2:]):
+            return None
+        spatial = x[2:]
+        rank = len(spatial)
+        if op == "Conv":
+            if weight is None:
+                return None
+            channels = weight[0]
+            kernel = attrs.get("kernel_shape") or list(weight[2:])
+        else:
+            channels = x[1]
+            kernel = attrs.get("kernel_shape") or [1] * rank
+        strides = attrs.get("strides") or [1] * rank
+        dilations = attrs.get("dilations") or [1] * rank
+        pads = attrs.get("pads") or [0] * (2 * rank)
+        autoPad = attrs.get("auto_pad", "NOTSET")
+        ceil = bool(attrs.get("ceil_mode", 0))
+        out = []
+        for i in range(rank):
+            if autoPad in ("SAME_UPPER", "SAME_LOWER"):
+                out.append(-(-spatial[i] // strides[i]))
+            else:
+                padding = 0 if autoPad == "VALID" else pads[i] + pads[i + rank]
+                out.append(_Spatial(spatial[i], kernel[i], strides[i], padding, dilations[i], ceil))
+        return (x[0], channels) + tuple(out)
+    if op in ("GlobalAveragePool", "GlobalMaxPool"):
+        return None if x is None else x[:2] + (1,) * (len(x) - 2)
+    if op == "ConvTranspose":
+        if x is None or weight is None or any(d is None for d in x[2:]):
+            return None
+        rank = len(x) - 2
+        kernel = attrs.get("kernel_shape") or list(weight[2:])
+        strides = attrs.get("strides") or [1] * rank
+        dilations = attrs.get("dilations") or [1] * rank
+        pads = attrs.get("pads") or [0] * (2 * rank)
+        extra = attrs.get("output_padding") or [0] * rank
+        out = tuple(
+            strides[i] * (x[2 + i] - 1) + extra[i] + (kernel[i] - 1) * dilations[i] + 1 - pads[i] - pads[i + rank]
+            for i in range(rank)
+        )
+        return (x[0], weight[1] * attrs.get("group", 1)) + out
+    if op in ("Upsample", "Resize"):
+        if x is None:
+            return None
+        scales = None
+        for name in node.inputs[1:]:
+            values = graph.constants.get(name)
+            if values and len(values) == len(x):
+                scales = values
+        if scales is None and len(node.inputs) == 4 and node.inputs[3] in graph.constants:
+            return tuple(int(v) for v in graph.constants[node.inputs[3]])
+        if scales is None:
+            scales = [1, 1] + [2] * (len(x) - 2)
+        return tuple(None if d is None else int(d * s) for d, s in zip(x, scales))
+    if op == "Gemm":
+        if x is None or weight is None:
+            return None
+        return (x[0], weight[0] if attrs.get("transB", 0) else weight[1])
+    if op == "MatMul":
+        if x is None or weight is None:
+            return None
+        return tuple(x[:-1]) + (weight[-1],)
+    if op == "Flatten":
+        if x is None or any(d is None for d in x[1:]):
+            return None
+        axis = attrs.get("axis", 1)
+        size = 1
+        for d in x[axis:]:
+            size *= d
+        return tuple(x[:axis]) + (size,)
+    if op == "Concat":
+        if any(s is None for s in inputs) or not inputs:
+            return None
+        axis = attrs.get("axis", 1) % len(x)
+        total = sum(s[axis] for s in inputs if s[axis] is not None)
+        return x[:axis] + (total,) + x[axis + 1 :]
+    # Elementwise operators, normalizations and activations keep the shape.
+    return x
+
+
+def _BoxShape(shape):
+    """
+    Turn a tensor shape into the height, width and channels of a box.
+
+    Parameters
+    ----------
+    shape : tuple or None
+        NCHW (or NCL, or NC) shape.
+
+    Returns
+    -------
+    tuple of int or None
+        Height, width and channels, None if unknown.
+    """
+    if shape is None or len(shape) < 2 or any(d is None or d < 1 for d in shape[1:]):
+        return None
+    if len(shape) == 2:
+        return (1, 1, shape[1])
+    height = shape[2]
+    width = shape[3] if len(shape) > 3 else 1
+    return (height, width, shape[1])
+
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_]")
+
+
+def OnnxLayers(graph):
+    """
+    Turn an ONNX graph into layers and connections.
+
+    Parameters
+    ----------
+    graph : OnnxGraph
+        Graph read by :func:`ReadOnnx`.
+
+    Yields
+    ------
+    Nodes.Node
+        Layers, each followed by the connections and skips into it.
+    """
+    shapes = dict(graph.shapes)
+    # Tensor name to the names of the drawn layers it comes from.
+    sources = {name: () for name in graph.inputs}
+    drawn = []
+    used = set()
+    index = {}
+    previous = None
+    previousShape = None
+    for i, node in enumerate(graph.nodes):
+        if node.outputs and node.outputs[0] not in shapes:
+            shape = _InferShape(node, shapes, graph)
+            if shape is not None:
+                shapes[node.outputs[0]] = shape
+        producers = []
+        for name in node.inputs:
+            for source in sources.get(name, ()):
+                if source not in producers:
+                    producers.append(source)
+        kind = KINDS.get(node.op)
+        if kind == "fullyconn" and node.op == "MatMul" and node.inputs[1:2] and node.inputs[1] not in graph.initializers:
+            kind = None
+        if kind is None or (kind == "sum" and len(producers) < 2):
+            for name in node.outputs:
+                sources[name] = tuple(producers)
+            continue
+
+        name = _UNSAFE.sub("_", node.name or f"{node.op.lower()}{i}") or f"layer{i}"
+        while name in used:
+            name += "_"
+        used.add(name)
+        box = _BoxShape(shapes.get(node.outputs[0]) if node.outputs else None)
+        box = box or previousShape or (1, 1, 1)
+        height, depth, width = BoxSize(box)
+        h, _, c = box
+        label = c if h == 1 else h
+        caption = node.op
+
+        if previous is None:
+            place = dict(offset="(0,0,0)", to="(0,0,0)")
+        elif kind == "pool" and previous in producers and not isinstance(index[previous][1], Sum):
+            place = dict(offset="(0,0,0)", to=f"({previous}-east)")
+        else:
+            place = dict(offset="(1,0,0)", to=f"({previous}-east)")
+        size = dict(width=width, height=height, depth=depth, caption=caption)
+        if kind == "conv":
+            kernel = node.attributes.get("kernel_shape") or graph.initializers.get(node.inputs[1], ())[2:]
+            if kernel:
+                size["caption"] = "x".join(map(str, kernel))
+            layer = ToConv(name, sFilter=label, nFilter=c, **place, **size)
+        elif kind == "pool":
+            layer = ToPool(name, **place, **size)
+        elif kind == "unpool":
+            layer = ToUnPool(name, **place, **size)
+        elif kind == "fullyconn":
+            size["caption"] = "FC"
+            layer = ToFullyConnected(name, sFilter=c, **place, **size)
+        elif kind == "softmax":
+            size["caption"] = "SOFT"
+            layer = ToSoftMax(name, sFilter=c, **place, **size)
+        else:
+            layer = ToSum(name, **place)
+        yield layer
+
+        for source in producers:
+            if source == previous:
+                if place["offset"] != "(0,0,0)":
+                    yield ToConnection(source, name)
+                continue
+            # A skip starts from the northeast of a box; from a ball, it
+            # starts at the box drawn right after it instead.
+            of = source
+            if isinstance(index[source][1], Sum):
+                following = drawn[index[source][0] + 1 :]
+                of = next((n for n, l in following if not isinstance(l, Sum)), None)
+            if of is None or of == name:
+                yield ToConnection(source, name)
+            else:
+                yield ToSkip(of=of, to=name, pos=1.25)
+
+        index[name] = (len(drawn), layer)
+        drawn.append((name, layer))
+        for output in node.outputs:
+            sources[output] = (name,)
+        previous = name
+        previousShape = box
+
+
+def LoadOnnx(path, projectPath=PACKAGE_ROOT):
+    """
+    Build the architecture of an ONNX model, ready for ``ToGenerate``.
+
+    Parameters
+    ----------
+    path : str
+        The ``.onnx`` file.
+    projectPath : str, optional
+        Directory containing ``Layers/``, by default the installed package.
+
+    Yields
+    ------
+    Nodes.Node
+        The document, from ``ToHead`` to ``ToEnd``.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid model.
+    """
+    graph = ReadOnnx(path)
+    yield ToHead(projectPath)
+    yield ToCor()
+    yield ToBegin()
+    yield from OnnxLayers(graph)
+    yield ToEnd()
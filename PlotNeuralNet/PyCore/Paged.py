@@ -0,0 +1,224 @@
+"""
+Very large architectures split into pages that TeX compiles one at a time.
+
+TeX keeps every pic, anchor and path of a picture in memory until the page
+is shipped out, so a deep enough network exhausts main memory or the hash
+table however it is drawn. :func:`Segments` cuts an architecture into
+consecutive runs of layers, bounded by a layer count or by an estimated
+cost (see :func:`Cost`), and makes each a complete document of its own.
+Every page keeps the diagram's coordinates, so layers stay where they were
+drawn; positions on earlier pages are resolved in Python and defined as
+plain coordinates. A connection or skip between layers on different pages
+is drawn as a stub leaving the one and entering the other, each marked
+with the page it continues on.
+
+``Build.BuildScript`` compiles the pages in parallel and merges them into
+one PDF, one page per segment.
+"""
+
+import os
+
+from .Anchors import ReferencedAnchors
+from .Layout import BOX_DEFAULTS, Layout, Numbers, TikzPoint
+from .Nodes import Begin, Connection, Edge, End, Flatten, Input, Layer, Skip
+from .TikzGen import ToGenerate
+
+# Length of the stubs drawn for edges cut between pages.
+STUB = 1.5
+
+_MARKER = r"font=\footnotesize,text=black,opacity=1"
+
+
+def Cost(node):
+    """
+    Estimate what drawing a node costs TeX, in boxes.
+
+    A box pic costs one per box it draws plus one for its anchors, a ball
+    one, a connection half and a skip one; anything else is ignored.
+
+    Parameters
+    ----------
+    node : Nodes.Node or str
+        Node or raw TikZ fragment.
+
+    Returns
+    -------
+    float
+        The estimated cost.
+    """
+    if isinstance(node, Layer):
+        if node.pic == "Ball":
+            return 1
+        try:
+            boxes = len(Numbers(dict(node.Options()).get("width", BOX_DEFAULTS["width"])))
+        except (TypeError, ValueError):
+            boxes = 1
+        return 1 + max(boxes, 1)
+    if isinstance(node, Skip):
+        return 1
+    if isinstance(node, Connection):
+        return 0.5
+    return 0
+
+
+def _Outgoing(edge, page):
+    """Stub of an edge leaving its page, marked with the page it enters."""
+    marker = rf"node[anchor=west,{_MARKER}] {{$\cdots$ page {page}}}"
+    if isinstance(edge, Skip):
+        return rf"""
+\path ({edge.of}-southeast) -- ({edge.of}-northeast) coordinate[pos={edge.pos}] ({edge.of}-top);
+\draw [copyconnection]  ({edge.of}-northeast)
+    -- node {{\copymidarrow}} ({edge.of}-top)
+    -- node {{\copymidarrow}} ++({STUB},0,0) {marker};
+"""
+    return rf"""
+\draw [connection]  ({edge.of}-east) -- node {{\midarrow}} ++({STUB},0,0) {marker};
+"""
+
+
+def _Incoming(edge, page):
+    """Stub of an edge entering its page, marked with the page it leaves."""
+    marker = rf"node[anchor=east,{_MARKER}] {{page {page} $\cdots$}}"
+    if isinstance(edge, Skip):
+        return rf"""
+\path ({edge.to}-south) -- ({edge.to}-north) coordinate[pos={edge.pos}] ({edge.to}-top);
+\draw [copyconnection]  ({edge.to}-top) ++(-{STUB},0,0) {marker}
+    -- node {{\copymidarrow}} ({edge.to}-top)
+    -- node {{\copymidarrow}} ({edge.to}-north);
+"""
+    return rf"""
+\draw [connection]  ({edge.to}-west) ++(-{STUB},0,0) {marker} -- node {{\midarrow}} ({edge.to}-west);
+"""
+
+
+def _Anchor(layout, page, name, anchor):
+    try:
+        return TikzPoint(layout.Position(name, anchor))
+    except KeyError:
+        raise ValueError(
+            f"page {page} references ({name}-{anchor}) from another page, "
+            f"but its position cannot be resolved in Python"
+        ) from None
+
+
+def Segments(arch, maxLayers=None, maxCost=None):
+    """
+    Split an architecture into pages of at most so many layers or so much cost.
+
+    A page is cut before the layer that would exceed either limit; a page
+    always holds at least one layer. Edges go to the page of their layers,
+    or become a stub on each page when those differ; any other node stays
+    where it is in the architecture.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    maxLayers : int, optional
+        Most layers on a page, by default no limit.
+    maxCost : float, optional
+        Highest total :func:`Cost` of a page, by default no limit.
+
+    Returns
+    -------
+    list of list
+        One complete architecture per page, with the original preamble.
+
+    Raises
+    ------
+    ValueError
+        If a page references a position on another page that does not
+        resolve in Python, e.g. a layer placed relative to a raw TikZ
+        coordinate.
+    """
+    nodes = list(Flatten(arch))
+    start = next((i for i, c in enumerate(nodes) if isinstance(c, Begin)), None)
+    if start is None:
+        raise ValueError("the architecture has no ToBegin")
+    preamble = nodes[: start + 1]
+
+    layout = Layout()
+    pages = [[]]
+    owner = {}
+    layers = cost = 0
+    for c in nodes[start + 1 :]:
+        if isinstance(c, End):
+            break
+        layout.Add(c)
+        if isinstance(c, Layer):
+            weight = Cost(c)
+            full = (maxLayers and layers >= maxLayers) or (maxCost and cost + weight > maxCost)
+            if layers and full:
+                pages.append([])
+                layers = cost = 0
+            layers += 1
+        elif isinstance(c, Edge) and c.of in owner and c.to in owner:
+            of, to = owner[c.of], owner[c.to]
+            if of != to:
+                pages[of].append(_Outgoing(c, to + 1))
+                pages[to].append(_Incoming(c, of + 1))
+                continue
+            pages[of].append(c)
+            if of == len(pages) - 1:
+                cost += Cost(c)
+            continue
+        if isinstance(c, (Layer, Input)):
+            owner[c.name] = len(pages) - 1
+        pages[-1].append(c)
+        cost += Cost(c)
+
+    archs = []
+    for index, body in enumerate(pages):
+        page = index + 1
+        foreign = {name for name, i in owner.items() if i != index}
+        for i, c in enumerate(body):
+            # Anchor a layer placed on an earlier page at its absolute position,
+            # so it still resolves for ``Layout.Flat``.
+            if isinstance(c, (Layer, Input)) and foreign.intersection(ReferencedAnchors([c])):
+                point = layout.Point(c.to)
+                if point is not None:
+                    body[i] = c.Replace(to=TikzPoint(point))
+        coordinates = [
+            f"\\coordinate ({name}-{anchor}) at {_Anchor(layout, page, name, anchor)};\n"
+            for name, anchors in sorted(ReferencedAnchors(body).items())
+            if name in foreign
+            for anchor in sorted(anchors)
+        ]
+        if coordinates:
+            coordinates = (
+                ["\\begin{pgfinterruptboundingbox}\n"]
+                + coordinates
+                + ["\\end{pgfinterruptboundingbox}\n"]
+            )
+        archs.append(preamble + coordinates + body + [End()])
+    return archs
+
+
+def ToGeneratePaged(arch, pathname="file.tex", maxLayers=None, maxCost=None):
+    """
+    Write the pages of an architecture to one ``.tex`` file each.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    pathname : str, optional
+        Path of the document; page N is written next to it with ``-N``
+        appended to its name, by default "file.tex".
+    maxLayers : int, optional
+        Most layers on a page, as for :func:`Segments`.
+    maxCost : float, optional
+        Highest total cost of a page, as for :func:`Segments`.
+
+    Returns
+    -------
+    list of str
+        Paths of the files written, in page order.
+    """
+    stem, extension = os.path.splitext(pathname)
+    paths = []
+    for page, segment in enumerate(Segments(arch, maxLayers, maxCost), 1):
+        path = f"{stem}-{page}{extension or '.tex'}"
+        ToGenerate(segment, path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,8 @@
+"""
+Locations of the resources shipped with the package.
+"""
+
+import os
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYERS_DIR = os.path.join(PACKAGE_ROOT, "Layers")
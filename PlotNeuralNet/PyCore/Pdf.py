@@ -0,0 +1,639 @@
+"""
+Minimal PDF reader and writer for splitting and merging pages.
+
+Only what is needed to move whole pages between the files TeX engines
+produce is supported: classic and cross-reference stream tables, object
+streams and incremental updates. Page content streams are copied verbatim.
+"""
+
+import re
+import zlib
+
+_WHITESPACE = b" \t\r\n\f\x00"
+_DELIMITERS = b"()<>[]{}/%"
+_INHERITABLE = ("Resources", "MediaBox", "CropBox", "Rotate")
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_REFERENCE = re.compile(rb"(\d+)\s+(\d+)\s+R(?![^\s/\[\]<>()%])")
+_OBJECT = re.compile(rb"(\d+)\s+(\d+)\s+obj")
+
+
+class PdfError(ValueError):
+    """Raised when a file cannot be parsed as a PDF."""
+
+
+class Name(str):
+    """A PDF name object, e.g. ``/Type``."""
+
+    __slots__ = ()
+
+
+class String(bytes):
+    """A PDF string object."""
+
+
+class Ref:
+    """An indirect reference, e.g. ``12 0 R``."""
+
+    __slots__ = ("num", "gen")
+
+    def __init__(self, num, gen=0):
+        self.num = num
+        self.gen = gen
+
+    def __eq__(self, other):
+        return isinstance(other, Ref) and (self.num, self.gen) == (other.num, other.gen)
+
+    def __hash__(self):
+        return hash((self.num, self.gen))
+
+    def __repr__(self):
+        return f"Ref({self.num}, {self.gen})"
+
+
+class Stream:
+    """A stream object: its dictionary and its still-encoded data."""
+
+    __slots__ = ("dict", "data")
+
+    def __init__(self, dict, data):
+        self.dict = dict
+        self.data = data
+
+    def Decode(self):
+        """
+        Return the decoded data of a Flate-encoded or unfiltered stream.
+
+        Returns
+        -------
+        bytes
+            The decoded stream data.
+        """
+        filters = self.dict.get("Filter")
+        if filters is None:
+            return self.data
+        if not isinstance(filters, list):
+            filters = [filters]
+        if filters != ["FlateDecode"]:
+            raise PdfError(f"unsupported stream filter {filters}")
+        data = zlib.decompress(self.data)
+
+        params = self.dict.get("DecodeParms") or {}
+        if isinstance(params, list):
+            params = params[0] or {}
+        predictor = params.get("Predictor", 1)
+        if predictor >= 10:
+            data = _UndoPngPredictor(data, params.get("Columns", 1))
+        elif predictor != 1:
+            raise PdfError(f"unsupported predictor {predictor}")
+        return data
+
+
+def _UndoPngPredictor(data, columns):
+    """
+    Reverse the PNG row predictors used by cross-reference streams.
+
+    Parameters
+    ----------
+    data : bytes
+        Predicted rows, each prefixed by its filter type.
+    columns : int
+        Bytes per row.
+
+    Returns
+    -------
+    bytes
+        The original rows.
+    """
+    out = bytearray()
+    previous = bytearray(columns)
+    for start in range(0, len(data), columns + 1):
+        kind = data[start]
+        row = bytearray(data[start + 1 : start + 1 + columns])
+        for i in range(len(row)):
+            left = row[i - 1] if i else 0
+            up = previous[i]
+            upLeft = previous[i - 1] if i else 0
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                p = left + up - upLeft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upLeft)
+                predicted = left if pa <= pb and pa <= pc else up if pb <= pc else upLeft
+                row[i] = (row[i] + predicted) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+
+class _Parser:
+    """Recursive-descent parser of PDF objects over a byte buffer."""
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def SkipWhitespace(self):
+        data = self.data
+        n = len(data)
+        while self.pos < n:
+            c = data[self.pos]
+            if c in _WHITESPACE:
+                self.pos += 1
+            elif c == 0x25:  # % comment
+                while self.pos < n and data[self.pos] not in b"\r\n":
+                    self.pos += 1
+            else:
+                break
+
+    def Object(self):
+        self.SkipWhitespace()
+        data = self.data
+        c = data[self.pos : self.pos + 1]
+        if c == b"/":
+            return self.Name()
+        if c == b"<":
+            if data[self.pos : self.pos + 2] == b"<<":
+                return self.Dictionary()
+            return self.HexString()
+        if c == b"(":
+            return self.LiteralString()
+        if c == b"[":
+            self.pos += 1
+            items = []
+            while True:
+                self.SkipWhitespace()
+                if data[self.pos : self.pos + 1] == b"]":
+                    self.pos += 1
+                    return items
+                items.append(self.Object())
+        match = _REFERENCE.match(data, self.pos)
+        if match:
+            self.pos = match.end()
+            return Ref(int(match.group(1)), int(match.group(2)))
+        match = _NUMBER.match(data, self.pos)
+        if match:
+            self.pos = match.end()
+            text = match.group()
+            return float(text) if b"." in text else int(text)
+        for keyword, value in ((b"true", True), (b"false", False), (b"null", None)):
+            if data.startswith(keyword, self.pos):
+                self.pos += len(keyword)
+                return value
+        raise PdfError(f"unexpected data at offset {self.pos}")
+
+    def Name(self):
+        self.pos += 1
+        start = self.pos
+        data = self.data
+        while self.pos < len(data) and data[self.pos] not in _WHITESPACE + _DELIMITERS:
+            self.pos += 1
+        raw = data[start : self.pos]
+        raw = re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw)
+        return Name(raw.decode("latin-1"))
+
+    def Dictionary(self):
+        self.pos += 2
+        result = {}
+        while True:
+            self.SkipWhitespace()
+            if self.data[self.pos : self.pos + 2] == b">>":
+                self.pos += 2
+                return result
+            key = self.Object()
+            if not isinstance(key, Name):
+                raise PdfError(f"dictionary key is not a name at offset {self.pos}")
+            result[key] = self.Object()
+
+    def HexString(self):
+        end = self.data.index(b">", self.pos)
+        digits = re.sub(rb"[^0-9A-Fa-f]", b"", self.data[self.pos + 1 : end])
+        if len(digits) % 2:
+            digits += b"0"
+        self.pos = end + 1
+        return String(bytes.fromhex(digits.decode()))
+
+    def LiteralString(self):
+        data = self.data
+        self.pos += 1
+        depth = 1
+        out = bytearray()
+        escapes = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+        while depth:
+            c = data[self.pos : self.pos + 1]
+            if c == b"\\":
+                nxt = data[self.pos + 1 : self.pos + 2]
+                if nxt in escapes:
+                    out += escapes[nxt]
+                    self.pos += 2
+                elif nxt and nxt in b"01234567":
+                    octal = re.match(rb"[0-7]{1,3}", data[self.pos + 1 : self.pos + 4]).group()
+                    out.append(int(octal, 8) & 0xFF)
+                    self.pos += 1 + len(octal)
+                elif nxt in b"\r\n":
+                    self.pos += 2
+                    if data[self.pos - 1 : self.pos + 1] == b"\r\n":
+                        self.pos += 1
+                else:
+                    out += nxt
+                    self.pos += 2
+                continue
+            if c == b"(":
+                depth += 1
+            elif c == b")":
+                depth -= 1
+                if not depth:
+                    self.pos += 1
+                    break
+            out += c
+            self.pos += 1
+        return String(bytes(out))
+
+
+class Reader:
+    """
+    Random access to the objects and pages of a PDF file.
+
+    Parameters
+    ----------
+    data : bytes
+        Contents of the PDF file.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._xref = {}
+        self._cache = {}
+        self._objectStreams = {}
+        self.trailer = {}
+        self._ReadXref()
+
+    @classmethod
+    def Open(cls, path):
+        """
+        Read a PDF file.
+
+        Parameters
+        ----------
+        path : str
+            Path to the PDF.
+
+        Returns
+        -------
+        Reader
+            Reader over the file contents.
+        """
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def _ReadXref(self):
+        start = self.data.rfind(b"startxref")
+        if start < 0:
+            raise PdfError("missing startxref")
+        parser = _Parser(self.data, start + len(b"startxref"))
+        offset = parser.Object()
+        seen = set()
+        while offset is not None and offset not in seen:
+            seen.add(offset)
+            parser = _Parser(self.data, offset)
+            parser.SkipWhitespace()
+            if self.data.startswith(b"xref", parser.pos):
+                trailer = self._ReadXrefTable(parser)
+            else:
+                trailer = self._ReadXrefStream(parser)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            if "XRefStm" in trailer:
+                self._ReadXrefStream(_Parser(self.data, trailer["XRefStm"]))
+            offset = trailer.get("Prev")
+
+    def _ReadXrefTable(self, parser):
+        parser.pos += len(b"xref")
+        while True:
+            parser.SkipWhitespace()
+            if self.data.startswith(b"trailer", parser.pos):
+                parser.pos += len(b"trailer")
+                return parser.Object()
+            first = parser.Object()
+            count = parser.Object()
+            parser.SkipWhitespace()
+            for i in range(count):
+                entry = self.data[parser.pos : parser.pos + 20]
+                parser.pos += 20
+                if entry[17:18] == b"n":
+                    self._xref.setdefault(first + i, ("n", int(entry[:10])))
+
+    def _ReadXrefStream(self, parser):
+        stream = self._ParseIndirect(parser.pos)
+        fields = stream.dict["W"]
+        size = stream.dict["Size"]
+        index = stream.dict.get("Index", [0, size])
+        data = stream.Decode()
+        pos = 0
+        for first, count in zip(index[0::2], index[1::2]):
+            for num in range(first, first + count):
+                values = []
+                for width in fields:
+                    values.append(int.from_bytes(data[pos : pos + width], "big") if width else None)
+                    pos += width
+                kind = 1 if values[0] is None else values[0]
+                if kind == 1:
+                    self._xref.setdefault(num, ("n", values[1]))
+                elif kind == 2:
+                    self._xref.setdefault(num, ("c", values[1], values[2]))
+                else:
+                    self._xref.setdefault(num, ("f",))
+        return stream.dict
+
+    def _ParseIndirect(self, offset):
+        match = _OBJECT.match(self.data, offset)
+        if not match:
+            parser = _Parser(self.data, offset)
+            parser.SkipWhitespace()
+            match = _OBJECT.match(self.data, parser.pos)
+            if not match:
+                raise PdfError(f"no object at offset {offset}")
+        parser = _Parser(self.data, match.end())
+        value = parser.Object()
+        parser.SkipWhitespace()
+        if isinstance(value, dict) and self.data.startswith(b"stream", parser.pos):
+            pos = parser.pos + len(b"stream")
+            if self.data[pos : pos + 2] == b"\r\n":
+                pos += 2
+            elif self.data[pos : pos + 1] in b"\r\n":
+                pos += 1
+            length = value.get("Length")
+            if isinstance(length, Ref):
+                length = self.Get(length)
+            if not isinstance(length, int):
+                length = self.data.index(b"endstream", pos) - pos
+            value = Stream(value, self.data[pos : pos + length])
+        return value
+
+    def Get(self, ref):
+        """
+        Resolve an object by reference, following references transitively.
+
+        Parameters
+        ----------
+        ref : Ref or object
+            Reference to resolve. Direct objects are returned unchanged.
+
+        Returns
+        -------
+        object
+            The referenced object, None if it does not exist.
+        """
+        while isinstance(ref, Ref):
+            num = ref.num
+            if num not in self._cache:
+                self._cache[num] = self._Load(num)
+            ref = self._cache[num]
+        return ref
+
+    def _Load(self, num):
+        entry = self._xref.get(num)
+        if entry is None or entry[0] == "f":
+            return None
+        if entry[0] == "n":
+            return self._ParseIndirect(entry[1])
+        _, streamNum, index = entry
+        if streamNum not in self._objectStreams:
+            stream = self.Get(Ref(streamNum))
+            data = stream.Decode()
+            header = _Parser(data)
+            pairs = [(header.Object(), header.Object()) for _ in range(stream.dict["N"])]
+            self._objectStreams[streamNum] = (data, stream.dict["First"], pairs)
+        data, first, pairs = self._objectStreams[streamNum]
+        return _Parser(data, first + pairs[index][1]).Object()
+
+    def Pages(self):
+        """
+        Return the pages in order, with inherited attributes copied in.
+
+        Returns
+        -------
+        list of tuple of (Ref, dict)
+            Reference and dictionary of every page.
+        """
+        root = self.Get(self.trailer["Root"])
+        pages = []
+        stack = [(root["Pages"], {})]
+        while stack:
+            ref, inherited = stack.pop()
+            node = self.Get(ref)
+            if node.get("Type") == "Page" or "Kids" not in node:
+                page = dict(inherited)
+                page.update(node)
+                pages.append((ref, page))
+                continue
+            inherited = dict(inherited)
+            for key in _INHERITABLE:
+                if key in node:
+                    inherited[key] = node[key]
+            for kid in reversed(node["Kids"]):
+                stack.append((kid, inherited))
+        return pages
+
+
+class Writer:
+    """
+    Assemble a new PDF from pages of one or more :class:`Reader`.
+    """
+
+    def __init__(self):
+        self._objects = [None]
+        self._pages = []
+        self._maps = {}
+
+    def _Allocate(self, value=None):
+        self._objects.append(value)
+        return len(self._objects) - 1
+
+    def _Copy(self, reader, value, mapping):
+        """
+        Deep copy an object from a reader, renumbering the objects it references.
+
+        ``Parent`` entries are dropped so that copying one page never drags
+        in the rest of the page tree; :meth:`Write` sets the page parents.
+        """
+        if isinstance(value, Ref):
+            if value.num not in mapping:
+                mapping[value.num] = num = self._Allocate()
+                self._objects[num] = self._Copy(reader, reader.Get(value), mapping)
+            return Ref(mapping[value.num])
+        if isinstance(value, dict):
+            return {
+                key: self._Copy(reader, item, mapping)
+                for key, item in value.items()
+                if key != "Parent"
+            }
+        if isinstance(value, list):
+            return [self._Copy(reader, item, mapping) for item in value]
+        if isinstance(value, Stream):
+            return Stream(self._Copy(reader, value.dict, mapping), value.data)
+        return value
+
+    def AddPage(self, reader, page):
+        """
+        Append a page and everything it references.
+
+        Parameters
+        ----------
+        reader : Reader
+            Reader the page comes from.
+        page : tuple of (Ref, dict)
+            Page from :meth:`Reader.Pages`.
+
+        Returns
+        -------
+        None
+        """
+        ref, pageDict = page
+        mapping = self._maps.setdefault(id(reader), {})
+        if isinstance(ref, Ref):
+            # References back to the page (e.g. from annotations) resolve to
+            # the copy instead of duplicating it.
+            mapping[ref.num] = num = self._Allocate()
+        else:
+            num = self._Allocate()
+        self._objects[num] = self._Copy(reader, pageDict, mapping)
+        self._pages.append(num)
+
+    def Write(self, path):
+        """
+        Write the assembled document.
+
+        Parameters
+        ----------
+        path : str
+            Output PDF path.
+
+        Returns
+        -------
+        None
+        """
+        pagesNum = self._Allocate()
+        for num in self._pages:
+            self._objects[num]["Parent"] = Ref(pagesNum)
+        self._objects[pagesNum] = {
+            Name("Type"): Name("Pages"),
+            Name("Kids"): [Ref(num) for num in self._pages],
+            Name("Count"): len(self._pages),
+        }
+        rootNum = self._Allocate({Name("Type"): Name("Catalog"), Name("Pages"): Ref(pagesNum)})
+
+        out = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for num in range(1, len(self._objects)):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % num
+            value = self._objects[num]
+            if isinstance(value, Stream):
+                streamDict = dict(value.dict)
+                streamDict[Name("Length")] = len(value.data)
+                out += _Serialize(streamDict) + b"\nstream\n" + value.data + b"\nendstream"
+            else:
+                out += _Serialize(value)
+            out += b"\nendobj\n"
+
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % len(self._objects)
+        for offset in offsets:
+            out += b"%010d 00000 n \n" % offset
+        out += b"trailer\n" + _Serialize(
+            {Name("Size"): len(self._objects), Name("Root"): Ref(rootNum)}
+        )
+        out += b"\nstartxref\n%d\n%%%%EOF\n" % xref
+        with open(path, "wb") as f:
+            f.write(out)
+
+
+def _Serialize(value):
+    """
+    Serialize a parsed object back to PDF syntax.
+
+    Parameters
+    ----------
+    value : object
+        Parsed object.
+
+    Returns
+    -------
+    bytes
+        PDF syntax for the object.
+    """
+    if isinstance(value, Name):
+        raw = value.encode("latin-1")
+        return b"/" + re.sub(
+            rb"[^!-~]|[#()<>\[\]{}/%]", lambda m: b"#%02X" % m.group()[0], raw
+        )
+    if isinstance(value, Ref):
+        return b"%d %d R" % (value.num, value.gen)
+    if isinstance(value, dict):
+        items = (_Serialize(Name(k)) + b" " + _Serialize(v) for k, v in value.items())
+        return b"<<" + b"".join(items) + b">>"
+    if isinstance(value, list):
+        return b"[" + b" ".join(_Serialize(v) for v in value) + b"]"
+    if isinstance(value, String):
+        return b"<" + value.hex().encode() + b">"
+    if value is True:
+        return b"true"
+    if value is False:
+        return b"false"
+    if value is None:
+        return b"null"
+    if isinstance(value, float):
+        return (b"%.6f" % value).rstrip(b"0").rstrip(b".") or b"0"
+    return b"%d" % value
+
+
+def Split(pdfPath, outputPaths):
+    """
+    Write each page of a PDF to its own file.
+
+    Parameters
+    ----------
+    pdfPath : str
+        PDF to split.
+    outputPaths : list of str
+        One output path per page.
+
+    Returns
+    -------
+    None
+    """
+    reader = Reader.Open(pdfPath)
+    pages = reader.Pages()
+    if len(pages) != len(outputPaths):
+        raise PdfError(f"{pdfPath} has {len(pages)} pages, expected {len(outputPaths)}")
+    for page, path in zip(pages, outputPaths):
+        writer = Writer()
+        writer.AddPage(reader, page)
+        writer.Write(path)
+
+
+def Merge(pdfPaths, outputPath):
+    """
+    Concatenate the pages of several PDFs into one file.
+
+    Parameters
+    ----------
+    pdfPaths : iterable of str
+        PDFs to merge, in order.
+    outputPath : str
+        Output PDF path.
+
+    Returns
+    -------
+    None
+    """
+    writer = Writer()
+    for path in pdfPaths:
+        reader = Reader.Open(path)
+        for page in reader.Pages():
+            writer.AddPage(reader, page)
+    writer.Write(outputPath)
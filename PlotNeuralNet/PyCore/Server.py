@@ -0,0 +1,497 @@
+"""
+A local HTTP service rendering layer specs to PDF or SVG.
+
+``POST /render.pdf`` or ``POST /render.svg`` with a spec in the body (the
+text format of ``Examples/LeNet/lenet.txt``, or JSON or TOML, chosen by the
+``Content-Type`` or a ``?spec=`` parameter) returns the diagram.
+``GET /metrics`` reports queue depth, render latency and cache use as plain
+text.
+
+Requests are keyed on the hash of what they ask for. Identical requests
+arriving while one is being rendered wait for that render instead of
+starting their own (single-flight), and finished results are kept in a
+bounded in-memory cache, so a burst of identical page loads costs one TeX
+run. Only the standard library is needed; the service is meant for local
+use and has no authentication.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from .AsyncRender import RenderError, Renderer
+from .Paths import PACKAGE_ROOT
+from .Spec import CACHE_VERSION, ParseSpec
+from .Svg import ToSvg
+from .TikzGen import ToBegin, ToCor, ToEnd, ToHead
+
+# Output formats and their media types.
+MEDIA_TYPES = {"pdf": "application/pdf", "svg": "image/svg+xml"}
+
+# Spec formats by media type, by default the text format.
+SPEC_TYPES = {"application/json": "json", "application/toml": "toml", "text/x-toml": "toml"}
+
+# Upper bounds, in seconds, of the render latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+MAX_BODY_BYTES = 1024 * 1024
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_PORT = 8000
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    """
+    Raised to answer a request with an error status.
+
+    Attributes
+    ----------
+    status : int
+        HTTP status code.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations, in the Prometheus text layout.
+
+    Parameters
+    ----------
+    buckets : sequence of float, optional
+        Increasing upper bounds, by default ``LATENCY_BUCKETS``.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def Observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def Lines(self, name, labels=""):
+        """
+        Format the histogram as metric lines.
+
+        Parameters
+        ----------
+        name : str
+            Metric name.
+        labels : str, optional
+            Extra labels, e.g. 'format="pdf"', by default none.
+
+        Returns
+        -------
+        list of str
+            Bucket, sum and count lines.
+        """
+        prefix = labels + "," if labels else ""
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {total}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class ResultCache:
+    """
+    Least recently used cache of rendered diagrams, bounded in bytes.
+
+    Parameters
+    ----------
+    maxBytes : int, optional
+        Most bytes kept, by default 64 MiB.
+    """
+
+    def __init__(self, maxBytes=DEFAULT_CACHE_BYTES):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def Get(self, key):
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return data
+
+    def Put(self, key, data):
+        if len(data) > self.maxBytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self._entries[key] = data
+        self.bytes += len(data)
+        while self.bytes > self.maxBytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+
+def Key(output, fmt, body):
+    """
+    Return the key identifying a render request.
+
+    Parameters
+    ----------
+    output : str
+        "pdf" or "svg".
+    fmt : str
+        Spec format.
+    body : bytes
+        The spec.
+
+    Returns
+    -------
+    str
+        Hex digest of everything the result depends on.
+    """
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{output}\0{fmt}\0".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _Arch(body, fmt):
+    return [ToHead(PACKAGE_ROOT), ToCor(), ToBegin(), *ParseSpec(body, fmt, "request"), ToEnd()]
+
+
+def _RenderSvg(body, fmt):
+    return ToSvg(_Arch(body, fmt)).encode("utf-8")
+
+
+class Server:
+    """
+    Renders specs on request, merging identical concurrent requests.
+
+    Parameters
+    ----------
+    renderer : AsyncRender.Renderer, optional
+        Renderer of PDFs, by default one with default settings.
+    cacheBytes : int, optional
+        Size limit of the result cache, by default 64 MiB.
+    timeout : float, optional
+        Seconds before a TeX run is killed, by default the renderer's.
+    """
+
+    def __init__(self, renderer=None, cacheBytes=DEFAULT_CACHE_BYTES, timeout=None):
+        self.renderer = Renderer() if renderer is None else renderer
+        self.timeout = timeout
+        self.cache = ResultCache(cacheBytes)
+        self.latency = {output: Histogram() for output in MEDIA_TYPES}
+        self.requests = 0
+        self.merged = 0
+        self.failures = 0
+        self._inflight = {}
+
+    async def Render(self, output, fmt, body):
+        """
+        Render a spec, from the cache or a render already in flight if any.
+
+        Parameters
+        ----------
+        output : str
+            "pdf" or "svg".
+        fmt : str
+            Spec format, "text", "json" or "toml".
+        body : bytes
+            The spec.
+
+        Returns
+        -------
+        bytes
+            The diagram.
+
+        Raises
+        ------
+        ValueError
+            If the spec is malformed.
+        asyncio.TimeoutError
+            If TeX ran longer than the timeout.
+        AsyncRender.RenderError
+            If TeX failed.
+        """
+        key = Key(output, fmt, body)
+        data = self.cache.Get(key)
+        if data is not None:
+            return data
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._Render(output, fmt, body))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._Finish(key, task))
+        else:
+            self.merged += 1
+        # Shielded so a client going away does not cancel the others' render.
+        return await asyncio.shield(task)
+
+    def _Finish(self, key, task):
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            self.failures += 1
+        else:
+            self.cache.Put(key, task.result())
+
+    async def _Render(self, output, fmt, body):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        if output == "svg":
+            data = await loop.run_in_executor(None, _RenderSvg, body, fmt)
+        else:
+            arch = await loop.run_in_executor(None, _Arch, body, fmt)
+            data = await self.renderer.Render(arch, timeout=self.timeout)
+        self.latency[output].Observe(time.perf_counter() - start)
+        return data
+
+    def Metrics(self):
+        """
+        Report the state of the service.
+
+        Returns
+        -------
+        str
+            Metrics in the Prometheus text exposition format.
+        """
+        cache = self.cache
+        lookups = cache.hits + cache.misses
+        lines = [
+            "# HELP plotneuralnet_queue_depth Renders waiting for a TeX slot.",
+            "# TYPE plotneuralnet_queue_depth gauge",
+            f"plotneuralnet_queue_depth {self.renderer.waiting}",
+            "# TYPE plotneuralnet_renders_running gauge",
+            f"plotneuralnet_renders_running {self.renderer.running}",
+            "# TYPE plotneuralnet_renders_inflight gauge",
+            f"plotneuralnet_renders_inflight {len(self._inflight)}",
+            "# TYPE plotneuralnet_requests_total counter",
+            f"plotneuralnet_requests_total {self.requests}",
+            "# HELP plotneuralnet_merged_total Requests served by a render already in flight.",
+            "# TYPE plotneuralnet_merged_total counter",
+            f"plotneuralnet_merged_total {self.merged}",
+            "# TYPE plotneuralnet_render_failures_total counter",
+            f"plotneuralnet_render_failures_total {self.failures}",
+            "# TYPE plotneuralnet_cache_hits_total counter",
+            f"plotneuralnet_cache_hits_total {cache.hits}",
+            "# TYPE plotneuralnet_cache_misses_total counter",
+            f"plotneuralnet_cache_misses_total {cache.misses}",
+            "# TYPE plotneuralnet_cache_hit_ratio gauge",
+            f"plotneuralnet_cache_hit_ratio {cache.hits / lookups if lookups else 0:.4f}",
+            "# TYPE plotneuralnet_cache_entries gauge",
+            f"plotneuralnet_cache_entries {len(cache)}",
+            "# TYPE plotneuralnet_cache_bytes gauge",
+            f"plotneuralnet_cache_bytes {cache.bytes}",
+            "# HELP plotneuralnet_render_seconds Time to render a diagram that was not cached.",
+            "# TYPE plotneuralnet_render_seconds histogram",
+        ]
+        for output, histogram in self.latency.items():
+            lines += histogram.Lines("plotneuralnet_render_seconds", f'format="{output}"')
+        return "\n".join(lines) + "\n"
+
+    async def Handle(self, method, target, headers, body):
+        """
+        Answer one request.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method.
+        target : str
+            Request target, path and query.
+        headers : dict
+            Header values by lower-case name.
+        body : bytes
+            Request body.
+
+        Returns
+        -------
+        tuple of (int, str, bytes)
+            Status, content type and response body.
+        """
+        url = urlsplit(target)
+        if url.path == "/metrics":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            return 200, "text/plain; version=0.0.4", self.Metrics().encode()
+        if not url.path.startswith("/render"):
+            raise HttpError(404, f"no such endpoint {url.path}")
+        if method != "POST":
+            raise HttpError(405, "use POST")
+
+        query = parse_qs(url.query)
+        output = url.path.rpartition(".")[2] if "." in url.path else query.get("format", ["pdf"])[0]
+        if url.path not in ("/render", "/render." + output) or output not in MEDIA_TYPES:
+            raise HttpError(404, f"unknown output format {output!r}, expected pdf or svg")
+        mediaType = headers.get("content-type", "").split(";")[0].strip().lower()
+        fmt = query.get("spec", [SPEC_TYPES.get(mediaType, "text")])[0]
+
+        self.requests += 1
+        try:
+            data = await self.Render(output, fmt, body)
+        except (ValueError, UnicodeDecodeError, ImportError) as e:
+            raise HttpError(400, str(e)) from None
+        except asyncio.TimeoutError:
+            raise HttpError(504, "TeX timed out") from None
+        except RenderError as e:
+            raise HttpError(500, str(e)) from None
+        return 200, MEDIA_TYPES[output], data
+
+    async def _Connection(self, reader, writer):
+        """
+        Serve one connection: read a request, answer it and close.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            Incoming stream.
+        writer : asyncio.StreamWriter
+            Outgoing stream.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            try:
+                status, contentType, payload = await self.Handle(*await _ReadRequest(reader))
+            except HttpError as e:
+                status, contentType, payload = e.status, "text/plain; charset=utf-8", f"{e}\n".encode()
+            except Exception as e:
+                status, contentType, payload = 500, "text/plain; charset=utf-8", f"{e}\n".encode()
+            head = (
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {contentType}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode("latin-1") + payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def Serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        Serve requests until cancelled.
+
+        Parameters
+        ----------
+        host : str, optional
+            Interface to listen on, by default the loopback.
+        port : int, optional
+            Port to listen on, by default 8000.
+
+        Returns
+        -------
+        None
+        """
+        server = await asyncio.start_server(self._Connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def _ReadRequest(reader):
+    """
+    Read an HTTP/1.1 request.
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+        Incoming stream.
+
+    Returns
+    -------
+    tuple of (str, str, dict, bytes)
+        Method, target, headers by lower-case name and body.
+
+    Raises
+    ------
+    HttpError
+        If the request is malformed or its body too large.
+    """
+    line = (await reader.readline()).decode("latin-1").split()
+    if len(line) != 3:
+        raise HttpError(400, "malformed request line")
+    method, target, _ = line
+    headers = {}
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    if method in ("POST", "PUT"):
+        if "content-length" not in headers:
+            raise HttpError(411, "Content-Length required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HttpError(400, "malformed Content-Length") from None
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"specs are limited to {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length)
+    return method, target, headers, body
+
+
+def Serve(host="127.0.0.1", port=DEFAULT_PORT, **kwargs):
+    """
+    Run the render service until interrupted.
+
+    Parameters
+    ----------
+    host : str, optional
+        Interface to listen on, by default the loopback.
+    port : int, optional
+        Port to listen on, by default 8000.
+    **kwargs
+        ``concurrency``, ``engine``, ``timeout`` and ``cacheDir`` are
+        passed to the ``AsyncRender.Renderer``; ``cacheBytes`` to the
+        :class:`Server`.
+
+    Returns
+    -------
+    None
+    """
+    cacheBytes = kwargs.pop("cacheBytes", DEFAULT_CACHE_BYTES)
+
+    async def Main():
+        renderer = Renderer(**kwargs)
+        await Server(renderer, cacheBytes).Serve(host, port)
+
+    try:
+        asyncio.run(Main())
+    except KeyboardInterrupt:
+        pass
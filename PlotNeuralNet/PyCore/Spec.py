@@ -0,0 +1,526 @@
+"""
+Architectures described as data files instead of Python scripts.
+
+A spec lists layers by kind and output shape, one per line, as sketched
+in ``Examples/LeNet/lenet.txt``::
+
+    input(32, 32, 1)
+    conv(28, 28, 6)
+    pool(14, 14, 6)
+    c5 = conv(1, 1, 120) "C5"   # optional name and caption
+    fullyconn(1, 1, 84)
+    softmax(1, 1, 10)
+
+The same layers can be given as JSON (a list, or an object with a
+``"layers"`` list) or TOML (``[[layers]]`` tables), each layer having a
+``kind``, a ``shape`` and optionally a ``name`` and ``caption``. Layers are
+chained left to right and box sizes follow from the shapes.
+
+Parsed layers are cached, in memory and on disk, under the hash of the
+file's contents, so a large collection of specs is only parsed once.
+"""
+
+import hashlib
+import json
+import math
+import os
+import pickle
+import re
+import tempfile
+from collections import OrderedDict
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from .CompileCache import DefaultDirectory
+from .Paths import PACKAGE_ROOT
+from .TikzGen import (
+    ToBegin,
+    ToConnection,
+    ToConv,
+    ToConvRes,
+    ToCor,
+    ToEnd,
+    ToFullyConnected,
+    ToHead,
+    ToPool,
+    ToSoftMax,
+    ToUnPool,
+)
+
+# File extensions of the formats, by default the text format.
+FORMATS = {".txt": "text", ".json": "json", ".toml": "toml"}
+
+# Kinds of layers, with the names they may also be given.
+KINDS = ("input", "conv", "convres", "pool", "unpool", "fullyconn", "softmax")
+_ALIASES = {"fc": "fullyconn", "dense": "fullyconn", "linear": "fullyconn"}
+
+# Bumped whenever parsing or sizing changes, so stale cache entries miss.
+CACHE_VERSION = 2
+MEMORY_ENTRIES = 256
+
+_LINE = re.compile(
+    r"^(?:(?P<name>[\w.]+)\s*=\s*)?(?P<kind>\w+)\s*\((?P<shape>[^)]*)\)"
+    r'\s*(?:"(?P<caption>[^"]*)")?\s*(?:#.*)?$'
+)
+_MEMORY = OrderedDict()
+
+
+def Side(n):
+    """
+    Return the drawn size of a spatial dimension.
+
+    Sizes grow with the logarithm of the dimension, so a 224 pixel input
+    and a 7 pixel feature map both fit in one picture.
+
+    Parameters
+    ----------
+    n : int
+        Dimension, e.g. a feature map's height.
+
+    Returns
+    -------
+    float
+        Pic height or depth.
+    """
+    return round(1 + 8 * math.log2(max(n, 1)), 2)
+
+
+def Thickness(channels):
+    """
+    Return the drawn width of a number of channels.
+
+    Parameters
+    ----------
+    channels : int
+        Number of channels.
+
+    Returns
+    -------
+    float
+        Pic width.
+    """
+    return round(1 + math.log2(max(channels, 1)) / 2, 2)
+
+
+def BoxSize(shape):
+    """
+    Size a layer's box from its output shape.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Height, width and channels.
+
+    Returns
+    -------
+    tuple of float
+        Pic height, depth and width. Vectors (1 by 1 maps) are drawn as in
+        ``lenet.tex``: a thin bar as deep as their length.
+    """
+    h, w, c = shape
+    if h == w == 1:
+        return 1, Side(c), 1
+    return Side(h), Side(w), Thickness(c)
+
+
+def _Shape(values, where):
+    """
+    Normalize a shape to height, width and channels.
+
+    Parameters
+    ----------
+    values : sequence
+        One to three positive integers; missing leading ones are 1.
+    where : str
+        Location reported in errors.
+
+    Returns
+    -------
+    tuple of int
+        Height, width and channels.
+
+    Raises
+    ------
+    ValueError
+        If the shape is not one to three positive integers.
+    """
+    try:
+        shape = tuple(int(v) for v in values)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: shape must be integers, got {values!r}") from None
+    if not 1 <= len(shape) <= 3 or min(shape) < 1:
+        raise ValueError(f"{where}: shape must be 1 to 3 positive integers, got {values!r}")
+    return (1,) * (3 - len(shape)) + shape
+
+
+def _Kind(kind, where):
+    kind = str(kind).lower()
+    kind = _ALIASES.get(kind, kind)
+    if kind not in KINDS:
+        raise ValueError(f"{where}: unknown layer kind {kind!r}, expected one of {', '.join(KINDS)}")
+    return kind
+
+
+def _TextRecords(text, path):
+    """
+    Parse the text format.
+
+    Parameters
+    ----------
+    text : str
+        Contents of the spec.
+    path : str
+        File name reported in errors.
+
+    Yields
+    ------
+    tuple
+        Kind, shape, name (or None) and caption (or None) of every layer.
+
+    Raises
+    ------
+    ValueError
+        If a line cannot be parsed.
+    """
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        where = f"{path}:{number}"
+        match = _LINE.match(line)
+        if match is None:
+            raise ValueError(f"{where}: cannot parse {line!r}")
+        shape = [v for v in match.group("shape").split(",") if v.strip()]
+        yield (
+            _Kind(match.group("kind"), where),
+            _Shape(shape, where),
+            match.group("name"),
+            match.group("caption"),
+        )
+
+
+def _TableRecords(layers, path):
+    """
+    Read the layer tables of the JSON and TOML formats.
+
+    Parameters
+    ----------
+    layers : list of dict
+        Layers with ``kind``, ``shape`` and optional ``name`` and ``caption``.
+    path : str
+        File name reported in errors.
+
+    Yields
+    ------
+    tuple
+        Kind, shape, name (or None) and caption (or None) of every layer.
+
+    Raises
+    ------
+    ValueError
+        If a layer is malformed.
+    """
+    if not isinstance(layers, list):
+        raise ValueError(f"{path}: expected a list of layers")
+    for index, layer in enumerate(layers):
+        where = f"{path}: layer {index}"
+        if not isinstance(layer, dict) or "kind" not in layer or "shape" not in layer:
+            raise ValueError(f"{where}: expected a table with 'kind' and 'shape'")
+        shape = layer["shape"]
+        yield (
+            _Kind(layer["kind"], where),
+            _Shape(shape if isinstance(shape, (list, tuple)) else [shape], where),
+            layer.get("name"),
+            layer.get("caption"),
+        )
+
+
+def _Records(data, fmt, path):
+    """
+    Parse a spec in any format.
+
+    Parameters
+    ----------
+    data : bytes
+        Contents of the spec.
+    fmt : str
+        "text", "json" or "toml".
+    path : str
+        File name reported in errors.
+
+    Yields
+    ------
+    tuple
+        Kind, shape, name (or None) and caption (or None) of every layer.
+
+    Raises
+    ------
+    ValueError
+        If the spec is malformed.
+    ImportError
+        If it is TOML and no TOML parser is available.
+    """
+    text = data.decode("utf-8-sig")
+    if fmt == "text":
+        yield from _TextRecords(text, path)
+        return
+    if fmt == "json":
+        try:
+            document = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+    elif tomllib is None:
+        raise ImportError("reading TOML specs needs Python 3.11 or the tomli package")
+    else:
+        try:
+            document = tomllib.loads(text)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+    if isinstance(document, dict):
+        document = document.get("layers")
+    yield from _TableRecords(document, path)
+
+
+def _Nodes(records):
+    """
+    Turn layer records into a chain of nodes.
+
+    Parameters
+    ----------
+    records : iterable of tuple
+        Kind, shape, name and caption of every layer.
+
+    Yields
+    ------
+    Nodes.Node
+        Every layer, followed by the connection into it when it is not a
+        pooling layer attached to the previous one.
+    """
+    previous = None
+    counts = {}
+    for kind, shape, name, caption in records:
+        counts[kind] = counts.get(kind, 0) + 1
+        name = name or f"{kind}{counts[kind]}"
+        caption = " " if caption is None else caption
+        height, depth, width = BoxSize(shape)
+        h, _, c = shape
+        size = dict(width=width, height=height, depth=depth, caption=caption)
+        if previous is None:
+            place = dict(offset="(0,0,0)", to="(0,0,0)")
+        elif kind in ("pool", "unpool"):
+            place = dict(offset="(0,0,0)", to=f"({previous}-east)")
+        else:
+            place = dict(offset="(1,0,0)", to=f"({previous}-east)")
+        label = c if h == 1 else h
+
+        if kind == "pool":
+            yield ToPool(name, **place, **size)
+        elif kind == "unpool":
+            yield ToUnPool(name, **place, **size)
+        elif kind == "convres":
+            yield ToConvRes(name, sFilter=label, nFilter=c, **place, **size)
+        elif kind == "fullyconn":
+            yield ToFullyConnected(name, sFilter=c, **place, **size)
+        elif kind == "softmax":
+            size["caption"] = "SOFT" if caption == " " else caption
+            yield ToSoftMax(name, sFilter=c, **place, **size)
+        else:
+            yield ToConv(name, sFilter=label, nFilter=c, **place, **size)
+        if previous is not None and place["offset"] != "(0,0,0)":
+            yield ToConnection(previous, name)
+        previous = name
+
+
+def ParseSpec(data, fmt="text", name="<spec>"):
+    """
+    Parse a spec held in memory, without caching.
+
+    Parameters
+    ----------
+    data : bytes or str
+        Contents of the spec.
+    fmt : str, optional
+        "text" (the default), "json" or "toml".
+    name : str, optional
+        Name reported in errors, by default "<spec>".
+
+    Returns
+    -------
+    list of Nodes.Node
+        The layers and the connections between them.
+
+    Raises
+    ------
+    ValueError
+        If the spec is malformed or ``fmt`` is unknown.
+    """
+    if fmt not in FORMATS.values():
+        raise ValueError(f"unknown spec format {fmt!r}, expected one of {', '.join(FORMATS.values())}")
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return list(_Nodes(_Records(data, fmt, name)))
+
+
+def _CachePath(cacheDir, key):
+    return os.path.join(cacheDir, "specs", key[:2], key + ".pickle")
+
+
+def _Remember(key, nodes):
+    _MEMORY[key] = nodes
+    _MEMORY.move_to_end(key)
+    if len(_MEMORY) > MEMORY_ENTRIES:
+        _MEMORY.popitem(last=False)
+
+
+def _Store(path, nodes):
+    """
+    Write parsed nodes to the disk cache atomically.
+
+    Parameters
+    ----------
+    path : str
+        Cache file.
+    nodes : list of Nodes.Node
+        Parsed layers.
+
+    Returns
+    -------
+    None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(nodes, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def IsSpec(path):
+    """
+    Tell whether a file is a layer spec.
+
+    Parameters
+    ----------
+    path : str
+        File to check.
+
+    Returns
+    -------
+    bool
+        True for ``.txt`` files whose first layer line parses and ``.json``
+        and ``.toml`` files with a list of layers.
+    """
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        return False
+    try:
+        with open(path, encoding="utf-8-sig", errors="replace") as f:
+            head = f.read(4096)
+    except OSError:
+        return False
+    if fmt == "json":
+        return re.search(r'"layers"\s*:|^\s*\[\s*\{', head) is not None
+    if fmt == "toml":
+        return re.search(r"^\s*\[\[layers\]\]", head, re.MULTILINE) is not None
+    for line in head.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            match = _LINE.match(line)
+            return match is not None and _ALIASES.get(match.group("kind").lower(), match.group("kind").lower()) in KINDS
+    return False
+
+
+def SpecLayers(path, cacheDir=None):
+    """
+    Read the layers of a spec, from the cache when it is unchanged.
+
+    On a cache miss the layers are yielded as they are parsed, and the
+    cache is filled once the whole file has been read.
+
+    Parameters
+    ----------
+    path : str
+        Spec file; its extension selects the format.
+    cacheDir : str or bool, optional
+        Cache directory, by default ``CompileCache.DefaultDirectory()``;
+        False keeps parsed specs in memory only.
+
+    Yields
+    ------
+    Nodes.Node
+        The layers and the connections between them.
+
+    Raises
+    ------
+    ValueError
+        If the spec is malformed.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower(), "text")
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{fmt}\0".encode())
+    digest.update(data)
+    key = digest.hexdigest()
+
+    nodes = _MEMORY.get(key)
+    if nodes is not None:
+        _MEMORY.move_to_end(key)
+        yield from nodes
+        return
+    if cacheDir is None:
+        cacheDir = DefaultDirectory()
+    cachePath = _CachePath(cacheDir, key) if cacheDir else None
+    if cachePath is not None:
+        try:
+            with open(cachePath, "rb") as f:
+                nodes = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            nodes = None
+        if nodes is not None:
+            _Remember(key, nodes)
+            yield from nodes
+            return
+
+    nodes = []
+    for node in _Nodes(_Records(data, fmt, path)):
+        nodes.append(node)
+        yield node
+    _Remember(key, nodes)
+    if cachePath is not None:
+        _Store(cachePath, nodes)
+
+
+def LoadSpec(path, projectPath=PACKAGE_ROOT, cacheDir=None):
+    """
+    Build the architecture of a spec, ready for ``ToGenerate``.
+
+    Parameters
+    ----------
+    path : str
+        Spec file.
+    projectPath : str, optional
+        Directory containing ``Layers/``, by default the installed package.
+    cacheDir : str or bool, optional
+        Cache directory, as for :func:`SpecLayers`.
+
+    Yields
+    ------
+    Nodes.Node
+        The document, from ``ToHead`` to ``ToEnd``.
+    """
+    yield ToHead(projectPath)
+    yield ToCor()
+    yield ToBegin()
+    yield from SpecLayers(path, cacheDir)
+    yield ToEnd()
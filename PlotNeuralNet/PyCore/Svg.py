@@ -0,0 +1,617 @@
+"""
+Native SVG rendering of architectures, without TeX.
+
+:func:`ToSvg` draws the same layers, connections and skips as the TikZ
+output, using the positions :class:`Layout` resolves in Python, the
+dimensions and defaults of the pics in ``Layers/*.sty``, the colors defined
+by ``ToCor`` and TikZ's default oblique projection. It takes milliseconds
+where a ``pdflatex`` run takes seconds, at the price of approximating TeX's
+text layout: labels are plain text with the math markup stripped.
+
+Document nodes are skipped, and so are raw TikZ fragments, which only TeX
+can draw.
+"""
+
+import os
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+from .Layout import BALL_DEFAULTS, BOX_DEFAULTS, SCALE, Layout, Numbers
+from .Nodes import Badge, Colors, Connection, Flatten, Input, Layer, Skip
+from .Paths import LAYERS_DIR
+
+# One TikZ centimetre in SVG user units (PostScript points), and the screen
+# direction of TikZ's default z vector, (-3.85mm,-3.85mm).
+UNIT = 72 / 2.54
+Z_SLANT = 0.385
+
+# Margin around the drawn geometry, leaving room for labels and captions.
+MARGIN = 40
+
+# Line widths and dash patterns of TikZ's "thin", "ultra thick" and
+# "densely dashed", in points.
+THIN = 0.4
+ULTRA_THICK = 1.6
+DENSELY_DASHED = "3 2"
+FONT_SIZE = 10
+
+# Colors of xcolor's base names.
+NAMED_COLORS = {
+    "red": (1, 0, 0),
+    "green": (0, 1, 0),
+    "blue": (0, 0, 1),
+    "cyan": (0, 1, 1),
+    "magenta": (1, 0, 1),
+    "yellow": (1, 1, 0),
+    "black": (0, 0, 0),
+    "white": (1, 1, 1),
+    "gray": (0.5, 0.5, 0.5),
+    "darkgray": (0.25, 0.25, 0.25),
+    "lightgray": (0.75, 0.75, 0.75),
+    "brown": (0.75, 0.5, 0.25),
+    "lime": (0.75, 1, 0),
+    "olive": (0.5, 0.5, 0),
+    "orange": (1, 0.5, 0),
+    "pink": (1, 0.75, 0.75),
+    "purple": (0.75, 0, 0.25),
+    "teal": (0, 0.5, 0.5),
+    "violet": (0.5, 0, 0.5),
+}
+
+# Text for the math commands that appear in labels and logos.
+_SYMBOLS = {
+    r"\Sigma": "Σ",
+    r"\sigma": "σ",
+    r"\times": "×",
+    r"\cdot": "·",
+    r"\alpha": "α",
+    r"\beta": "β",
+    r"\%": "%",
+    r"\_": "_",
+    r"\&": "&",
+}
+_COMMANDS = re.compile(r"\\(?:[A-Za-z]+|.)")
+_DEFINITIONS = re.compile(r"\\def\\(\w+)\{(.*)\}")
+
+
+def _Definitions(text):
+    """
+    Collect the color macros a piece of LaTeX defines with ``\\def``.
+
+    Parameters
+    ----------
+    text : str
+        LaTeX code.
+
+    Returns
+    -------
+    dict
+        Macro name, without the backslash, to its definition.
+    """
+    return dict(_DEFINITIONS.findall(text))
+
+
+def _DefaultMacros():
+    """
+    Return the color macros of ``ToCor`` and ``Layers/init.tex``.
+
+    Returns
+    -------
+    dict
+        Macro name to color expression.
+    """
+    macros = {}
+    try:
+        with open(os.path.join(LAYERS_DIR, "init.tex")) as f:
+            macros.update(_Definitions(f.read()))
+    except OSError:
+        pass
+    macros.update(_Definitions(Colors().Render()))
+    return macros
+
+
+MACROS = _DefaultMacros()
+
+
+def ParseColor(spec, macros=MACROS):
+    """
+    Evaluate an xcolor expression.
+
+    Supports base color names, the ``rgb:red,5;white,2`` mixes the layers
+    use, ``red!30!white`` percentages and macros defined in ``macros``.
+
+    Parameters
+    ----------
+    spec : str
+        Color expression, optionally in braces, e.g. ``"\\ConvColor"``.
+    macros : dict, optional
+        Macro name to color expression, by default those of ``ToCor``.
+
+    Returns
+    -------
+    tuple of float
+        Red, green and blue between 0 and 1.
+
+    Raises
+    ------
+    ValueError
+        If the expression cannot be evaluated.
+    """
+    spec = str(spec).strip()
+    while spec.startswith("{") and spec.endswith("}"):
+        spec = spec[1:-1].strip()
+    if spec.startswith("\\"):
+        if spec[1:] not in macros:
+            raise ValueError(f"undefined color {spec}")
+        return ParseColor(macros[spec[1:]], macros)
+    if spec.startswith("rgb:"):
+        total = 0.0
+        mixed = [0.0, 0.0, 0.0]
+        for part in spec[4:].split(";"):
+            name, _, weight = part.partition(",")
+            weight = float(weight)
+            color = ParseColor(name, macros)
+            total += weight
+            for i in range(3):
+                mixed[i] += weight * color[i]
+        if total <= 0:
+            raise ValueError(f"invalid color {spec}")
+        return tuple(v / total for v in mixed)
+    if "!" in spec:
+        parts = spec.split("!")
+        color = ParseColor(parts[0], macros)
+        for i in range(1, len(parts), 2):
+            other = ParseColor(parts[i + 1], macros) if i + 1 < len(parts) else (1, 1, 1)
+            t = float(parts[i]) / 100
+            color = tuple(t * a + (1 - t) * b for a, b in zip(color, other))
+        return color
+    if spec in NAMED_COLORS:
+        return NAMED_COLORS[spec]
+    raise ValueError(f"unknown color {spec!r}")
+
+
+def _Hex(color):
+    """
+    Format a color for SVG.
+
+    Parameters
+    ----------
+    color : tuple of float
+        Red, green and blue between 0 and 1.
+
+    Returns
+    -------
+    str
+        The color as ``#rrggbb``.
+    """
+    return "#" + "".join(f"{round(min(max(v, 0), 1) * 255):02x}" for v in color)
+
+
+def _Text(tex):
+    """
+    Turn a label's LaTeX into plain text.
+
+    Parameters
+    ----------
+    tex : object
+        Label, e.g. ``"$\\Sigma$"``.
+
+    Returns
+    -------
+    str
+        The text with known symbols replaced and other markup removed.
+    """
+    text = str(tex)
+    for command, symbol in _SYMBOLS.items():
+        text = text.replace(command, symbol)
+    text = _COMMANDS.sub("", text)
+    return text.replace("$", "").replace("{", "").replace("}", "").strip()
+
+
+def _XLabels(value):
+    """
+    Split a pic's ``xlabel`` array into its items.
+
+    Parameters
+    ----------
+    value : object
+        Option value, e.g. ``"{ 64, }"`` or ``'{" ","dummy"}'``.
+
+    Returns
+    -------
+    list of str
+        Label text per box.
+    """
+    text = str(value).strip()
+    while text.startswith("{") and text.endswith("}"):
+        text = text[1:-1].strip()
+    return [_Text(item.strip().strip('"')) for item in text.split(",")]
+
+
+def _Fmt(value):
+    text = f"{value:.2f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+class _Canvas:
+    """
+    SVG elements of a picture and the extent of what they draw.
+
+    Parameters
+    ----------
+    macros : dict
+        Color macros, as for :func:`ParseColor`.
+    """
+
+    def __init__(self, macros):
+        self.macros = macros
+        self.elements = []
+        self.gradients = {}
+        self.xs = []
+        self.ys = []
+
+    def Color(self, spec):
+        return _Hex(ParseColor(spec, self.macros))
+
+    def Project(self, points):
+        """
+        Project 3D points to screen coordinates.
+
+        Parameters
+        ----------
+        points : list of tuple of float
+            Points in TikZ units.
+
+        Returns
+        -------
+        list of tuple of float
+            Screen positions, y pointing down. The extent is updated.
+        """
+        screen = [
+            ((x - Z_SLANT * z) * UNIT, -(y - Z_SLANT * z) * UNIT) for x, y, z in points
+        ]
+        self.xs.extend(p[0] for p in screen)
+        self.ys.extend(p[1] for p in screen)
+        return screen
+
+    def Path(self, polygons, style):
+        d = " ".join(
+            "M" + " L".join(f"{_Fmt(x)},{_Fmt(y)}" for x, y in polygon) + " Z"
+            for polygon in polygons
+        )
+        self.elements.append(f'<path d="{d}" {style}/>')
+
+    def Lines(self, segments, style):
+        d = " ".join(
+            f"M{_Fmt(a[0])},{_Fmt(a[1])} L{_Fmt(b[0])},{_Fmt(b[1])}" for a, b in segments
+        )
+        self.elements.append(f'<path d="{d}" fill="none" {style}/>')
+
+    def Text(self, point, text, anchor="middle", size=FONT_SIZE, dy=0, bold=False, rotate=0):
+        if not text:
+            return
+        x, y = point
+        attributes = f'x="{_Fmt(x)}" y="{_Fmt(y + dy)}" font-size="{_Fmt(size)}" text-anchor="{anchor}"'
+        if bold:
+            attributes += ' font-weight="bold"'
+        if rotate:
+            attributes += f' transform="rotate({_Fmt(rotate)} {_Fmt(x)} {_Fmt(y)})"'
+        self.elements.append(f"<text {attributes}>{escape(text)}</text>")
+
+    def BallGradient(self, color):
+        """
+        Return the id of the radial gradient imitating TikZ's ball shading.
+
+        Parameters
+        ----------
+        color : str
+            Color expression of the ball.
+
+        Returns
+        -------
+        str
+            Gradient id, defined once per color.
+        """
+        if color not in self.gradients:
+            rgb = ParseColor(color, self.macros)
+            self.gradients[color] = (
+                f"ball{len(self.gradients)}",
+                _Hex(tuple(0.15 * v + 0.85 for v in rgb)),
+                _Hex(rgb),
+                _Hex(tuple(0.5 * v for v in rgb)),
+            )
+        return self.gradients[color][0]
+
+    def Arrow(self, a, b, color):
+        """
+        Draw the arrow head TikZ puts halfway along a connection.
+
+        Parameters
+        ----------
+        a, b : tuple of float
+            Screen ends of the segment.
+        color : str
+            Stroke color, as ``#rrggbb``.
+        """
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        length = (dx * dx + dy * dy) ** 0.5
+        if not length:
+            return
+        ux, uy = dx / length, dy / length
+        tip = ((a[0] + b[0]) / 2 + 0.15 * UNIT * ux, (a[1] + b[1]) / 2 + 0.15 * UNIT * uy)
+        tail = (tip[0] - 0.3 * UNIT * ux, tip[1] - 0.3 * UNIT * uy)
+        # Stealth head of a 0.8mm line: about 3.5 line widths long.
+        head, half = 8.0, 4.0
+        base = (tip[0] - head * ux, tip[1] - head * uy)
+        left = (base[0] - half * uy, base[1] + half * ux)
+        right = (base[0] + half * uy, base[1] - half * ux)
+        inner = (tip[0] - 0.6 * head * ux, tip[1] - 0.6 * head * uy)
+        self.Lines([(tail, inner)], f'stroke="{color}" stroke-width="2.27"')
+        self.Path([(tip, left, inner, right)], f'fill="{color}" stroke="none"')
+
+    def Document(self):
+        """
+        Return the finished SVG document.
+
+        Returns
+        -------
+        str
+            The document, sized to its contents plus ``MARGIN``.
+        """
+        if self.xs:
+            left, top = min(self.xs) - MARGIN, min(self.ys) - MARGIN
+            width, height = max(self.xs) + MARGIN - left, max(self.ys) + MARGIN - top
+        else:
+            left = top = 0
+            width = height = 2 * MARGIN
+        defs = "".join(
+            f'<radialGradient id="{gid}" cx="0.35" cy="0.35" r="0.75">'
+            f'<stop offset="0" stop-color="{light}"/><stop offset="0.5" stop-color="{base}"/>'
+            f'<stop offset="1" stop-color="{dark}"/></radialGradient>'
+            for gid, light, base, dark in self.gradients.values()
+        )
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" '
+            f'xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{_Fmt(width)}pt" height="{_Fmt(height)}pt" '
+            f'viewBox="{_Fmt(left)} {_Fmt(top)} {_Fmt(width)} {_Fmt(height)}" '
+            f'font-family="Latin Modern Roman, Computer Modern, serif">\n'
+            + (f"<defs>{defs}</defs>\n" if defs else "")
+            + "\n".join(self.elements)
+            + "\n</svg>\n"
+        )
+
+
+def _DrawBoxes(canvas, node, placement):
+    """
+    Draw a Box or RightBandedBox pic.
+
+    The corners of all the boxes of the pic are projected in one batch:
+    every corner is the sum of one of the box boundaries along x and one of
+    the four (y, z) edges the boxes share.
+
+    Parameters
+    ----------
+    canvas : _Canvas
+        Canvas to draw on.
+    node : Nodes.Layer
+        Layer drawn by the pic.
+    placement : Layout.Placement
+        Its resolved position.
+    """
+    options = dict(BOX_DEFAULTS)
+    options.update(node.Options())
+    ox, oy, oz = placement.origin
+    _, y, z = placement.size
+    widths = [w * SCALE for w in Numbers(options["width"])]
+    banded = node.pic == "RightBandedBox"
+
+    xs = [ox]
+    for w in widths:
+        xs.append(xs[-1] + w)
+    thirds = [k - w / 3 for k, w in zip(xs[1:], widths)] if banded else []
+    edges = [(oy + y / 2, oz + z / 2), (oy - y / 2, oz + z / 2), (oy - y / 2, oz - z / 2), (oy + y / 2, oz - z / 2)]
+    columns = xs + thirds
+    screen = canvas.Project([(x, ey, ez) for x in columns for ey, ez in edges])
+    # top-near, bottom-near, bottom-far, top-far corners at every x.
+    corners = [screen[i : i + 4] for i in range(0, len(screen), 4)]
+
+    fill = canvas.Color(options["fill"])
+    box = f'fill="{fill}" fill-opacity="{options["opacity"]}" stroke="black" stroke-width="{THIN}"'
+    outline = f'fill="none" stroke="black" stroke-width="{THIN}"'
+    hidden = f'stroke="black" stroke-width="{THIN}" stroke-dasharray="{DENSELY_DASHED}" stroke-opacity="0.7"'
+    if banded:
+        bandfill = canvas.Color(options["bandfill"])
+        band = (
+            f'fill="{bandfill}" fill-opacity="{options["bandopacity"]}" '
+            f'stroke="{bandfill}" stroke-width="{THIN}"'
+        )
+    labels = _XLabels(options.get("xlabel", ""))
+    for i in range(len(widths)):
+        (a, b, g, h), (d, c, f, e) = corners[i], corners[i + 1]
+        faces = [(d, a, b, c), (d, a, h, e)]
+        canvas.Path(faces, box)
+        canvas.Lines([(f, g), (b, g), (h, g)], hidden)
+        if banded:
+            art, brt, _, hrt = corners[len(xs) + i]
+            canvas.Path([(d, art, brt, c), (d, art, hrt, e)], band)
+            canvas.Path(faces, outline)
+        label = labels[i] if i < len(labels) else ""
+        canvas.Text(((b[0] + c[0]) / 2, b[1]), label, dy=FONT_SIZE)
+
+    east = [(d, e, f, c)]
+    canvas.Path(east, box)
+    if banded:
+        canvas.Path(east, band)
+        canvas.Path(east, outline)
+
+    a, b = corners[0][0], corners[0][1]
+    canvas.Text(c, _Text(options.get("zlabel", "")), size=9, dy=9, rotate=-45)
+    canvas.Text(((a[0] + b[0]) / 2 - 3, (a[1] + b[1]) / 2), _Text(options.get("ylabel", "")), anchor="end")
+    (bottom,) = canvas.Project([((xs[0] + xs[-1]) / 2, oy - y / 2, oz + z / 2)])
+    canvas.Text(bottom, _Text(options.get("caption", "")), dy=25 + FONT_SIZE, bold=True)
+
+
+def _DrawBall(canvas, node, placement):
+    """
+    Draw a Ball pic.
+
+    Parameters
+    ----------
+    canvas : _Canvas
+        Canvas to draw on.
+    node : Nodes.Layer
+        Layer drawn by the pic.
+    placement : Layout.Placement
+        Its resolved position.
+    """
+    options = dict(BALL_DEFAULTS)
+    options.update(node.Options())
+    (r,) = placement.size
+    center, south, _, _, _ = canvas.Project(
+        [placement.Anchor(anchor) for anchor in ("anchor", "south", "north", "east", "west")]
+    )
+    radius = r * UNIT
+    cx, cy = _Fmt(center[0]), _Fmt(center[1])
+    gradient = canvas.BallGradient(options["fill"])
+    canvas.elements.append(
+        f'<circle cx="{cx}" cy="{cy}" r="{_Fmt(radius)}" fill="url(#{gradient})" '
+        f'fill-opacity="{options["opacity"]}"/>'
+    )
+    canvas.elements.append(
+        f'<circle cx="{cx}" cy="{cy}" r="{_Fmt(radius)}" fill="none" stroke="black" stroke-width="{THIN}"/>'
+    )
+    size = FONT_SIZE * 4 * r
+    canvas.Text(center, _Text(options["logo"]), size=size, dy=size * 0.35)
+    canvas.Text(south, _Text(options.get("caption", "")), dy=20 + FONT_SIZE, bold=True)
+
+
+def _DrawInput(canvas, node, placement):
+    """
+    Draw an input image on the zy plane.
+
+    Parameters
+    ----------
+    canvas : _Canvas
+        Canvas to draw on.
+    node : Nodes.Input
+        The input node.
+    placement : Layout.Placement
+        Its resolved position.
+    """
+    width, height = float(node.width), float(node.height)
+    x, y, z = placement.origin
+    (center,) = canvas.Project([placement.origin])
+    canvas.Project([(x, y + sy * height / 2, z + sz * width / 2) for sy in (-1, 1) for sz in (-1, 1)])
+    # The image's x axis runs along TikZ's z vector and its y axis down y.
+    matrix = f"{_Fmt(-Z_SLANT * UNIT)} {_Fmt(Z_SLANT * UNIT)} 0 {_Fmt(UNIT)} {_Fmt(center[0])} {_Fmt(center[1])}"
+    href = quoteattr(str(node.pathFile))
+    canvas.elements.append(
+        f'<image xlink:href={href} href={href} x="{_Fmt(-width / 2)}" y="{_Fmt(-height / 2)}" '
+        f'width="{_Fmt(width)}" height="{_Fmt(height)}" preserveAspectRatio="none" '
+        f'transform="matrix({matrix})"/>'
+    )
+
+
+def ToSvg(arch, macros=None):
+    """
+    Render an architecture to SVG without TeX.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    macros : dict, optional
+        Color macros, by default those of ``ToCor`` and ``Layers/init.tex``.
+
+    Returns
+    -------
+    str
+        The SVG document.
+
+    Raises
+    ------
+    ValueError
+        If a layer's position cannot be resolved in Python or a color is
+        unknown.
+    """
+    canvas = _Canvas(MACROS if macros is None else macros)
+    layout = Layout()
+    edge = canvas.Color(r"\edgecolor")
+    copy = canvas.Color("rgb:blue,4;red,1;green,1;black,3")
+    connection = f'stroke="{edge}" stroke-width="{ULTRA_THICK}" stroke-opacity="0.7"'
+    skip = f'stroke="{copy}" stroke-width="{ULTRA_THICK}" stroke-opacity="0.7"'
+    for c in Flatten(arch):
+        if isinstance(c, (Layer, Input)):
+            placement = layout.Add(c)
+            if placement is None:
+                raise ValueError(f"cannot resolve the position of {c.name!r} ({c.to})")
+            if isinstance(c, Input):
+                _DrawInput(canvas, c, placement)
+            elif c.pic == "Ball":
+                _DrawBall(canvas, c, placement)
+            else:
+                _DrawBoxes(canvas, c, placement)
+            continue
+        try:
+            if isinstance(c, Connection):
+                a, b = canvas.Project([layout.Position(c.of, "east"), layout.Position(c.to, "west")])
+                canvas.Lines([(a, b)], connection)
+                canvas.Arrow(a, b, edge)
+            elif isinstance(c, Skip):
+                layout.Add(c)
+                points = canvas.Project(
+                    [
+                        layout.Position(c.of, "northeast"),
+                        layout.Position(c.of, "top"),
+                        layout.Position(c.to, "top"),
+                        layout.Position(c.to, "north"),
+                    ]
+                )
+                segments = list(zip(points, points[1:]))
+                canvas.Lines(segments, skip)
+                for a, b in segments:
+                    canvas.Arrow(a, b, copy)
+            elif isinstance(c, Badge):
+                (point,) = canvas.Project([layout.Position(c.of, c.anchor)])
+                anchor = "end" if c.anchor.endswith("east") else "middle"
+                canvas.Text(point, f"×{c.count}", anchor=anchor, dy=-2, bold=True)
+        except KeyError as e:
+            raise ValueError(f"{type(c).__name__} references unknown node or anchor {e}") from None
+    return canvas.Document()
+
+
+def ToGenerateSvg(arch, pathname="file.svg", macros=None):
+    """
+    Write the SVG rendering of an architecture.
+
+    Like ``ToGenerate``, an existing file with the same contents is left
+    untouched.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture, as accepted by ``ToGenerate``.
+    pathname : str or file object, optional
+        Output .svg file, by default "file.svg".
+    macros : dict, optional
+        Color macros, as for :func:`ToSvg`.
+
+    Returns
+    -------
+    bool
+        Whether the output was written.
+    """
+    svg = ToSvg(arch, macros)
+    if hasattr(pathname, "write"):
+        pathname.write(svg)
+        return True
+    try:
+        with open(pathname, encoding="utf-8") as f:
+            if f.read() == svg:
+                return False
+    except OSError:
+        pass
+    with open(pathname, "w", encoding="utf-8") as f:
+        f.write(svg)
+    return True
@@ -0,0 +1,220 @@
+"""
+Structured metrics parsed from TeX log files.
+
+Every engine ends a successful run with a summary of the memory it used
+against its compiled-in limits ("Here is how much of TeX's memory you
+used"). Tracking those per diagram shows how close a network is to a
+"TeX capacity exceeded" failure long before it happens.
+"""
+
+import re
+
+# Resource lines of the memory summary, as (attribute, pattern). The limit
+# of control sequences is printed as a sum, e.g. "15000+600000".
+_RESOURCES = (
+    ("strings", re.compile(r"^\s*(\d+) strings out of (\d+)")),
+    ("stringCharacters", re.compile(r"^\s*(\d+) string characters out of (\d+)")),
+    ("mainMemory", re.compile(r"^\s*(\d+) words of memory out of (\d+)")),
+    ("controlSequences", re.compile(r"^\s*(\d+) multiletter control sequences out of ([\d+]+)")),
+    ("fontInfo", re.compile(r"^\s*(\d+) words of font info for \d+ fonts?, out of (\d+)")),
+    ("hyphenation", re.compile(r"^\s*(\d+) hyphenation exceptions out of (\d+)")),
+)
+_STACKS = re.compile(
+    r"^\s*(\d+)i,(\d+)n,(\d+)p,(\d+)b,(\d+)s stack positions out of "
+    r"(\d+)i,(\d+)n,(\d+)p,(\d+)b,(\d+)s"
+)
+_STACK_NAMES = ("inputStack", "nestStack", "paramStack", "bufferSize", "saveStack")
+_OUTPUT = re.compile(r"^Output written on .*?\((\d+) pages?(?:, (\d+) bytes)?\)")
+_WARNING = re.compile(r"^(?:(?:LaTeX|Package \S+|Class \S+) Warning|pdfTeX warning)\b")
+_CONTINUATION = re.compile(r"^\((\S+)\)\s+|^\s{4,}")
+_LINE = re.compile(r"^l\.(\d+) ?(.*)")
+_CAPACITY = re.compile(r"TeX capacity exceeded, sorry \[(.*?)\]")
+
+
+class TexMetrics:
+    """
+    Resource usage, warnings and errors of one TeX run.
+
+    Resources are ``(used, limit)`` tuples, None if the log has no summary
+    (typically because the run failed).
+
+    Attributes
+    ----------
+    strings, stringCharacters, mainMemory, controlSequences, fontInfo, hyphenation : tuple or None
+        Usage of the string pool, its characters, main memory, the hash
+        table, font memory and hyphenation exceptions.
+    inputStack, nestStack, paramStack, bufferSize, saveStack : tuple or None
+        Peak usage of TeX's stacks and line buffer.
+    pages : int or None
+        Pages written.
+    pdfBytes : int or None
+        Size of the output reported by the engine.
+    warnings : list of str
+        LaTeX, package, class and pdfTeX warnings, continuation lines joined.
+    errors : list of dict
+        Errors, each with its ``message``, the input ``line`` number (None
+        if not shown) and the ``context`` TeX printed around it.
+    capacityExceeded : str or None
+        The resource TeX ran out of, e.g. "main memory size=5000000".
+    """
+
+    __slots__ = (
+        "strings",
+        "stringCharacters",
+        "mainMemory",
+        "controlSequences",
+        "fontInfo",
+        "hyphenation",
+        "inputStack",
+        "nestStack",
+        "paramStack",
+        "bufferSize",
+        "saveStack",
+        "pages",
+        "pdfBytes",
+        "warnings",
+        "errors",
+        "capacityExceeded",
+    )
+
+    RESOURCES = tuple(name for name, _ in _RESOURCES) + _STACK_NAMES
+
+    def __init__(self):
+        for name in self.RESOURCES:
+            setattr(self, name, None)
+        self.pages = None
+        self.pdfBytes = None
+        self.warnings = []
+        self.errors = []
+        self.capacityExceeded = None
+
+    @property
+    def undefinedControlSequences(self):
+        """
+        Errors caused by undefined control sequences.
+
+        Returns
+        -------
+        list of dict
+            The matching entries of ``errors``.
+        """
+        return [e for e in self.errors if e["message"].startswith("Undefined control sequence")]
+
+    def Headroom(self):
+        """
+        Return the unused fraction of every resource with a known limit.
+
+        Returns
+        -------
+        dict
+            Resource name to ``1 - used / limit``.
+        """
+        headroom = {}
+        for name in self.RESOURCES:
+            usage = getattr(self, name)
+            if usage is not None and usage[1] > 0:
+                headroom[name] = 1 - usage[0] / usage[1]
+        return headroom
+
+    def Tightest(self):
+        """
+        Return the resource closest to its limit.
+
+        Returns
+        -------
+        tuple of (str, float) or None
+            Resource name and its headroom, None if no usage was logged.
+        """
+        headroom = self.Headroom()
+        if not headroom:
+            return None
+        name = min(headroom, key=headroom.get)
+        return name, headroom[name]
+
+    def ToDict(self):
+        """
+        Convert the metrics to plain data, e.g. for JSON.
+
+        Returns
+        -------
+        dict
+            Every attribute plus ``headroom``, with tuples as lists.
+        """
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            data[name] = list(value) if isinstance(value, tuple) else value
+        data["headroom"] = self.Headroom()
+        return data
+
+
+def ParseLog(log):
+    """
+    Parse the contents of a TeX log file.
+
+    Parameters
+    ----------
+    log : str
+        Contents of the ``.log`` file.
+
+    Returns
+    -------
+    TexMetrics
+        Resource usage, page count, warnings and errors of the run.
+    """
+    metrics = TexMetrics()
+    lines = log.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+
+        if line.startswith("! "):
+            error = {"message": line[2:].strip(), "line": None, "context": []}
+            capacity = _CAPACITY.search(line)
+            if capacity:
+                metrics.capacityExceeded = capacity.group(1)
+            # TeX shows the offending input as "l.<n> <before>" followed by
+            # the rest of the line, indented to where it broke off.
+            while i < len(lines) and lines[i].strip():
+                match = _LINE.match(lines[i])
+                if match:
+                    error["line"] = int(match.group(1))
+                    error["context"].append(match.group(2))
+                    i += 1
+                    if i < len(lines) and lines[i][:1] == " " and lines[i].strip():
+                        error["context"].append(lines[i].strip())
+                        i += 1
+                    break
+                error["context"].append(lines[i].rstrip())
+                i += 1
+            metrics.errors.append(error)
+            continue
+
+        if _WARNING.match(line):
+            parts = [line.strip()]
+            while i < len(lines) and lines[i].strip() and _CONTINUATION.match(lines[i]):
+                parts.append(_CONTINUATION.sub("", lines[i]).strip())
+                i += 1
+            metrics.warnings.append(" ".join(parts))
+            continue
+
+        for name, pattern in _RESOURCES:
+            match = pattern.match(line)
+            if match:
+                limit = sum(int(n) for n in match.group(2).split("+") if n)
+                setattr(metrics, name, (int(match.group(1)), limit))
+                break
+        else:
+            match = _STACKS.match(line)
+            if match:
+                numbers = [int(n) for n in match.groups()]
+                for k, name in enumerate(_STACK_NAMES):
+                    setattr(metrics, name, (numbers[k], numbers[k + 5]))
+                continue
+            match = _OUTPUT.match(line)
+            if match:
+                metrics.pages = int(match.group(1))
+                if match.group(2):
+                    metrics.pdfBytes = int(match.group(2))
+    return metrics
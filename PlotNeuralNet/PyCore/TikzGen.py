@@ -1,7 +1,31 @@
+import filecmp
 import os
-
-
-def ToHead(projectPath):
+import shutil
+import warnings
+
+from .Nodes import (
+    Begin,
+    Colors,
+    Connection,
+    Conv,
+    ConvConvRelu,
+    ConvRes,
+    ConvSoftMax,
+    End,
+    Flatten,
+    FullyConnected,
+    Group,
+    Head,
+    Input,
+    Pool,
+    Skip,
+    SoftMax,
+    Sum,
+    UnPool,
+)
+
+
+def ToHead(projectPath, pics="standard", draft=False):
     """
     Generate the LaTeX header for the TikZ diagram.
 
@@ -9,20 +33,30 @@ def ToHead(projectPath):
     ----------
     projectPath : str
         The path to the project directory.
+    pics : str, optional
+        Implementation of the layer pics, by default "standard". "fast"
+        is experimental: it is meant to draw the same boxes with less
+        pgfmath evaluation per pic, but neither its output nor its compile
+        time has been compared with the standard pics yet.
+    draft : bool, optional
+        Use the minimal preview pics, same as ``pics="draft"``, by default
+        False.
 
     Returns
     -------
-    str
-        LaTeX code for the document header.
+    Nodes.Head
+        Node rendering the LaTeX code for the document header.
+
+    Raises
+    ------
+    ValueError
+        If ``pics`` is not one of ``Nodes.Head.PICS``.
     """
-    pathLayers = os.path.join(projectPath, "Layers/").replace("\\", "/")
-    return rf"""
-\documentclass[border=8pt, multi, tikz]{{standalone}}
-\usepackage{{import}}
-\subimport{{{pathLayers}}}{{init}}
-\usetikzlibrary{{positioning}}
-\usetikzlibrary{{3d}} %for including external image
-"""
+    if draft:
+        pics = "draft"
+    if pics not in Head.PICS:
+        raise ValueError(f"unknown pics {pics!r}, expected one of {', '.join(Head.PICS)}")
+    return Head(projectPath, pics)
 
 
 def ToCor():
@@ -35,42 +69,27 @@ def ToCor():
 
     Returns
     -------
-    str
-        LaTeX code defining color schemes.
+    Nodes.Colors
+        Node rendering the LaTeX code defining color schemes.
     """
-    return rf"""
-\def\ConvColor{{rgb:yellow,5;red,2.5;white,5}}
-\def\ConvReluColor{{rgb:yellow,5;red,5;white,5}}
-\def\PoolColor{{rgb:red,1;black,0.3}}
-\def\UnpoolColor{{rgb:blue,2;green,1;black,0.3}}
-\def\FcColor{{rgb:blue,5;red,2.5;white,5}}
-\def\FcReluColor{{rgb:blue,5;red,5;white,4}}
-\def\SoftmaxColor{{rgb:magenta,5;black,7}}
-\def\SumColor{{rgb:blue,5;green,15}}
-"""
+    return Colors()
 
 
-def ToBegin():
+def ToBegin(draft=False):
     """
     Initialize the TikZ picture environment.
 
     Parameters
     ----------
-    None
+    draft : bool, optional
+        Draw connections without transparency, by default False.
 
     Returns
     -------
-    str
-        LaTeX code to begin the TikZ environment.
+    Nodes.Begin
+        Node rendering the LaTeX code to begin the TikZ environment.
     """
-    return rf"""
-\newcommand{{\copymidarrow}}{{\tikz \draw[-Stealth,line width=0.8mm,draw={{rgb:blue,4;red,1;green,1;black,3}}] (-0.3,0) -- ++(0.3,0);}}
-
-\begin{{document}}
-\begin{{tikzpicture}}
-\tikzstyle{{connection}}=[ultra thick,every node/.style={{sloped,allow upside down}},draw=\edgecolor,opacity=0.7]
-\tikzstyle{{copyconnection}}=[ultra thick,every node/.style={{sloped,allow upside down}},draw={{rgb:blue,4;red,1;green,1;black,3}},opacity=0.7]
-"""
+    return Begin(draft)
 
 
 # Layers definition
@@ -95,12 +114,10 @@ def ToInput(pathFile, to="(-3,0,0)", width=8, height=8, name="temp"):
 
     Returns
     -------
-    str
-        LaTeX code for the input node.
+    Nodes.Input
+        Node rendering the LaTeX code for the input node.
     """
-    return rf"""
-\node[canvas is zy plane at x=0] ({name}) at {to} {{\includegraphics[width={width}cm,height={height}cm]{{{pathFile}}}}};
-"""
+    return Input(pathFile, to, width, height, name)
 
 
 def ToConv(
@@ -140,23 +157,10 @@ def ToConv(
 
     Returns
     -------
-    str
-        LaTeX code for the convolutional layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Box={{
-        name={name},
-        caption={caption},
-        xlabel={{ {nFilter}, }},
-        zlabel={sFilter},
-        fill=\ConvColor,
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.Conv
+        Node rendering the LaTeX code for the convolutional layer.
+    """
+    return Conv(name, sFilter, nFilter, offset, to, width, height, depth, caption)
 
 
 def ToConvConvRelu(
@@ -196,24 +200,10 @@ def ToConvConvRelu(
 
     Returns
     -------
-    str
-        LaTeX code for the Conv-Conv-ReLU layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    RightBandedBox={{
-        name={name},
-        caption={caption},
-        xlabel={{ {nFilter[0]}, {nFilter[1]} }},
-        zlabel={sFilter},
-        fill=\ConvColor,
-        bandfill=\ConvReluColor,
-        height={height},
-        width={{ {width[0]}, {width[1]} }},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.ConvConvRelu
+        Node rendering the LaTeX code for the Conv-Conv-ReLU layer.
+    """
+    return ConvConvRelu(name, sFilter, nFilter, offset, to, width, height, depth, caption)
 
 
 def ToPool(
@@ -250,22 +240,10 @@ def ToPool(
 
     Returns
     -------
-    str
-        LaTeX code for the pooling layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Box={{
-        name={name},
-        caption={caption},
-        fill=\PoolColor,
-        opacity={opacity},
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.Pool
+        Node rendering the LaTeX code for the pooling layer.
+    """
+    return Pool(name, offset, to, width, height, depth, opacity, caption)
 
 
 def ToUnPool(
@@ -302,22 +280,10 @@ def ToUnPool(
 
     Returns
     -------
-    str
-        LaTeX code for the unpooling layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Box={{
-        name={name},
-        caption={caption},
-        fill=\UnpoolColor,
-        opacity={opacity},
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.UnPool
+        Node rendering the LaTeX code for the unpooling layer.
+    """
+    return UnPool(name, offset, to, width, height, depth, opacity, caption)
 
 
 def ToConvRes(
@@ -360,25 +326,10 @@ def ToConvRes(
 
     Returns
     -------
-    str
-        LaTeX code for the convolutional residual layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    RightBandedBox={{
-        name={name},
-        caption={caption},
-        xlabel={{ {nFilter}, }},
-        zlabel={sFilter},
-        fill={{rgb:white,1;black,3}},
-        bandfill={{rgb:white,1;black,2}},
-        opacity={opacity},
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.ConvRes
+        Node rendering the LaTeX code for the convolutional residual layer.
+    """
+    return ConvRes(name, sFilter, nFilter, offset, to, width, height, depth, opacity, caption)
 
 
 def ToConvSoftMax(
@@ -415,22 +366,10 @@ def ToConvSoftMax(
 
     Returns
     -------
-    str
-        LaTeX code for the convolutional softmax layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Box={{
-        name={name},
-        caption={caption},
-        zlabel={sFilter},
-        fill=\SoftmaxColor,
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.ConvSoftMax
+        Node rendering the LaTeX code for the convolutional softmax layer.
+    """
+    return ConvSoftMax(name, sFilter, offset, to, width, height, depth, caption)
 
 
 def ToSoftMax(
@@ -470,24 +409,10 @@ def ToSoftMax(
 
     Returns
     -------
-    str
-        LaTeX code for the softmax layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Box={{
-        name={name},
-        caption={caption},
-        xlabel={{" ","dummy"}},
-        zlabel={sFilter},
-        fill=\SoftmaxColor,
-        opacity={opacity},
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.SoftMax
+        Node rendering the LaTeX code for the softmax layer.
+    """
+    return SoftMax(name, sFilter, offset, to, width, height, depth, opacity, caption)
 
 
 def ToSum(name, offset="(0,0,0)", to="(0,0,0)", radius=2.5, opacity=0.6):
@@ -509,20 +434,10 @@ def ToSum(name, offset="(0,0,0)", to="(0,0,0)", radius=2.5, opacity=0.6):
 
     Returns
     -------
-    str
-        LaTeX code for the summation node.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Ball={{
-        name={name},
-        fill=\SumColor,
-        opacity={opacity},
-        radius={radius},
-        logo=$+$
-    }}
-}};
-"""
+    Nodes.Sum
+        Node rendering the LaTeX code for the summation node.
+    """
+    return Sum(name, offset, to, radius, opacity)
 
 
 def ToConnection(of, to):
@@ -538,12 +453,10 @@ def ToConnection(of, to):
 
     Returns
     -------
-    str
-        LaTeX code for the connection.
+    Nodes.Connection
+        Node rendering the LaTeX code for the connection.
     """
-    return rf"""
-\draw [connection]  ({of}-east) -- node {{\midarrow}} ({to}-west);
-"""
+    return Connection(of, to)
 
 
 def ToSkip(of, to, pos=1.25):
@@ -561,17 +474,33 @@ def ToSkip(of, to, pos=1.25):
 
     Returns
     -------
-    str
-        LaTeX code for the skip connection.
+    Nodes.Skip
+        Node rendering the LaTeX code for the skip connection.
+    """
+    return Skip(of, to, pos)
+
+
+def ToGroup(name, arch):
     """
-    return rf"""
-\path ({of}-southeast) -- ({of}-northeast) coordinate[pos={pos}] ({of}-top);
-\path ({to}-south) -- ({to}-north) coordinate[pos={pos}] ({to}-top);
-\draw [copyconnection]  ({of}-northeast)
-    -- node {{\copymidarrow}} ({of}-top)
-    -- node {{\copymidarrow}} ({to}-top)
-    -- node {{\copymidarrow}} ({to}-north);
-"""
+    Mark nodes as one block.
+
+    The markers draw nothing, but keep the block's boundaries when it is
+    unpacked into ``arch`` with ``*``, so ``Externalize`` can compile it on
+    its own.
+
+    Parameters
+    ----------
+    name : str
+        Name of the block.
+    arch : iterable
+        Nodes of the block.
+
+    Returns
+    -------
+    list of Nodes.Node
+        The nodes, between a start and an end ``Nodes.Group``.
+    """
+    return [Group(name), *Flatten(arch), Group(name, True)]
 
 
 def ToEnd():
@@ -584,34 +513,136 @@ def ToEnd():
 
     Returns
     -------
-    str
-        LaTeX code to end the TikZ environment.
+    Nodes.End
+        Node rendering the LaTeX code to end the TikZ environment.
     """
-    return rf"""
-\end{{tikzpicture}}
-\end{{document}}
-"""
+    return End()
 
 
-def ToGenerate(arch, pathname="file.tex"):
+def Draft(arch):
+    """
+    Switch an architecture to the draft render mode.
+
+    Draft documents use minimal pics (flat opaque fills, no shading, no
+    hidden edges or labels) and opaque connections, so large networks
+    compile and display quickly while being iterated on.
+
+    Parameters
+    ----------
+    arch : iterable
+        Architecture nodes and fragments.
+
+    Yields
+    ------
+    Node or str
+        The architecture with its ``Head`` and ``Begin`` nodes in draft mode.
+    """
+    for c in Flatten(arch):
+        if isinstance(c, Head):
+            c = c.Replace(pics="draft")
+        elif isinstance(c, Begin):
+            c = c.Replace(draft=True)
+        yield c
+
+
+def ToGenerate(
+    arch, pathname="file.tex", echo=False, bufferSize=1 << 16, cache=None, draft=False
+):
     """
     Generate the LaTeX file from the architecture list.
 
+    The architecture is consumed lazily, so ``arch`` may be a generator and
+    peak memory stays bounded by ``bufferSize`` however long it is. An
+    existing file is only replaced if its contents change, so its mtime
+    stays put for build tools and file watchers when nothing did.
+
+    Parameters
+    ----------
+    arch : iterable of str or Nodes.Node
+        LaTeX commands or nodes, possibly nested (e.g. raw Block outputs).
+    pathname : str, path-like or file object, optional
+        Path to the output .tex file, or an open text file to write into,
+        by default "file.tex".
+    echo : bool, optional
+        Also print every fragment to stdout, by default False.
+    bufferSize : int, optional
+        Number of characters buffered before each write, by default 65536.
+    cache : RenderCache.RenderCache, optional
+        Deprecated and ignored. Nodes are rendered when they are created,
+        repeated layers through the template cache shared by all nodes,
+        ``Nodes.TEMPLATES``.
+    draft : bool, optional
+        Generate a quick preview through :func:`Draft`, by default False.
+
+    Returns
+    -------
+    bool
+        Whether the output was written, False if the file already held
+        exactly the generated contents. Always True for file objects.
+    """
+    if cache is not None:
+        warnings.warn(
+            "ToGenerate(): cache is deprecated and ignored, nodes are rendered when created",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+    if draft:
+        arch = Draft(arch)
+    if hasattr(pathname, "write"):
+        _WriteFragments(arch, pathname, echo, bufferSize)
+        return True
+
+    # The document is written next to the target and swapped in only if it
+    # differs, so a half-written file is never observed either.
+    tmpPath = f"{os.fspath(pathname)}.{os.urandom(4).hex()}.tmp"
+    try:
+        with open(tmpPath, "x") as f:
+            _WriteFragments(arch, f, echo, bufferSize)
+        if os.path.isfile(pathname):
+            if filecmp.cmp(tmpPath, pathname, shallow=False):
+                os.remove(tmpPath)
+                return False
+            shutil.copymode(pathname, tmpPath)
+        os.replace(tmpPath, pathname)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+    return True
+
+
+def _WriteFragments(arch, f, echo, bufferSize):
+    """
+    Write fragments to an open file through a bounded buffer.
+
     Parameters
     ----------
-    arch : list of str
-        List of LaTeX commands.
-    pathname : str, optional
-        Path to the output .tex file, by default "file.tex".
+    arch : iterable
+        Fragments, or nested iterables of fragments such as Block outputs.
+    f : file object
+        Open text file.
+    echo : bool
+        Also print every fragment to stdout.
+    bufferSize : int
+        Number of characters buffered before each write.
 
     Returns
     -------
     None
     """
-    with open(pathname, "w") as f:
-        for c in arch:
+    buffer = []
+    size = 0
+    for c in Flatten(arch):
+        if echo:
             print(c)
-            f.write(c)
+        buffer.append(c)
+        size += len(c)
+        if size >= bufferSize:
+            f.write("".join(buffer))
+            buffer.clear()
+            size = 0
+    if buffer:
+        f.write("".join(buffer))
 
 
 def ToFullyConnected(
@@ -648,20 +679,7 @@ def ToFullyConnected(
 
     Returns
     -------
-    str
-        LaTeX code for the fully connected layer.
-    """
-    return rf"""
-\pic[shift={offset}] at {to} {{
-    Box={{
-        name={name},
-        caption={caption},
-        xlabel={{" ","dummy"}},
-        zlabel={sFilter},
-        fill=\FcColor,
-        height={height},
-        width={width},
-        depth={depth}
-    }}
-}};
-"""
+    Nodes.FullyConnected
+        Node rendering the LaTeX code for the fully connected layer.
+    """
+    return FullyConnected(name, sFilter, offset, to, width, height, depth, caption)
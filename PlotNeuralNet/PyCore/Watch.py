@@ -0,0 +1,349 @@
+"""
+Incremental rebuilding of architecture scripts while they are edited.
+
+Sources are polled by modification time, so no platform file notification
+library is needed. Every script is tracked with two sets of dependencies:
+what its ``.tex`` is generated from (the script and the local modules it
+imports) and what TeX additionally reads (the ``Layers/`` packages and the
+input images). A change to the first re-runs generation, which only touches
+the ``.tex`` if its contents differ; TeX then runs only if the ``.tex``
+changed or one of the second set did.
+"""
+
+import os
+import sys
+import time
+
+from .Build import CompileError, CompileTex, LoadArch, Relocate, Transform
+from .Nodes import Flatten, Head, Input
+from .Paths import LAYERS_DIR
+from .TikzGen import ToGenerate
+
+# This package, whose modules are shared by every script and never reloaded.
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _Stamp(path):
+    """
+    Return what identifies a version of a file.
+
+    Parameters
+    ----------
+    path : str
+        File to stat.
+
+    Returns
+    -------
+    tuple of (int, int) or None
+        Modification time in nanoseconds and size, None if it is missing.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _LayerFiles(layersDir):
+    """
+    List the ``.sty`` and ``.tex`` files of a ``Layers/`` directory.
+
+    Parameters
+    ----------
+    layersDir : str
+        Directory to list.
+
+    Returns
+    -------
+    list of str
+        Paths to the files, empty if the directory is missing.
+    """
+    if not os.path.isdir(layersDir):
+        return []
+    return [
+        os.path.join(layersDir, name)
+        for name in sorted(os.listdir(layersDir))
+        if name.endswith((".sty", ".tex"))
+    ]
+
+
+def _LocalModules(directory):
+    """
+    Find the loaded modules that are files under a directory.
+
+    ``__main__``, installed packages and this package itself are left out,
+    even when they live under the directory.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of a script.
+
+    Returns
+    -------
+    dict
+        Absolute path of each module's file, by module name.
+    """
+    directory = os.path.join(os.path.abspath(directory), "")
+    package = os.path.join(_PACKAGE_DIR, "")
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if not path or name == "__main__":
+            continue
+        path = os.path.abspath(path)
+        parts = path.split(os.sep)
+        if (
+            path.startswith(directory)
+            and not path.startswith(package)
+            and "site-packages" not in parts
+            and "dist-packages" not in parts
+        ):
+            modules[name] = path
+    return modules
+
+
+class WatchEvent:
+    """
+    What one poll did for one script.
+
+    Attributes
+    ----------
+    script : str
+        Path to the architecture script.
+    texPath : str
+        Path to the generated ``.tex``.
+    texChanged : bool
+        Whether generation produced a different ``.tex``.
+    generateSeconds : float
+        Time spent generating, 0 if the script was not re-run.
+    compiled : Build.CompileResult or None
+        Result of the TeX run, None if TeX did not run.
+    error : str or None
+        Description of the failure, None on success.
+    """
+
+    __slots__ = ("script", "texPath", "texChanged", "generateSeconds", "compiled", "error")
+
+    def __init__(self, script, texPath):
+        self.script = script
+        self.texPath = texPath
+        self.texChanged = False
+        self.generateSeconds = 0.0
+        self.compiled = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class _Target:
+    """
+    Dependency state of one watched script.
+    """
+
+    __slots__ = ("script", "texPath", "relocate", "sources", "inputs")
+
+    def __init__(self, script, texPath, relocate):
+        self.script = script
+        self.texPath = texPath
+        self.relocate = relocate
+        self.sources = None
+        self.inputs = {}
+
+
+class Watcher:
+    """
+    Keep the ``.tex`` and PDF of architecture scripts up to date.
+
+    Parameters
+    ----------
+    scripts : iterable of str
+        Paths to the architecture scripts.
+    outputDir : str, optional
+        Where to write the ``.tex`` and PDF, by default next to each script
+        (the same file the script itself writes when run).
+    engine : Engines.Engine or str, optional
+        TeX engine or its name, by default "pdflatex".
+    timeout : float, optional
+        Seconds before a TeX run is killed, by default no limit.
+    compile : bool, optional
+        Run TeX after generation, by default True.
+    transforms : sequence of callable, optional
+        Rewrites applied to every architecture before it is written, as for
+        ``Build.Transform``, by default none.
+    """
+
+    def __init__(
+        self, scripts, outputDir=None, engine="pdflatex", timeout=None, compile=True, transforms=()
+    ):
+        self.engine = engine
+        self.timeout = timeout
+        self.compile = compile
+        self.transforms = tuple(transforms)
+        self._targets = []
+        for script in scripts:
+            script = os.path.abspath(script)
+            jobName = os.path.splitext(os.path.basename(script))[0]
+            texDir = os.path.abspath(outputDir) if outputDir else os.path.dirname(script)
+            self._targets.append(
+                _Target(script, os.path.join(texDir, jobName + ".tex"), outputDir is not None)
+            )
+
+    def Poll(self):
+        """
+        Rebuild whatever changed since the previous poll.
+
+        The first poll generates every script and compiles those whose PDF
+        is missing or older than its sources.
+
+        Returns
+        -------
+        list of WatchEvent
+            One event per script that was regenerated or recompiled.
+        """
+        events = []
+        for target in self._targets:
+            event = self._PollTarget(target)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def Run(self, interval=0.5, callback=None):
+        """
+        Poll until interrupted.
+
+        Parameters
+        ----------
+        interval : float, optional
+            Seconds between polls, by default 0.5.
+        callback : callable, optional
+            Called with every WatchEvent as it happens, by default None.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            while True:
+                for event in self.Poll():
+                    if callback is not None:
+                        callback(event)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def _PollTarget(self, target):
+        """
+        Regenerate and recompile one script as needed.
+
+        Parameters
+        ----------
+        target : _Target
+            Script to check.
+
+        Returns
+        -------
+        WatchEvent or None
+            What was done, None if nothing changed.
+        """
+        first = target.sources is None
+        regenerate = first or any(
+            _Stamp(path) != stamp for path, stamp in target.sources.items()
+        )
+        inputs = {path: _Stamp(path) for path in target.inputs}
+        recompile = self.compile and inputs != target.inputs
+        target.inputs = inputs
+        if not regenerate and not recompile:
+            return None
+
+        event = WatchEvent(target.script, target.texPath)
+        if regenerate:
+            start = time.perf_counter()
+            try:
+                event.texChanged = self._Generate(target)
+            except Exception as e:
+                event.error = f"generation failed: {type(e).__name__}: {e}"
+                return event
+            finally:
+                event.generateSeconds = time.perf_counter() - start
+
+        recompile = recompile or event.texChanged or (first and self._Stale(target))
+        if self.compile and recompile:
+            try:
+                event.compiled = CompileTex(target.texPath, engine=self.engine, timeout=self.timeout)
+            except OSError as e:
+                event.error = f"could not run {self.engine}: {e}"
+            else:
+                if not event.compiled.ok:
+                    event.error = CompileError(event.compiled, self.engine)
+        return event
+
+    def _Generate(self, target):
+        """
+        Re-run a script, write its ``.tex`` and refresh its dependencies.
+
+        Every module loaded from the script's directory is dropped from
+        ``sys.modules`` first, so edits to them are picked up too, also when
+        another watched script imported them last.
+
+        Parameters
+        ----------
+        target : _Target
+            Script to run.
+
+        Returns
+        -------
+        bool
+            Whether the ``.tex`` changed.
+        """
+        scriptDir = os.path.dirname(os.path.abspath(target.script))
+        for name in _LocalModules(scriptDir):
+            del sys.modules[name]
+
+        # Record the script before running it, so a script that fails is
+        # retried as soon as it is saved again.
+        target.sources = {target.script: _Stamp(target.script)}
+        try:
+            arch = list(Flatten(LoadArch(target.script)))
+        finally:
+            target.sources.update(
+                (path, _Stamp(path)) for path in _LocalModules(scriptDir).values()
+            )
+
+        if target.relocate:
+            arch = list(Relocate(arch, scriptDir))
+        arch = list(Transform(arch, self.transforms))
+        os.makedirs(os.path.dirname(target.texPath), exist_ok=True)
+        changed = ToGenerate(arch, target.texPath)
+
+        texDir = os.path.dirname(target.texPath)
+        inputs = set(_LayerFiles(LAYERS_DIR))
+        for c in arch:
+            if isinstance(c, Head):
+                inputs.update(_LayerFiles(os.path.join(texDir, c.projectPath, "Layers")))
+            elif isinstance(c, Input):
+                inputs.add(os.path.normpath(os.path.join(texDir, c.pathFile)))
+        target.inputs = {path: _Stamp(path) for path in sorted(inputs)}
+        return changed
+
+    def _Stale(self, target):
+        """
+        Tell whether a script's PDF is missing or older than what it is built from.
+
+        Parameters
+        ----------
+        target : _Target
+            Script to check.
+
+        Returns
+        -------
+        bool
+            Whether TeX needs to run.
+        """
+        pdf = _Stamp(os.path.splitext(target.texPath)[0] + ".pdf")
+        if pdf is None:
+            return True
+        stamps = [_Stamp(target.texPath)] + list(target.inputs.values())
+        return any(stamp is not None and stamp[0] > pdf[0] for stamp in stamps)
@@ -5,6 +5,8 @@ Core functionalities for PlotNeuralNet, including TikZ primitives and block defi
 """
 
 from .Blocks import Block2ConvPool, BlockRes, BlockUnconv
+from .Multi import ToGenerateMulti
+from .RenderCache import RenderCache
 from .TikzGen import (
     ToBegin,
     ToConnection,
@@ -16,6 +18,7 @@ from .TikzGen import (
     ToEnd,
     ToFullyConnected,
     ToGenerate,
+    ToGroup,
     ToHead,
     ToInput,
     ToPool,
@@ -29,6 +32,7 @@ __all__ = [
     "Block2ConvPool",
     "BlockRes",
     "BlockUnconv",
+    "RenderCache",
     "ToBegin",
     "ToConnection",
     "ToConv",
@@ -39,6 +43,8 @@ __all__ = [
     "ToEnd",
     "ToFullyConnected",
     "ToGenerate",
+    "ToGenerateMulti",
+    "ToGroup",
     "ToHead",
     "ToInput",
     "ToPool",
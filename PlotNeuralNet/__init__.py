@@ -2,6 +2,7 @@ from PlotNeuralNet.PyCore import (
     Block2ConvPool,
     BlockRes,
     BlockUnconv,
+    RenderCache,
     ToBegin,
     ToConnection,
     ToConv,
@@ -12,6 +13,7 @@ from PlotNeuralNet.PyCore import (
     ToEnd,
     ToFullyConnected,
     ToGenerate,
+    ToGenerateMulti,
     ToHead,
     ToInput,
     ToPool,
@@ -25,6 +27,7 @@ __all__ = [
     "Block2ConvPool",
     "BlockUnconv",
     "BlockRes",
+    "RenderCache",
     "ToBegin",
     "ToConnection",
     "ToConv",
@@ -35,6 +38,7 @@ __all__ = [
     "ToEnd",
     "ToFullyConnected",
     "ToGenerate",
+    "ToGenerateMulti",
     "ToHead",
     "ToInput",
     "ToPool",
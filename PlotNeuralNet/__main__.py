@@ -0,0 +1,6 @@
+import sys
+
+from PlotNeuralNet.PyCore.Cli import Main
+
+if __name__ == "__main__":
+    sys.exit(Main())
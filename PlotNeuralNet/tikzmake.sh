@@ -2,7 +2,7 @@
 
 
 python $1.py 
-pdflatex $1.tex
+${PLOTNEURALNET_ENGINE:-pdflatex} $1.tex
 
 rm *.aux *.log *.vscodeLog
 rm *.tex